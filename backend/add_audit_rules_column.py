@@ -0,0 +1,20 @@
+from app import create_app
+from app.extensions import db
+
+app = create_app()
+
+with app.app_context():
+    # Add audit_rules column to transactions table (every audit rule that fired, as JSON)
+    with db.engine.connect() as conn:
+        result = conn.execute(db.text("PRAGMA table_info(transactions)"))
+        columns = [row[1] for row in result]
+
+        if 'audit_rules' not in columns:
+            conn.execute(db.text("ALTER TABLE transactions ADD COLUMN audit_rules TEXT"))
+            print("Added 'audit_rules' column")
+        else:
+            print("'audit_rules' column already exists")
+
+        conn.commit()
+
+    print("Database schema updated successfully!")
@@ -0,0 +1,34 @@
+"""
+Migration script to merge duplicate cart lines and enforce one line per
+(cart_id, product_id), which add-to-cart relies on for its atomic upsert
+"""
+from app import create_app
+from app.extensions import db
+
+app = create_app()
+
+with app.app_context():
+    with db.engine.connect() as conn:
+        # Fold quantities of duplicate lines into the oldest line, then drop the rest
+        merged = conn.execute(db.text("""
+            UPDATE cart_items
+            SET quantity = (
+                SELECT SUM(dup.quantity) FROM cart_items dup
+                WHERE dup.cart_id = cart_items.cart_id AND dup.product_id = cart_items.product_id
+            )
+            WHERE id IN (
+                SELECT MIN(id) FROM cart_items GROUP BY cart_id, product_id HAVING COUNT(*) > 1
+            )
+        """)).rowcount
+        removed = conn.execute(db.text("""
+            DELETE FROM cart_items
+            WHERE id NOT IN (SELECT MIN(id) FROM cart_items GROUP BY cart_id, product_id)
+        """)).rowcount
+        print(f"Merged {merged} duplicated cart lines, removed {removed} duplicate rows")
+
+        conn.execute(db.text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_cart_items_cart_product ON cart_items (cart_id, product_id)"
+        ))
+        conn.commit()
+
+    print("Unique index 'uq_cart_items_cart_product' is in place")
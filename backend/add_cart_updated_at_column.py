@@ -0,0 +1,23 @@
+from app import create_app
+from app.extensions import db
+
+app = create_app()
+
+with app.app_context():
+    # Add updated_at column to carts table (used by the abandoned cart sweeper)
+    with db.engine.connect() as conn:
+        result = conn.execute(db.text("PRAGMA table_info(carts)"))
+        columns = [row[1] for row in result]
+
+        if 'updated_at' not in columns:
+            conn.execute(db.text("ALTER TABLE carts ADD COLUMN updated_at DATETIME"))
+            # Existing carts start their idle clock now rather than being swept immediately
+            conn.execute(db.text("UPDATE carts SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL"))
+            print("Added 'updated_at' column")
+        else:
+            print("'updated_at' column already exists")
+
+        conn.execute(db.text("CREATE INDEX IF NOT EXISTS ix_carts_updated_at ON carts (updated_at)"))
+        conn.commit()
+
+    print("Database schema updated successfully!")
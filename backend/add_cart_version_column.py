@@ -0,0 +1,20 @@
+from app import create_app
+from app.extensions import db
+
+app = create_app()
+
+with app.app_context():
+    # Add version column to carts table (drives cart caching and ETags)
+    with db.engine.connect() as conn:
+        result = conn.execute(db.text("PRAGMA table_info(carts)"))
+        columns = [row[1] for row in result]
+
+        if 'version' not in columns:
+            conn.execute(db.text("ALTER TABLE carts ADD COLUMN version INTEGER NOT NULL DEFAULT 0"))
+            print("Added 'version' column")
+        else:
+            print("'version' column already exists")
+
+        conn.commit()
+
+    print("Database schema updated successfully!")
@@ -0,0 +1,20 @@
+from app import create_app
+from app.extensions import db
+
+app = create_app()
+
+with app.app_context():
+    # Add exit_pass_payload column to transactions table (signed QR content, rendered on demand)
+    with db.engine.connect() as conn:
+        result = conn.execute(db.text("PRAGMA table_info(transactions)"))
+        columns = [row[1] for row in result]
+
+        if 'exit_pass_payload' not in columns:
+            conn.execute(db.text("ALTER TABLE transactions ADD COLUMN exit_pass_payload TEXT"))
+            print("Added 'exit_pass_payload' column")
+        else:
+            print("'exit_pass_payload' column already exists")
+
+        conn.commit()
+
+    print("Database schema updated successfully!")
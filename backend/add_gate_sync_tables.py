@@ -0,0 +1,23 @@
+"""
+Migration script for offline gate verification: creates exit_pass_revocations and
+indexes exit_pass_uses.used_at, which gate sync reads incrementally
+"""
+from app import create_app
+from app.extensions import db
+from app.models import ExitPassUse, ExitPassRevocation
+
+app = create_app()
+
+with app.app_context():
+    ExitPassUse.__table__.create(db.engine, checkfirst=True)
+    ExitPassRevocation.__table__.create(db.engine, checkfirst=True)
+    print("Ensured tables 'exit_pass_uses' and 'exit_pass_revocations'")
+
+    with db.engine.connect() as conn:
+        conn.execute(db.text(
+            "CREATE INDEX IF NOT EXISTS ix_exit_pass_uses_used_at ON exit_pass_uses (used_at)"
+        ))
+        conn.commit()
+    print("Ensured index 'ix_exit_pass_uses_used_at'")
+
+    print("Database schema updated successfully!")
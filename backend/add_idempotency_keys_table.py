@@ -0,0 +1,16 @@
+"""
+Migration script for idempotent checkout: creates idempotency_keys, which stores
+the response of each checkout / confirm-payment request made with an
+Idempotency-Key header
+"""
+from app import create_app
+from app.extensions import db
+from app.models import IdempotencyKey
+
+app = create_app()
+
+with app.app_context():
+    IdempotencyKey.__table__.create(db.engine, checkfirst=True)
+    print("Ensured table 'idempotency_keys'")
+
+    print("Database schema updated successfully!")
@@ -0,0 +1,17 @@
+"""
+Migration script to create the FTS5 product search index and its sync triggers
+"""
+from app import create_app
+from app.extensions import db
+from app.products.search import ensure_search_index, is_fts_available, FTS_TABLE
+
+app = create_app()
+
+with app.app_context():
+    if not is_fts_available():
+        print(f"Database dialect is {db.engine.dialect.name}; FTS5 index is SQLite-only, search will use LIKE matching")
+    else:
+        ensure_search_index()
+        with db.engine.connect() as conn:
+            count = conn.execute(db.text(f"SELECT COUNT(*) FROM {FTS_TABLE}")).scalar()
+        print(f"'{FTS_TABLE}' is ready with {count} indexed products")
@@ -0,0 +1,23 @@
+"""
+Migration script to add the indexes behind paginated transaction history:
+(user_id, created_at, id) for the keyset cursor and transaction_items.transaction_id
+for loading the items of a page in one query
+"""
+from app import create_app
+from app.extensions import db
+
+app = create_app()
+
+with app.app_context():
+    with db.engine.connect() as conn:
+        conn.execute(db.text(
+            "CREATE INDEX IF NOT EXISTS ix_transactions_user_created ON transactions (user_id, created_at, id)"
+        ))
+        print("Ensured index 'ix_transactions_user_created'")
+        conn.execute(db.text(
+            "CREATE INDEX IF NOT EXISTS ix_transaction_items_transaction_id ON transaction_items (transaction_id)"
+        ))
+        print("Ensured index 'ix_transaction_items_transaction_id'")
+        conn.commit()
+
+    print("Database schema updated successfully!")
@@ -0,0 +1,26 @@
+"""
+Migration script to create user_order_stats, the running per-user order count
+and total that audit rules read instead of aggregating transaction history, and
+backfill it from existing transactions
+"""
+from app import create_app
+from app.extensions import db
+from app.models import UserOrderStats
+
+app = create_app()
+
+with app.app_context():
+    UserOrderStats.__table__.create(db.engine, checkfirst=True)
+    print("Ensured table 'user_order_stats'")
+
+    with db.engine.connect() as conn:
+        result = conn.execute(db.text(
+            "INSERT INTO user_order_stats (user_id, order_count, order_total) "
+            "SELECT user_id, COUNT(*), SUM(total_amount) FROM transactions "
+            "WHERE user_id NOT IN (SELECT user_id FROM user_order_stats) "
+            "GROUP BY user_id"
+        ))
+        conn.commit()
+    print(f"Backfilled order stats for {result.rowcount} users")
+
+    print("Database schema updated successfully!")
@@ -66,4 +66,16 @@ def create_app(config_class=Config):
     app.register_blueprint(receipt_bp, url_prefix='/api/receipts')
     from .ai.routes import ai_bp
     app.register_blueprint(ai_bp, url_prefix='/api/ai')
+
+    # Abandoned cart sweeper: `flask sweep-carts` (e.g. from cron); run.py can also start it in-process
+    import click
+    from .cart.sweeper import sweep_abandoned_carts, DEFAULT_IDLE_MINUTES, DEFAULT_BATCH_SIZE
+
+    @app.cli.command('sweep-carts')
+    @click.option('--idle-minutes', default=DEFAULT_IDLE_MINUTES, show_default=True, help='Idle time before a cart is abandoned')
+    @click.option('--batch-size', default=DEFAULT_BATCH_SIZE, show_default=True, help='Rows deleted per transaction')
+    def sweep_carts_command(idle_minutes, batch_size):
+        """Delete items from carts idle longer than the TTL."""
+        report = sweep_abandoned_carts(idle_minutes=idle_minutes, batch_size=batch_size)
+        click.echo(f"Reclaimed {report['items']} cart items from {report['carts']} carts in {report['batches']} batches")
     return app
\ No newline at end of file
@@ -0,0 +1,359 @@
+"""
+Fraud Scorer
+Scores a self-checkout scan session locally, in well under a millisecond, so it
+can run inline at checkout. Features are extracted with NumPy (scan velocity,
+prices far below their category or their catalog price, failed and voided scans,
+basket composition) and fed to a logistic-regression model loaded from
+fraud_model.json (see train_fraud_model.py). The result has the same shape as
+OpenAIService.detect_fraud_patterns(), which is now only an optional second
+opinion for high-risk sessions.
+
+Input, all fields optional:
+    scan_data: {"items": [{"barcode", "price", "category", "quantity", "scanned_at"}]} or the item list itself
+    behavior:  {"failed_scans", "voided_items", "session_seconds"}
+"""
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+
+try:
+    import numpy as np
+except ImportError:  # Optional: without NumPy fraud checks fall back to the LLM
+    np = None
+from ..extensions import db
+from ..models import Product
+from ..products.catalog_revision import catalog_revision
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(__file__), 'fraud_model.json')
+
+FEATURES = (
+    'scans_per_minute',
+    'fast_scan_share',         # Share of gaps between scans under FAST_SCAN_SECONDS
+    'low_price_outlier',       # Robust z-score of the item furthest below its category's typical price,
+                               # for items whose barcode is unknown or belongs to another category
+    'low_price_share',         # Share of items more than LOW_PRICE_Z below their category (same items)
+    'catalog_price_gap',       # Largest relative undercharge versus the catalog price of the barcode
+    'failed_scans',            # log1p(count)
+    'failure_rate',            # failed / (failed + scanned)
+    'voided_items',            # log1p(count)
+    'unknown_item_share',      # Share of barcodes not in the catalog
+    'category_diversity',      # Distinct categories / items
+    'top_line_value_share',    # Largest line's share of the basket value
+    'log_basket_value',
+)
+
+FAST_SCAN_SECONDS = 1.5
+LOW_PRICE_Z = 2.5
+
+# Client input is clamped to these ranges so no feature can overflow
+MAX_PRICE = 100_000.0
+MAX_QUANTITY = 10_000.0
+MAX_COUNTER = 10_000.0
+
+# Shown when a feature pushes the score up by at least FLAG_CONTRIBUTION (in log-odds)
+FLAG_CONTRIBUTION = 0.5
+FLAG_MESSAGES = {
+    'scans_per_minute': "Unusually fast scanning ({value:.0f} items/min)",
+    'fast_scan_share': "Bursts of scans too quick to be real ({value:.0%} of gaps)",
+    'low_price_outlier': "Item priced far below the category it was identified as",
+    'low_price_share': "Several items priced far below the category they were identified as",
+    'catalog_price_gap': "Scanned price {value:.0%} below the catalog price",
+    'failed_scans': "Repeated failed scans",
+    'failure_rate': "High share of failed scans ({value:.0%})",
+    'voided_items': "Many voided items",
+    'unknown_item_share': "Items not in the catalog ({value:.0%})",
+    'category_diversity': "Unusual mix of product categories",
+    'top_line_value_share': "Basket value concentrated in one item ({value:.0%})",
+    'log_basket_value': "High basket value",
+}
+
+RECOMMENDATIONS = {
+    'low': "No action needed",
+    'medium': "Spot-check the basket at the exit",
+    'high': "Manual audit before exit",
+}
+
+
+def _number(value, default=0.0, low=None, high=None):
+    """value as a finite float clamped to [low, high], or default if it isn't a finite number"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return default
+    if not math.isfinite(number):
+        return default
+    if low is not None:
+        number = max(number, low)
+    if high is not None:
+        number = min(number, high)
+    return number
+
+
+def _timestamp(value):
+    """Seconds since the epoch from an ISO string or epoch seconds/milliseconds, or None"""
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            return None
+    number = _number(value, None)
+    if number is None:
+        return None
+    return number / 1000 if number > 1e11 else number
+
+
+def _label(value, field):
+    """Barcode or category as a string (numbers are coerced)"""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise ValueError(f"{field} must be a string")
+
+
+class CatalogPriceStats:
+    """Catalog prices by barcode plus robust log-price statistics (median, MAD) per category"""
+
+    def __init__(self, rows):
+        """
+        Args:
+            rows (iterable): (barcode, category, price) tuples
+        """
+        rows = [(barcode, category or '', float(price)) for barcode, category, price in rows if price and price > 0]
+        self.by_barcode = {barcode: (price, category) for barcode, category, price in rows}
+        self.by_category = {}
+        if not rows:
+            return
+        categories = np.array([category for _, category, _ in rows])
+        log_prices = np.log(np.array([price for _, _, price in rows]))
+        for category in np.unique(categories):
+            values = log_prices[categories == category]
+            median = float(np.median(values))
+            # 1.4826 * MAD estimates the standard deviation; floor it so one-price categories don't explode
+            mad = max(1.4826 * float(np.median(np.abs(values - median))), 0.1)
+            self.by_category[str(category)] = (median, mad)
+
+
+def extract_features(scan_data, behavior, stats):
+    """
+    Feature vector for one session, in FEATURES order
+
+    Args:
+        scan_data (dict or list): Scanned items (see module docstring)
+        behavior (dict): Session behaviour counters
+        stats (CatalogPriceStats): Catalog to compare prices against
+
+    Returns:
+        numpy.ndarray: float64 vector of len(FEATURES)
+
+    Raises:
+        ValueError: If an item's barcode or category isn't a string or number
+    """
+    items = scan_data.get('items', []) if isinstance(scan_data, dict) else scan_data
+    items = [item for item in items if isinstance(item, dict)] if isinstance(items, list) else []
+    behavior = behavior if isinstance(behavior, dict) else {}
+    failed = _number(behavior.get('failed_scans'), low=0.0, high=MAX_COUNTER)
+    voided = _number(behavior.get('voided_items'), low=0.0, high=MAX_COUNTER)
+    session_seconds = _number(behavior.get('session_seconds'), low=0.0, high=86400.0)
+    features = np.zeros(len(FEATURES))
+    features[5] = math.log1p(failed)
+    features[7] = math.log1p(voided)
+    count = len(items)
+    if not count:
+        return features
+
+    prices = np.empty(count)
+    quantities = np.empty(count)
+    catalog_prices = np.full(count, np.nan)
+    medians = np.full(count, np.nan)
+    mads = np.ones(count)
+    times = []
+    categories = []
+    for i, item in enumerate(items):
+        known = stats.by_barcode.get(_label(item.get('barcode'), 'barcode'))
+        category = _label(item.get('category'), 'category') or (known[1] if known else '')
+        price = _number(item.get('price'), known[0] if known else 0.0, low=0.0, high=MAX_PRICE)
+        prices[i] = price
+        quantities[i] = _number(item.get('quantity'), 1.0, low=1.0, high=MAX_QUANTITY)
+        if known:
+            catalog_prices[i] = known[0]
+        # A cheap item in its own category is normal; compare against the category only when the
+        # barcode is unknown or the item was identified (e.g. by image) as another category
+        if (not known or category != known[1]) and category in stats.by_category:
+            medians[i], mads[i] = stats.by_category[category]
+        categories.append(category)
+        timestamp = _timestamp(item.get('scanned_at', item.get('timestamp')))
+        if timestamp is not None:
+            times.append(timestamp)
+
+    # Scan velocity
+    if len(times) >= 2:
+        times = np.sort(np.array(times))
+        gaps = np.diff(times)
+        span = max(times[-1] - times[0], 1.0)
+        features[0] = count / (span / 60)
+        features[1] = float(np.mean(gaps < FAST_SCAN_SECONDS))
+    elif session_seconds > 0:
+        features[0] = count / (max(session_seconds, 1.0) / 60)
+
+    # Price versus category and catalog
+    has_category = ~np.isnan(medians) & (prices > 0)
+    if has_category.any():
+        z = (np.log(prices[has_category]) - medians[has_category]) / mads[has_category]
+        features[2] = max(0.0, float(-z.min()))
+        features[3] = float(np.sum(z < -LOW_PRICE_Z)) / count
+    has_catalog = ~np.isnan(catalog_prices)
+    if has_catalog.any():
+        features[4] = max(0.0, float(np.max(1 - prices[has_catalog] / catalog_prices[has_catalog])))
+    features[8] = 1 - float(np.mean(has_catalog))
+
+    # Failures and basket composition
+    features[6] = failed / (failed + count)
+    line_values = prices * quantities
+    basket_value = float(line_values.sum())
+    features[9] = len(set(categories)) / count
+    features[10] = float(line_values.max()) / basket_value if basket_value > 0 else 0.0
+    features[11] = math.log1p(max(basket_value, 0.0))
+    return features
+
+
+class FraudModel:
+    """Standardized logistic regression, stored as JSON"""
+
+    def __init__(self, data):
+        if tuple(data['features']) != FEATURES:
+            raise ValueError("Fraud model was trained on a different feature set; retrain it")
+        self.mean = np.array(data['mean'])
+        self.scale = np.array(data['scale'])
+        self.weights = np.array(data['weights'])
+        self.bias = float(data['bias'])
+        self.thresholds = data.get('thresholds', {'medium': 0.35, 'high': 0.7})
+        self.metadata = data.get('metadata', {})
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def contributions(self, features):
+        """Per-feature log-odds contributions"""
+        return self.weights * (features - self.mean) / self.scale
+
+    def probability(self, contributions):
+        logit = float(contributions.sum()) + self.bias
+        if logit >= 0:  # Split so exp() never overflows
+            return 1 / (1 + math.exp(-logit))
+        odds = math.exp(logit)
+        return odds / (1 + odds)
+
+
+class FraudScorer:
+    def __init__(self):
+        """
+        Load the model from FRAUD_MODEL_PATH (default: fraud_model.json next to this file)
+
+        Raises:
+            ValueError: If NumPy isn't installed or the model can't be loaded
+        """
+        if np is None:
+            raise ValueError("NumPy is not installed; local fraud scoring is disabled")
+        path = os.getenv('FRAUD_MODEL_PATH', DEFAULT_MODEL_PATH)
+        try:
+            self.model = FraudModel.load(path)
+        except (OSError, KeyError, json.JSONDecodeError) as e:
+            raise ValueError(f"Could not load fraud model from {path}: {e}")
+        self._lock = threading.Lock()
+        self._stats = None
+        self._stats_revision = None
+        self._stats_built_at = 0.0
+        self._rebuilding = False
+        # Minimum time between rebuilds, so a bulk import bumping the revision per chunk
+        # doesn't keep a rebuild running back to back
+        self.stats_refresh_interval = float(os.getenv('FRAUD_STATS_REFRESH_SECONDS', 60))
+
+    def catalog_stats(self):
+        """
+        Price statistics for the catalog
+
+        Once built, stats are never rebuilt on the request path: when the catalog revision
+        moves, a background thread rebuilds them and the previous stats are served until
+        it finishes. Only the first call in a process builds them inline.
+        """
+        revision = catalog_revision.current()
+        with self._lock:
+            stats = self._stats
+            if stats is not None:
+                if (self._stats_revision == revision or self._rebuilding
+                        or time.monotonic() - self._stats_built_at < self.stats_refresh_interval):
+                    return stats
+                self._rebuilding = True
+        if stats is None:
+            return self._rebuild_stats(revision)
+        thread = threading.Thread(
+            target=self._rebuild_stats_in_background, args=(current_app._get_current_object(), revision),
+            name='fraud-stats', daemon=True,
+        )
+        thread.start()
+        return stats
+
+    def _rebuild_stats(self, revision):
+        stats = CatalogPriceStats(db.session.execute(
+            db.select(Product.barcode, Product.category, Product.price)
+        ).all())
+        with self._lock:
+            self._stats, self._stats_revision = stats, revision
+            self._stats_built_at = time.monotonic()
+        return stats
+
+    def _rebuild_stats_in_background(self, app, revision):
+        with app.app_context():
+            try:
+                self._rebuild_stats(revision)
+            except Exception as e:
+                print(f"[ERROR] Fraud catalog stats rebuild failed: {str(e)}")
+            finally:
+                db.session.remove()
+                with self._lock:
+                    self._rebuilding = False
+
+    def score(self, scan_data, behavior, stats=None):
+        """
+        Score one session
+
+        Returns:
+            dict: {"risk_level", "confidence", "flags", "recommendation", "score"}; confidence is
+            the model's probability for the level reported (fraud for medium/high, honest for low)
+
+        Raises:
+            ValueError: If the session can't be scored (never reported as low risk)
+        """
+        features = extract_features(scan_data, behavior, stats or self.catalog_stats())
+        if not np.isfinite(features).all():
+            raise ValueError("Scan session produced non-finite features")
+        contributions = self.model.contributions(features)
+        probability = self.model.probability(contributions)
+        if not math.isfinite(probability):
+            raise ValueError("Fraud model produced a non-finite score")
+        if probability >= self.model.thresholds['high']:
+            risk_level = 'high'
+        elif probability >= self.model.thresholds['medium']:
+            risk_level = 'medium'
+        else:
+            risk_level = 'low'
+        flags = []
+        if risk_level != 'low':
+            for i in np.argsort(-contributions):
+                if contributions[i] < FLAG_CONTRIBUTION:
+                    break
+                flags.append(FLAG_MESSAGES[FEATURES[i]].format(value=features[i]))
+        return {
+            "risk_level": risk_level,
+            "confidence": round(probability if risk_level != 'low' else 1 - probability, 2),
+            "flags": flags,
+            "recommendation": RECOMMENDATIONS[risk_level],
+            "score": round(probability, 4),
+        }
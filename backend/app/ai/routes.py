@@ -1,8 +1,10 @@
 from flask import request, jsonify, Blueprint
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from .openai_service import OpenAIService
+from .fraud_scorer import FraudScorer
 from ..models import Transaction, Product
 import json
+import os
 
 ai_bp = Blueprint('ai', __name__)
 
@@ -13,6 +15,15 @@ except ValueError as e:
     print(f"Warning: {e}")
     ai_service = None
 
+# Local fraud model; the LLM is only a second opinion on high-risk sessions
+try:
+    fraud_scorer = FraudScorer()
+except ValueError as e:
+    print(f"Warning: {e}")
+    fraud_scorer = None
+
+FRAUD_LLM_SECOND_OPINION = os.getenv('FRAUD_LLM_SECOND_OPINION', 'false').lower() == 'true'
+
 @ai_bp.route('/recognize-product', methods=['POST'])
 @jwt_required()
 def recognize_product():
@@ -281,41 +292,58 @@ def get_recommendations():
         return jsonify({"error": str(e)}), 500
 
 
+def _llm_fraud_check(scan_data, user_behavior):
+    """Ask the LLM, returning its JSON verdict (or an 'unknown' verdict if unparseable)"""
+    result = ai_service.detect_fraud_patterns(scan_data, user_behavior)
+
+    # Parse JSON response
+    try:
+        if '```json' in result:
+            result = result.split('```json')[1].split('```')[0].strip()
+        elif '```' in result:
+            result = result.split('```')[1].split('```')[0].strip()
+
+        return json.loads(result)
+
+    except json.JSONDecodeError:
+        return {
+            "risk_level": "unknown",
+            "confidence": 0.0,
+            "error": "Failed to analyze"
+        }
+
+
 @ai_bp.route('/fraud-check', methods=['POST'])
 @jwt_required()
 def fraud_check():
     """
     AI Feature 3: Fraud Detection
     POST /api/ai/fraud-check
-    Body: { "scan_data": {...}, "behavior": {...} }
+    Body: { "scan_data": {...}, "behavior": {...}, "second_opinion": false }
+
+    Scored by the local model (see fraud_scorer.py). High-risk sessions also get the
+    LLM's verdict under "second_opinion" when requested or FRAUD_LLM_SECOND_OPINION
+    is set; without NumPy or a model file the LLM does the scoring as before.
     """
-    if not ai_service:
-        return jsonify({"error": "AI service not configured. Please set OPENAI_API_KEY"}), 503
+    if not fraud_scorer and not ai_service:
+        return jsonify({"error": "Fraud scoring unavailable. Install numpy or set OPENAI_API_KEY"}), 503
 
     try:
-        data = request.get_json()
+        data = request.get_json() or {}
         scan_data = data.get('scan_data', {})
         user_behavior = data.get('behavior', {})
 
-        # Call Gemini Fraud Detection
-        result = ai_service.detect_fraud_patterns(scan_data, user_behavior)
+        if not fraud_scorer:
+            return jsonify(_llm_fraud_check(scan_data, user_behavior)), 200
 
-        # Parse JSON response
         try:
-            if '```json' in result:
-                result = result.split('```json')[1].split('```')[0].strip()
-            elif '```' in result:
-                result = result.split('```')[1].split('```')[0].strip()
-
-            fraud_analysis = json.loads(result)
-            return jsonify(fraud_analysis), 200
-
-        except json.JSONDecodeError:
-            return jsonify({
-                "risk_level": "unknown",
-                "confidence": 0.0,
-                "error": "Failed to analyze"
-            }), 200
+            fraud_analysis = fraud_scorer.score(scan_data, user_behavior)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        wants_second_opinion = data.get('second_opinion') is True or FRAUD_LLM_SECOND_OPINION
+        if fraud_analysis["risk_level"] == "high" and ai_service and wants_second_opinion:
+            fraud_analysis["second_opinion"] = _llm_fraud_check(scan_data, user_behavior)
+        return jsonify(fraud_analysis), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
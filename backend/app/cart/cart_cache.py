@@ -0,0 +1,143 @@
+"""
+Cart Cache
+Write-through cache of serialized carts keyed by user ID. Each entry is tagged with
+the cart's database version and the catalog revision it was priced against, so a
+stale entry is never served; mutations patch entries incrementally when they can.
+"""
+import os
+import threading
+from datetime import datetime
+from cachetools import TTLCache
+from ..extensions import db
+from ..models import Cart
+from ..products.catalog_revision import catalog_revision
+
+
+def to_cents(price):
+    return int(round(price * 100))
+
+
+def bump_cart_version(cart_id):
+    """Increment a cart's version inside the caller's transaction (for bulk item changes like checkout)"""
+    db.session.execute(
+        db.update(Cart.__table__)
+        .where(Cart.__table__.c.id == cart_id)
+        .values(version=Cart.__table__.c.version + 1, updated_at=datetime.utcnow())
+    )
+
+
+class CartCache:
+    def __init__(self):
+        """Initialize the bounded per-user cart cache"""
+        self._lock = threading.Lock()
+        self._entries = TTLCache(
+            maxsize=int(os.getenv('CART_CACHE_SIZE', 5000)),
+            ttl=int(os.getenv('CART_CACHE_TTL', 900)),
+        )
+
+    def get(self, user_id, version):
+        """
+        Get a cached cart view
+
+        Args:
+            user_id (int): Cart owner
+            version (int): Current cart version from the database
+
+        Returns:
+            dict: Serialized cart, or None if nothing current is cached
+        """
+        revision = catalog_revision.current()
+        with self._lock:
+            entry = self._entries.get(int(user_id))
+        if entry and entry["version"] == version and entry["catalog_revision"] == revision:
+            return entry["cart"]
+        return None
+
+    def put(self, user_id, version, cart, revision):
+        """
+        Store a freshly loaded cart view (its total is recomputed in cents)
+
+        Args:
+            revision (int): Catalog revision read before the cart was loaded
+
+        Returns:
+            dict: The cart view with its total
+        """
+        total_cents = sum(to_cents(item["product"]["price"]) * item["quantity"] for item in cart["items"])
+        with self._lock:
+            return self._store_locked(user_id, version, cart["id"], cart["items"], total_cents, revision)
+
+    def add_quantity(self, user_id, version, line, quantity):
+        """
+        Apply an add-to-cart to the entry cached at version - 1
+
+        Args:
+            line (dict): The cart line as it is after the add
+            quantity (int): Quantity that was added
+
+        Returns:
+            dict: Updated cart view, or None if the entry could not be patched
+        """
+        def patch(items):
+            items = [dict(line) if i["id"] == line["id"] else i for i in items]
+            if not any(i["id"] == line["id"] for i in items):
+                items.append(line)
+            return items, to_cents(line["product"]["price"]) * quantity
+        return self._patch(user_id, version, patch)
+
+    def set_quantity(self, user_id, version, item_id, quantity):
+        """Apply a quantity change to the entry cached at version - 1"""
+        def patch(items):
+            old = next((i for i in items if i["id"] == item_id), None)
+            if old is None:
+                return None, 0
+            delta = to_cents(old["product"]["price"]) * (quantity - old["quantity"])
+            return [dict(i, quantity=quantity) if i["id"] == item_id else i for i in items], delta
+        return self._patch(user_id, version, patch)
+
+    def remove_line(self, user_id, version, item_id):
+        """Apply a line removal to the entry cached at version - 1"""
+        def patch(items):
+            old = next((i for i in items if i["id"] == item_id), None)
+            if old is None:
+                return None, 0
+            delta = -to_cents(old["product"]["price"]) * old["quantity"]
+            return [i for i in items if i["id"] != item_id], delta
+        return self._patch(user_id, version, patch)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(int(user_id), None)
+
+    def _patch(self, user_id, version, patch):
+        # Only valid if nothing else changed the cart (or the catalog) since the cached copy
+        revision = catalog_revision.current()
+        with self._lock:
+            entry = self._entries.get(int(user_id))
+            if not entry or entry["version"] != version - 1 or entry["catalog_revision"] != revision:
+                self._entries.pop(int(user_id), None)
+                return None
+            items, delta = patch(entry["cart"]["items"])
+            if items is None:
+                self._entries.pop(int(user_id), None)
+                return None
+            return self._store_locked(user_id, version, entry["cart"]["id"], items, entry["total_cents"] + delta, revision)
+
+    def _store_locked(self, user_id, version, cart_id, items, total_cents, revision):
+        cart = {
+            "id": cart_id,
+            "user_id": int(user_id),
+            "items": items,
+            "total": total_cents / 100,
+        }
+        self._entries[int(user_id)] = {
+            "version": version,
+            "catalog_revision": revision,
+            "total_cents": total_cents,
+            "cart": cart,
+        }
+        return cart
+
+
+# Create singleton instance
+cart_cache = CartCache()
@@ -1,52 +1,134 @@
-from flask import request, jsonify, Blueprint
+from flask import request, jsonify, Blueprint, Response
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from ..models import Cart, CartItem, Product
+from datetime import datetime
+from sqlalchemy.orm import joinedload
+from ..models import Cart, CartItem, ScanEvent
 from ..extensions import db
+from ..products.barcode_cache import barcode_cache
+from ..products.catalog_revision import catalog_revision
+from .cart_cache import cart_cache
+from ..sql_helpers import dialect_insert
 
 # Corrected blueprint definition
 cart_bp = Blueprint('cart', __name__)
 
-def _get_or_create_cart(user_id):
-    """Helper function to get a user's cart, creating one if it doesn't exist."""
-    # A cart is unique to a user, so this is a reliable way to find it.
-    cart = Cart.query.filter_by(user_id=user_id).first()
+def _touch_cart(user_id):
+    """
+    Bumps the user's cart version, creating the cart if needed, in the current transaction.
+    Every cart mutation calls this so cached views and ETags can't go stale.
+
+    Returns:
+        tuple: (cart_id, new version)
+    """
+    table = Cart.__table__
+    now = datetime.utcnow()
+    stmt = dialect_insert(table).values(user_id=int(user_id), version=1, updated_at=now)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id'],
+        set_={'version': table.c.version + 1, 'updated_at': now}
+    ).returning(table.c.id, table.c.version)
+    return tuple(db.session.execute(stmt).one())
+
+def _upsert_cart_item(cart_id, product_id, quantity):
+    """Adds quantity to a cart line in one statement, inserting the line if it is new."""
+    table = CartItem.__table__
+    stmt = dialect_insert(table).values(cart_id=cart_id, product_id=product_id, quantity=quantity)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['cart_id', 'product_id'],
+        set_={'quantity': table.c.quantity + stmt.excluded.quantity}
+    ).returning(table.c.id, table.c.quantity)
+    return tuple(db.session.execute(stmt).one())
+
+def _load_cart(user_id):
+    """Loads a user's cart, its items and their products in a single joined query."""
+    return (
+        Cart.query
+        .options(joinedload(Cart.items).joinedload(CartItem.product))
+        .filter_by(user_id=user_id)
+        .first()
+    )
+
+def _serialize_line(item_id, cart_id, quantity, product):
+    return {
+        "id": item_id,
+        "cart_id": cart_id,
+        "product_id": product["id"],
+        "quantity": quantity,
+        "product": {
+            "id": product["id"],
+            "barcode": product["barcode"],
+            "name": product["name"],
+            "price": product["price"]
+        }
+    }
+
+def _empty_cart(user_id):
+    return {"id": None, "user_id": int(user_id), "items": [], "total": 0}
+
+def _cart_view(user_id):
+    """
+    Loads and serializes the cart, refreshing the cart cache.
+
+    Returns:
+        tuple: (cart view, cart version), or (empty cart, 0) if the user has no cart
+    """
+    revision = catalog_revision.current()
+    cart = _load_cart(user_id)
     if not cart:
-        cart = Cart(user_id=user_id)
-        db.session.add(cart)
-        db.session.commit()
-    return cart
+        return _empty_cart(user_id), 0
+    view = {
+        "id": cart.id,
+        "user_id": cart.user_id,
+        "items": [
+            _serialize_line(item.id, cart.id, item.quantity, {
+                "id": item.product.id,
+                "barcode": item.product.barcode,
+                "name": item.product.name,
+                "price": item.product.price
+            })
+            for item in cart.items
+        ],
+    }
+    # The cache adds the total, summed in integer cents
+    return cart_cache.put(user_id, cart.version, view, revision), cart.version
+
+def _cart_etag(cart_id, version, revision):
+    return f"cart-{cart_id or 0}-v{version}-r{revision}"
 
 @cart_bp.route('', methods=['GET'])
 @jwt_required()
 def get_cart():
     """Retrieves the full contents of the current user's cart."""
     user_id = get_jwt_identity()
-    cart = _get_or_create_cart(user_id)
-
-    cart_items_data = []
-    total_price = 0
-    for item in cart.items:
-        item_data = {
-            "id": item.id,
-            "cart_id": cart.id,
-            "product_id": item.product.id,
-            "quantity": item.quantity,
-            "product": {
-                "id": item.product.id,
-                "barcode": item.product.barcode,
-                "name": item.product.name,
-                "price": item.product.price
-            }
-        }
-        cart_items_data.append(item_data)
-        total_price += item.product.price * item.quantity
+    # Reading never creates a cart; only the cheap version row is fetched up front,
+    # together with the catalog revision the ETag depends on
+    carts = Cart.__table__
+    cart_id, version, revision = db.session.execute(
+        db.select(
+            db.select(carts.c.id).where(carts.c.user_id == int(user_id)).scalar_subquery(),
+            db.select(carts.c.version).where(carts.c.user_id == int(user_id)).scalar_subquery(),
+            catalog_revision.revision_expression(),
+        )
+    ).one()
+    version = version or 0
+    revision = catalog_revision.observe(revision)
 
-    return jsonify({
-        "id": cart.id,
-        "user_id": cart.user_id,
-        "items": cart_items_data,
-        "total": round(total_price, 2)
-    })
+    etag = _cart_etag(cart_id, version, revision)
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        cart = None
+        if cart_id is not None:
+            cart = cart_cache.get(user_id, version)
+            if cart is None:
+                cart, version = _cart_view(user_id)
+                etag = _cart_etag(cart["id"], version, catalog_revision.current())
+        response = jsonify(cart or _empty_cart(user_id))
+
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
 
 @cart_bp.route('/items', methods=['POST'])
 @jwt_required()
@@ -60,23 +142,18 @@ def add_item_to_cart():
     if not barcode or quantity < 1:
         return jsonify({"msg": "Product barcode and valid quantity are required"})
 
-    product = Product.query.filter_by(barcode=barcode).first()
+    product = barcode_cache.lookup(barcode)
     if not product:
         return jsonify({"msg": "Product not found"})
 
-    cart = _get_or_create_cart(user_id)
-
-    # Check if this product is already in the cart
-    cart_item = CartItem.query.filter_by(cart_id=cart.id, product_id=product.id).first()
-
-    if cart_item:
-        cart_item.quantity += quantity
-    else:
-        cart_item = CartItem(cart_id=cart.id, product_id=product.id, quantity=quantity)
-        db.session.add(cart_item)
-
+    # Cart creation and the line upsert share one transaction, so repeated
+    # scans can't race each other into duplicate lines
+    cart_id, version = _touch_cart(user_id)
+    item_id, line_quantity = _upsert_cart_item(cart_id, product["id"], quantity)
     db.session.commit()
-    return jsonify({"msg": f"'{product.name}' added to cart."})
+
+    cart_cache.add_quantity(user_id, version, _serialize_line(item_id, cart_id, line_quantity, product), quantity)
+    return jsonify({"msg": f"'{product['name']}' added to cart."})
 
 @cart_bp.route('/items/<int:item_id>', methods=['PUT'])
 @jwt_required()
@@ -89,42 +166,23 @@ def update_cart_item(item_id):
     if quantity is None or int(quantity) < 1:
         return jsonify({"msg": "A valid quantity is required"}), 400
 
-    cart_item = CartItem.query.get(item_id)
-
-    if not cart_item or cart_item.cart.user_id != int(user_id):
+    table = CartItem.__table__
+    cart_id, version = _touch_cart(user_id)
+    result = db.session.execute(
+        db.update(table)
+        .where(table.c.id == item_id, table.c.cart_id == cart_id)
+        .values(quantity=int(quantity))
+    )
+    if result.rowcount == 0:
+        db.session.rollback()
         return jsonify({"msg": "Cart item not found"}), 404
-
-    cart_item.quantity = int(quantity)
     db.session.commit()
 
     # Return updated cart
-    cart = cart_item.cart
-    cart_items_data = []
-    total_price = 0
-    for item in cart.items:
-        item_data = {
-            "id": item.id,
-            "cart_id": cart.id,
-            "product_id": item.product.id,
-            "quantity": item.quantity,
-            "product": {
-                "id": item.product.id,
-                "barcode": item.product.barcode,
-                "name": item.product.name,
-                "price": item.product.price
-            }
-        }
-        cart_items_data.append(item_data)
-        total_price += item.product.price * item.quantity
-
+    cart = cart_cache.set_quantity(user_id, version, item_id, int(quantity)) or _cart_view(user_id)[0]
     return jsonify({
         "message": "Cart updated",
-        "cart": {
-            "id": cart.id,
-            "user_id": cart.user_id,
-            "items": cart_items_data,
-            "total": round(total_price, 2)
-        }
+        "cart": cart
     })
 
 @cart_bp.route('/items/<int:item_id>', methods=['DELETE'])
@@ -132,40 +190,219 @@ def update_cart_item(item_id):
 def remove_item_from_cart(item_id):
     """Removes a specific item from the cart."""
     user_id = get_jwt_identity()
-    cart_item = CartItem.query.get(item_id)
 
-    if not cart_item or cart_item.cart.user_id != int(user_id):
+    table = CartItem.__table__
+    cart_id, version = _touch_cart(user_id)
+    result = db.session.execute(
+        db.delete(table).where(table.c.id == item_id, table.c.cart_id == cart_id)
+    )
+    if result.rowcount == 0:
+        db.session.rollback()
         return jsonify({"msg": "Cart item not found"}), 404
-
-    cart = cart_item.cart
-    db.session.delete(cart_item)
     db.session.commit()
 
     # Return updated cart
-    cart_items_data = []
-    total_price = 0
-    for item in cart.items:
-        item_data = {
-            "id": item.id,
-            "cart_id": cart.id,
-            "product_id": item.product.id,
-            "quantity": item.quantity,
-            "product": {
-                "id": item.product.id,
-                "barcode": item.product.barcode,
-                "name": item.product.name,
-                "price": item.product.price
-            }
-        }
-        cart_items_data.append(item_data)
-        total_price += item.product.price * item.quantity
-
+    cart = cart_cache.remove_line(user_id, version, item_id) or _cart_view(user_id)[0]
     return jsonify({
         "message": "Item removed from cart",
-        "cart": {
-            "id": cart.id,
-            "user_id": cart.user_id,
-            "items": cart_items_data,
-            "total": round(total_price, 2)
-        }
+        "cart": cart
+    })
+
+# Upper bound on operations accepted by one batch request
+MAX_BATCH_OPERATIONS = 100
+
+def _validate_batch_operation(op):
+    """Returns an error message for a malformed batch operation, or None."""
+    kind = op.get('op') if isinstance(op, dict) else None
+    if kind not in ('add', 'set', 'remove'):
+        return "op must be one of 'add', 'set' or 'remove'"
+    item_id, barcode = op.get('item_id'), op.get('barcode')
+    if item_id is not None and (not isinstance(item_id, int) or isinstance(item_id, bool)):
+        return "item_id must be an integer"
+    if barcode is not None and (not isinstance(barcode, str) or not barcode.strip()):
+        return "barcode must be a non-empty string"
+    if kind == 'add' and not op.get('barcode'):
+        return "'add' requires a barcode"
+    if kind in ('set', 'remove') and op.get('item_id') is None and not op.get('barcode'):
+        return f"'{kind}' requires an item_id or barcode"
+    if kind in ('add', 'set'):
+        try:
+            if int(op.get('quantity', 1 if kind == 'add' else 0)) < 1:
+                return "quantity must be at least 1"
+        except (TypeError, ValueError):
+            return "quantity must be an integer"
+    return None
+
+def _cart_line_filter(table, cart_id, op, products):
+    """WHERE clause selecting the cart line an operation targets (by item_id or barcode)."""
+    if op.get('item_id') is not None:
+        return db.and_(table.c.cart_id == cart_id, table.c.id == int(op['item_id']))
+    return db.and_(table.c.cart_id == cart_id, table.c.product_id == products[op['barcode']]['id'])
+
+@cart_bp.route('/batch', methods=['POST'])
+@jwt_required()
+def batch_update_cart():
+    """
+    Applies an ordered list of cart operations atomically and returns the final cart.
+
+    Body: { "operations": [
+        {"op": "add", "barcode": "...", "quantity": 2},
+        {"op": "set", "item_id": 7, "quantity": 3},      # or "barcode"
+        {"op": "remove", "item_id": 9}                   # or "barcode"
+    ] }
+    If any operation fails, none are applied.
+    """
+    user_id = get_jwt_identity()
+    data = request.get_json(silent=True) or {}
+    operations = data.get('operations')
+
+    if not isinstance(operations, list) or not operations:
+        return jsonify({"msg": "A non-empty list of operations is required"}), 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({"msg": f"At most {MAX_BATCH_OPERATIONS} operations are allowed per batch"}), 400
+    for index, op in enumerate(operations):
+        error = _validate_batch_operation(op)
+        if error:
+            return jsonify({"msg": error, "op_index": index}), 400
+
+    # Resolve every barcode up front with a single lookup
+    barcodes = [op['barcode'] for op in operations if op.get('barcode') and op.get('item_id') is None]
+    products, missing = barcode_cache.lookup_many(barcodes) if barcodes else ({}, [])
+    for index, op in enumerate(operations):
+        if op.get('item_id') is None and op.get('barcode') in missing:
+            return jsonify({"msg": "Product not found", "barcode": op['barcode'], "op_index": index}), 404
+
+    table = CartItem.__table__
+    cart_id, _ = _touch_cart(user_id)
+    for index, op in enumerate(operations):
+        if op['op'] == 'add':
+            _upsert_cart_item(cart_id, products[op['barcode']]['id'], int(op.get('quantity', 1)))
+            continue
+
+        where = _cart_line_filter(table, cart_id, op, products)
+        if op['op'] == 'set':
+            result = db.session.execute(db.update(table).where(where).values(quantity=int(op['quantity'])))
+        else:
+            result = db.session.execute(db.delete(table).where(where))
+        if result.rowcount == 0:
+            db.session.rollback()
+            return jsonify({"msg": "Cart item not found", "op_index": index}), 404
+
+    db.session.commit()
+
+    return jsonify({
+        "message": "Cart updated",
+        "applied": len(operations),
+        "cart": _cart_view(user_id)[0]
+    })
+
+
+# Upper bound on scan events accepted by one journal upload
+MAX_JOURNAL_EVENTS = 500
+# Largest quantity one scan event may add or void
+MAX_JOURNAL_QUANTITY = 1000
+
+def _parse_client_timestamp(value):
+    """Accepts ISO-8601 strings or epoch seconds/milliseconds; returns a naive UTC datetime or None."""
+    if value is None:
+        return None
+    try:
+        if isinstance(value, (int, float)):
+            # Heuristic: values this large are milliseconds
+            return datetime.utcfromtimestamp(value / 1000 if value > 1e11 else value)
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        return parsed.replace(tzinfo=None) if parsed.tzinfo is None else \
+            datetime.utcfromtimestamp(parsed.timestamp())
+    except (ValueError, OverflowError, OSError):
+        return None
+
+@cart_bp.route('/journal', methods=['POST'])
+@jwt_required()
+def replay_scan_journal():
+    """
+    Replays scans buffered offline by a handheld and returns the reconciled cart.
+
+    Body: { "events": [
+        {"event_id": "device-uuid-1", "barcode": "...", "quantity": 1, "scanned_at": "2025-01-01T10:00:00Z"},
+        ...
+    ] }
+    event_id must be unique per device scan; quantity defaults to 1, may be
+    negative to void a scan, and is at most MAX_JOURNAL_QUANTITY either way. Events already received are skipped, so retried
+    uploads never double-count.
+    """
+    user_id = int(get_jwt_identity())
+    data = request.get_json(silent=True) or {}
+    events = data.get('events')
+
+    if not isinstance(events, list) or not events:
+        return jsonify({"msg": "A non-empty list of events is required"}), 400
+    if len(events) > MAX_JOURNAL_EVENTS:
+        return jsonify({"msg": f"At most {MAX_JOURNAL_EVENTS} events are allowed per upload"}), 400
+
+    rows = {}
+    for index, event in enumerate(events):
+        if not isinstance(event, dict) or not event.get('event_id') or not event.get('barcode'):
+            return jsonify({"msg": "Each event needs an event_id and barcode", "event_index": index}), 400
+        try:
+            quantity = int(event.get('quantity', 1))
+        except (TypeError, ValueError):
+            quantity = 0
+        if quantity == 0:
+            return jsonify({"msg": "quantity must be a non-zero integer", "event_index": index}), 400
+        if abs(quantity) > MAX_JOURNAL_QUANTITY:
+            return jsonify({"msg": f"quantity must be between -{MAX_JOURNAL_QUANTITY} and {MAX_JOURNAL_QUANTITY}",
+                            "event_index": index}), 400
+        event_id = str(event['event_id'])[:64]
+        rows.setdefault(event_id, {
+            "user_id": user_id,
+            "event_id": event_id,
+            "barcode": str(event['barcode']),
+            "quantity": quantity,
+            "scanned_at": _parse_client_timestamp(event.get('scanned_at')),
+            "received_at": datetime.utcnow(),
+        })
+
+    products, unknown = barcode_cache.lookup_many([row["barcode"] for row in rows.values()])
+
+    # Record every event (unknown barcodes too, so their retries are also skipped);
+    # only rows actually inserted now are new
+    table = ScanEvent.__table__
+    stmt = dialect_insert(table).values(list(rows.values()))
+    stmt = stmt.on_conflict_do_nothing(index_elements=['user_id', 'event_id']).returning(table.c.event_id)
+    new_ids = set(db.session.execute(stmt).scalars())
+
+    # Fold new scans into net quantity changes per product, in client scan order
+    new_events = sorted(
+        (row for event_id, row in rows.items() if event_id in new_ids),
+        key=lambda row: row["scanned_at"] or datetime.min
+    )
+    deltas = {}
+    applied = 0
+    for row in new_events:
+        product = products.get(row["barcode"])
+        if product:
+            deltas[product["id"]] = deltas.get(product["id"], 0) + row["quantity"]
+            applied += 1
+
+    cart_id, _ = _touch_cart(user_id)
+    items = CartItem.__table__
+    for product_id, delta in deltas.items():
+        if delta > 0:
+            _upsert_cart_item(cart_id, product_id, delta)
+        elif delta < 0:
+            db.session.execute(
+                db.update(items)
+                .where(items.c.cart_id == cart_id, items.c.product_id == product_id)
+                .values(quantity=items.c.quantity + delta)
+            )
+    if any(delta < 0 for delta in deltas.values()):
+        db.session.execute(db.delete(items).where(items.c.cart_id == cart_id, items.c.quantity <= 0))
+    db.session.commit()
+
+    return jsonify({
+        "message": "Scan journal applied",
+        "applied": applied,  # New events for known barcodes
+        "duplicates": [event_id for event_id in rows if event_id not in new_ids],
+        "unknown_barcodes": sorted(set(unknown)),
+        "cart": _cart_view(user_id)[0]
     })
@@ -0,0 +1,88 @@
+"""
+Abandoned Cart Sweeper
+Empties carts that have been idle past a TTL. Items are deleted in small
+batches, each in its own short transaction, so the sweep never holds a long
+write lock on SQLite.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from ..extensions import db
+from ..models import Cart, CartItem
+
+DEFAULT_IDLE_MINUTES = int(os.getenv('CART_IDLE_TTL_MINUTES', 240))
+DEFAULT_BATCH_SIZE = int(os.getenv('CART_SWEEP_BATCH_SIZE', 500))
+
+
+def sweep_abandoned_carts(idle_minutes=DEFAULT_IDLE_MINUTES, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Delete the items of carts idle longer than idle_minutes
+
+    Cart rows are kept (their version is bumped so cached views are dropped).
+    Every delete re-checks the cart is still idle, so a customer who resumes
+    scanning mid-sweep keeps their items.
+
+    Args:
+        idle_minutes (int): Idle time after which a cart counts as abandoned
+        batch_size (int): Maximum rows deleted per transaction
+
+    Returns:
+        dict: Carts emptied, items deleted and transactions used
+    """
+    cutoff = datetime.utcnow() - timedelta(minutes=idle_minutes)
+    carts, items_table = Cart.__table__, CartItem.__table__
+    report = {"carts": 0, "items": 0, "batches": 0}
+
+    while True:
+        cart_ids = db.session.execute(
+            db.select(carts.c.id)
+            .where(
+                carts.c.updated_at < cutoff,
+                db.exists().where(items_table.c.cart_id == carts.c.id)
+            )
+            .limit(batch_size)
+        ).scalars().all()
+        if not cart_ids:
+            break
+
+        still_idle = db.and_(carts.c.id.in_(cart_ids), carts.c.updated_at < cutoff)
+        emptied = False
+        while not emptied:
+            doomed = (
+                db.select(items_table.c.id)
+                .join(carts, carts.c.id == items_table.c.cart_id)
+                .where(still_idle)
+                .limit(batch_size)
+            )
+            deleted = db.session.execute(db.delete(items_table).where(items_table.c.id.in_(doomed))).rowcount
+            db.session.execute(db.update(carts).where(still_idle).values(version=carts.c.version + 1))
+            db.session.commit()
+            report["items"] += deleted
+            report["batches"] += 1
+            emptied = deleted < batch_size
+
+        report["carts"] += len(cart_ids)
+
+    return report
+
+
+def start_cart_sweeper(app, interval_seconds):
+    """Run the sweeper periodically on a daemon thread inside this process"""
+    def run():
+        while True:
+            time.sleep(interval_seconds)
+            with app.app_context():
+                try:
+                    report = sweep_abandoned_carts()
+                    if report["items"]:
+                        print(f"[INFO] Cart sweeper reclaimed {report['items']} items from {report['carts']} carts")
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"[ERROR] Cart sweep failed: {str(e)}")
+                finally:
+                    db.session.remove()
+
+    thread = threading.Thread(target=run, name='cart-sweeper', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,192 @@
+"""
+Idempotency Keys
+Lets clients retry non-idempotent POSTs safely. A request carrying an
+Idempotency-Key header claims (user, endpoint, key) with a single conflict-free
+insert; the first request runs the handler and stores its response, retries get
+the stored response back without running it again, and a duplicate that arrives
+while the first is still running waits for it instead of redoing the work.
+Requests without the header run exactly as before.
+"""
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import request, jsonify, make_response, Response
+from flask_jwt_extended import get_jwt_identity
+from .extensions import db
+from .models import IdempotencyKey
+from .sql_helpers import dialect_insert
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+PURGE_INTERVAL_SECONDS = 600
+
+
+class IdempotencyStore:
+    def __init__(self):
+        """Read TTL and wait limits from the environment"""
+        self.ttl = timedelta(hours=int(os.getenv('IDEMPOTENCY_KEY_TTL_HOURS', 24)))
+        # How long a duplicate waits for the in-flight request before answering 409
+        self.wait_seconds = float(os.getenv('IDEMPOTENCY_WAIT_SECONDS', 30))
+        # An in-flight claim older than this was left by a crashed worker and may be taken over
+        self.lock_timeout = timedelta(seconds=int(os.getenv('IDEMPOTENCY_LOCK_TIMEOUT_SECONDS', 120)))
+        self._lock = threading.Lock()
+        # (user_id, scope, key) -> Event set when this process finishes the request,
+        # so local duplicates wake immediately instead of polling
+        self._events = {}
+        self._next_purge = 0.0
+
+    def run(self, user_id, scope, key, request_hash, handler):
+        """
+        Run handler once per (user_id, scope, key) within the TTL
+
+        Returns:
+            Response: The handler's response, the stored response for a retry (marked with
+            an Idempotent-Replayed header), 422 if the key was used for a different
+            request body, or 409 if the original request is still running after the wait
+        """
+        ident = (user_id, scope, key)
+        deadline = time.monotonic() + self.wait_seconds
+        delay = 0.05
+        self._purge_expired()
+        while True:
+            if self._claim(user_id, scope, key, request_hash):
+                return self._execute(ident, handler)
+
+            row = self._load(user_id, scope, key)
+            now = datetime.utcnow()
+            if row is None:
+                continue  # Released between our insert and select; claim again
+            if row.expires_at <= now or (row.status == 'in_flight' and row.created_at <= now - self.lock_timeout):
+                self._take_over(row.id, now)
+                continue
+            if row.request_hash != request_hash:
+                return jsonify(msg="Idempotency-Key was already used for a different request"), 422
+            if row.status == 'done':
+                response = Response(row.response_body, status=row.response_status, mimetype=row.response_mimetype)
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                response = jsonify(msg="A request with this Idempotency-Key is still in progress")
+                response.headers['Retry-After'] = '1'
+                return response, 409
+            with self._lock:
+                event = self._events.get(ident)
+            if event is not None:
+                event.wait(remaining)
+            else:
+                time.sleep(min(delay, remaining))
+                delay = min(delay * 2, 1.0)
+            db.session.rollback()  # End the read so the next poll sees the other worker's commit
+
+    def _claim(self, user_id, scope, key, request_hash):
+        now = datetime.utcnow()
+        stmt = dialect_insert(IdempotencyKey.__table__).values(
+            user_id=user_id, scope=scope, key=key, request_hash=request_hash,
+            status='in_flight', created_at=now, expires_at=now + self.ttl,
+        ).on_conflict_do_nothing(index_elements=['user_id', 'scope', 'key']).returning(IdempotencyKey.id)
+        claimed = db.session.execute(stmt).first() is not None
+        db.session.commit()
+        return claimed
+
+    def _load(self, user_id, scope, key):
+        # Plain columns rather than an entity, so polling never reads a stale identity-map copy
+        return db.session.execute(
+            db.select(
+                IdempotencyKey.id, IdempotencyKey.request_hash, IdempotencyKey.status,
+                IdempotencyKey.response_status, IdempotencyKey.response_body,
+                IdempotencyKey.response_mimetype, IdempotencyKey.created_at, IdempotencyKey.expires_at,
+            ).where(IdempotencyKey.user_id == user_id, IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+        ).first()
+
+    def _take_over(self, row_id, now):
+        """Drop an expired or abandoned claim; the conditions are rechecked so a live claim survives races"""
+        db.session.execute(db.delete(IdempotencyKey).where(
+            IdempotencyKey.id == row_id,
+            db.or_(
+                IdempotencyKey.expires_at <= now,
+                db.and_(IdempotencyKey.status == 'in_flight', IdempotencyKey.created_at <= now - self.lock_timeout),
+            ),
+        ))
+        db.session.commit()
+
+    def _execute(self, ident, handler):
+        user_id, scope, key = ident
+        where = (IdempotencyKey.user_id == user_id, IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+        event = threading.Event()
+        with self._lock:
+            self._events[ident] = event
+        try:
+            try:
+                response = make_response(handler())
+            except Exception:
+                db.session.rollback()
+                db.session.execute(db.delete(IdempotencyKey).where(*where))
+                db.session.commit()
+                raise
+
+            if 200 <= response.status_code < 300 and not response.is_streamed:
+                # Only successes are replayed; after a failure the key is free again, so the
+                # client can fix the problem (or wait out a Stripe hiccup) and retry with it
+                db.session.execute(db.update(IdempotencyKey).where(*where).values(
+                    status='done',
+                    response_status=response.status_code,
+                    response_body=response.get_data(as_text=True),
+                    response_mimetype=response.mimetype,
+                ))
+            else:
+                db.session.rollback()
+                db.session.execute(db.delete(IdempotencyKey).where(*where))
+            db.session.commit()
+            return response
+        finally:
+            with self._lock:
+                self._events.pop(ident, None)
+            event.set()
+
+    def _purge_expired(self):
+        """Delete expired keys, at most once per PURGE_INTERVAL_SECONDS per process"""
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_purge:
+                return
+            self._next_purge = now + PURGE_INTERVAL_SECONDS
+        db.session.execute(db.delete(IdempotencyKey).where(IdempotencyKey.expires_at <= datetime.utcnow()))
+        db.session.commit()
+
+
+# Create singleton instance
+idempotency_store = IdempotencyStore()
+
+
+def idempotent(scope):
+    """
+    Make a JWT-protected POST endpoint honour the Idempotency-Key header
+
+    Args:
+        scope (str): Endpoint name; the same key may be reused on different endpoints
+
+    Usage:
+        @bp.route('/checkout', methods=['POST'])
+        @jwt_required()
+        @idempotent('checkout')
+        def checkout(): ...
+    """
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return fn(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return jsonify(msg=f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters"), 400
+            request_hash = hashlib.sha256(request.get_data()).hexdigest()
+            return idempotency_store.run(
+                int(get_jwt_identity()), scope, key, request_hash, lambda: fn(*args, **kwargs)
+            )
+        return decorator
+    return wrapper
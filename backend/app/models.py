@@ -35,33 +35,110 @@ class Cart(db.Model):
     __tablename__ = 'carts'
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, unique=True)
-    items = db.relationship('CartItem', backref='cart', cascade="all, delete-orphan")
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Bumped by every cart mutation
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # Last mutation, used to sweep abandoned carts
+    items = db.relationship('CartItem', backref='cart', cascade="all, delete-orphan", order_by='CartItem.id')
 
 class CartItem(db.Model):
     __tablename__ = 'cart_items'
+    __table_args__ = (db.UniqueConstraint('cart_id', 'product_id', name='uq_cart_items_cart_product'),)
     id = db.Column(db.Integer, primary_key=True)
     cart_id = db.Column(db.Integer, db.ForeignKey('carts.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False, default=1)
     product = db.relationship('Product')
 
+class ScanEvent(db.Model):
+    """Client-generated scan events replayed from offline handhelds, kept for idempotency."""
+    __tablename__ = 'scan_events'
+    __table_args__ = (db.UniqueConstraint('user_id', 'event_id', name='uq_scan_events_user_event'),)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    event_id = db.Column(db.String(64), nullable=False)
+    barcode = db.Column(db.String(80), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)  # Negative for voided scans
+    scanned_at = db.Column(db.DateTime, nullable=True)  # Client clock
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class Transaction(db.Model):
     __tablename__ = 'transactions'
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     total_amount = db.Column(db.Float, nullable=False)
     payment_intent_id = db.Column(db.String(255), nullable=True)  # Stripe payment intent ID
-    qr_code = db.Column(db.Text)
+    qr_code = db.Column(db.Text)  # Legacy rendered image; no longer written (see convert_exit_pass_qr_codes.py)
+    exit_pass_payload = db.Column(db.Text, nullable=True)  # Signed content encoded in the exit-pass QR
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     requires_audit = db.Column(db.Boolean, default=False)  # Security audit flag
     audit_reason = db.Column(db.String(255), nullable=True)  # Why audit was triggered
+    audit_rules = db.Column(db.Text, nullable=True)  # JSON list of every audit rule that fired
     items = db.relationship('TransactionItem', backref='transaction', cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Keyset pagination of a user's history, newest first
+        db.Index('ix_transactions_user_created', 'user_id', 'created_at', 'id'),
+    )
+
+class UserOrderStats(db.Model):
+    """Running count and sum of a user's transactions, kept by checkout so audits don't scan history."""
+    __tablename__ = 'user_order_stats'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    order_total = db.Column(db.Float, nullable=False, default=0)
+
+class ExitPassUse(db.Model):
+    """First successful verification of a transaction's exit pass; a second one is a replay."""
+    __tablename__ = 'exit_pass_uses'
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transactions.id'), primary_key=True)
+    nonce = db.Column(db.String(32), nullable=True)  # Nonce of the pass presented (None for legacy passes)
+    verified_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    used_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+class ExitPassRevocation(db.Model):
+    """Exit passes that must no longer be accepted (e.g. refunded transactions); synced to gates."""
+    __tablename__ = 'exit_pass_revocations'
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transactions.id'), primary_key=True)
+    reason = db.Column(db.String(255), nullable=True)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
 class TransactionItem(db.Model):
     __tablename__ = 'transaction_items'
     id = db.Column(db.Integer, primary_key=True)
-    transaction_id = db.Column(db.Integer, db.ForeignKey('transactions.id'), nullable=False)
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transactions.id'), nullable=False, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
     price_at_purchase = db.Column(db.Float, nullable=False)
-    product = db.relationship('Product')
\ No newline at end of file
+    product = db.relationship('Product')
+
+class CatalogRevision(db.Model):
+    """Single-row counter bumped by every product write; drives catalog ETags."""
+    __tablename__ = 'catalog_revision'
+    id = db.Column(db.Integer, primary_key=True)
+    revision = db.Column(db.Integer, nullable=False, default=0)
+
+class ProductChange(db.Model):
+    """Append-only log of catalog writes, used by devices for delta sync."""
+    __tablename__ = 'product_changes'
+    id = db.Column(db.Integer, primary_key=True)
+    revision = db.Column(db.Integer, nullable=False, index=True)
+    product_id = db.Column(db.Integer, nullable=False)  # No FK: deleted products stay in the log
+    barcode = db.Column(db.String(80), nullable=False)
+    op = db.Column(db.String(10), nullable=False)  # 'upsert' or 'delete'
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class IdempotencyKey(db.Model):
+    """Stored outcome of a request made with an Idempotency-Key header, replayed on retries."""
+    __tablename__ = 'idempotency_keys'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    scope = db.Column(db.String(50), nullable=False)  # Endpoint the key was used on
+    key = db.Column(db.String(255), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='in_flight')  # 'in_flight' or 'done'
+    response_status = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+    response_mimetype = db.Column(db.String(100), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    __table_args__ = (db.UniqueConstraint('user_id', 'scope', 'key', name='uq_idempotency_keys_user_scope_key'),)
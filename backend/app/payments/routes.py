@@ -3,8 +3,13 @@ Payment API Routes
 """
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from ..models import Transaction, TransactionItem, Cart, CartItem
+from ..models import Transaction
 from ..extensions import db
+from ..idempotency import idempotent
+from ..transactions.exit_pass import exit_pass_url
+from ..transactions.checkout import summarize_cart, place_order, CartChangedError
+from ..transactions.audit_rules import audit_engine
+from ..transactions.pass_uses import exit_pass_uses
 from .stripe_service import stripe_service
 
 payment_bp = Blueprint('payments', __name__, url_prefix='/api/payments')
@@ -26,14 +31,13 @@ def create_payment_intent():
     try:
         user_id = get_jwt_identity()
 
-        # Get cart total
-        cart = Cart.query.filter_by(user_id=user_id).first()
+        # Get cart total (in dollars)
+        summary = summarize_cart(user_id)
 
-        if not cart or not cart.items:
+        if not summary or not summary["line_count"]:
             return jsonify({'error': 'Cart is empty'}), 400
 
-        # Calculate total in dollars
-        total_dollars = sum(item.product.price * item.quantity for item in cart.items)
+        total_dollars = summary["total"]
 
         print(f"[DEBUG] Creating payment intent for ${total_dollars:.2f}")
 
@@ -42,7 +46,7 @@ def create_payment_intent():
             amount=total_dollars,  # Pass dollars, service converts to cents
             metadata={
                 'user_id': user_id,
-                'cart_id': cart.id if cart else None
+                'cart_id': summary['cart_id']
             }
         )
 
@@ -63,6 +67,7 @@ def create_payment_intent():
 
 @payment_bp.route('/confirm-payment', methods=['POST'])
 @jwt_required()
+@idempotent('confirm-payment')
 def confirm_payment():
     """Confirm payment and create transaction"""
     try:
@@ -96,113 +101,42 @@ def confirm_payment():
                 'details': 'Payment must be in succeeded status to create order'
             }), 400
 
-        # Get user's cart
-        cart = Cart.query.filter_by(user_id=user_id).first()
+        # Total the user's cart in SQL (in dollars) - don't use Stripe amount which is in cents
+        summary = summarize_cart(user_id)
 
-        if not cart or not cart.items:
+        if not summary or not summary["line_count"]:
             print("[ERROR] Cart is empty or not found")
             return jsonify({'error': 'Cart is empty'}), 400
 
-        print(f"[DEBUG] Cart has {len(cart.items)} items")
+        print(f"[DEBUG] Cart has {summary['line_count']} items")
+
+        total_amount = summary["total"]
 
-        # Calculate total from cart (in dollars) - don't use Stripe amount which is in cents
-        total_amount = sum(item.product.price * item.quantity for item in cart.items)
-        
         print(f"[DEBUG] Creating transaction for ${total_amount:.2f}")
 
-        # Determine if transaction requires audit (10% random + high-value/bulk triggers)
-        import random
-        requires_audit = False
-        audit_reason = None
-
-        # 10% random audit
-        if random.random() < 0.10:
-            requires_audit = True
-            audit_reason = "Random security check"
-
-        # High-value transaction ($100+)
-        if total_amount >= 100:
-            requires_audit = True
-            audit_reason = "High-value transaction"
-
-        # Bulk purchase (5+ of same item)
-        for cart_item in cart.items:
-            if cart_item.quantity >= 5:
-                requires_audit = True
-                audit_reason = "Bulk purchase detected"
-                break
-
-        # Create transaction record
-        transaction = Transaction(
-            user_id=user_id,
-            total_amount=total_amount,  # Use calculated amount in dollars
-            payment_intent_id=payment_intent_id,
-            requires_audit=requires_audit,
-            audit_reason=audit_reason
-        )
+        # Decide on a manual audit from the configured rules (see transactions/audit_rules.py)
+        audit = audit_engine.decide(user_id, summary)
 
-        db.session.add(transaction)
-        db.session.flush()  # Get transaction ID without committing
-
-        print(f"[DEBUG] Transaction record created with ID: {transaction.id}")
-
-        # Add transaction items
-        for cart_item in cart.items:
-            transaction_item = TransactionItem(
-                transaction_id=transaction.id,
-                product_id=cart_item.product_id,
-                quantity=cart_item.quantity,
-                price_at_purchase=cart_item.product.price
-            )
-            db.session.add(transaction_item)
-            print(f"[DEBUG] Added transaction item: {cart_item.product.name} x {cart_item.quantity}")
-
-        # Clear cart items but keep the cart
-        CartItem.query.filter_by(cart_id=cart.id).delete()
-
-        # Generate Exit Pass QR Code
-        import qrcode
-        import io
-        import base64
-        import json
-
-        # QR code contains transaction verification data
-        qr_data = {
-            'transaction_id': transaction.id,
-            'user_id': user_id,
-            'amount': total_amount,
-            'timestamp': transaction.created_at.isoformat(),
-            'items_count': len(transaction.items)
-        }
-
-        # Create QR code
-        qr = qrcode.QRCode(version=1, box_size=10, border=4)
-        qr.add_data(json.dumps(qr_data))
-        qr.make(fit=True)
-
-        # Generate QR code image
-        qr_image = qr.make_image(fill_color="black", back_color="white")
-
-        # Convert to base64 for storage and display
-        buffer = io.BytesIO()
-        qr_image.save(buffer, format='PNG')
-        qr_base64 = base64.b64encode(buffer.getvalue()).decode()
-
-        # Save QR code to transaction
-        transaction.qr_code = f"data:image/png;base64,{qr_base64}"
-
-        # Commit all changes
-        db.session.commit()
+        # Create the transaction and its items, clear the cart and commit
+        try:
+            order = place_order(user_id, summary, payment_intent_id=payment_intent_id, **audit)
+        except CartChangedError:
+            return jsonify({'error': 'Cart changed during checkout, please try again'}), 409
 
-        print(f"[SUCCESS] Transaction {transaction.id} created with Exit Pass QR code for ${total_amount:.2f}")
+        transaction = order["transaction"]
+        exit_pass_str = order["exit_pass_payload"]
+
+        print(f"[SUCCESS] Transaction {transaction['id']} created with signed Exit Pass for ${total_amount:.2f}")
 
         return jsonify({
             'message': 'Payment successful',
-            'transaction_id': transaction.id,
+            'transaction_id': transaction['id'],
             'total_amount': total_amount,
-            'qr_code': transaction.qr_code,
-            'requires_audit': transaction.requires_audit,
-            'audit_reason': transaction.audit_reason
+            'exit_pass_url': exit_pass_url(transaction['id'], exit_pass_str),
+            'qr_payload': exit_pass_str,
+            'requires_audit': transaction['requires_audit'],
+            'audit_reason': transaction['audit_reason'],
+            'audit_rules': transaction['audit_rules']
         }), 200
 
     except Exception as e:
@@ -240,6 +174,10 @@ def refund_payment():
         # Process refund
         refund = stripe_service.refund_payment(transaction.payment_intent_id)
 
+        # A refunded purchase must not be walked out with
+        exit_pass_uses.revoke(transaction.id, reason="refunded")
+        db.session.commit()
+
         return jsonify({
             'message': 'Refund processed',
             'refund_id': refund['refund_id'],
@@ -0,0 +1,164 @@
+"""
+Barcode Lookup Cache
+Keeps recently scanned products, and recently missed barcodes, in process memory
+so repeated scans don't hit the database
+"""
+import os
+import threading
+from cachetools import TTLCache
+from ..models import Product
+from .catalog_revision import catalog_revision
+
+
+def product_to_dict(product):
+    """Serialize a Product row into the shape returned by the products API"""
+    return {
+        "id": product.id,
+        "barcode": product.barcode,
+        "name": product.name,
+        "price": product.price,
+        "category": product.category,
+        "description": product.description,
+        "image_url": product.image_url
+    }
+
+
+class BarcodeCache:
+    def __init__(self):
+        """Initialize bounded LRU/TTL caches sized from the environment"""
+        self._lock = threading.Lock()
+        self._products = TTLCache(
+            maxsize=int(os.getenv('BARCODE_CACHE_SIZE', 10000)),
+            ttl=int(os.getenv('BARCODE_CACHE_TTL', 300)),
+        )
+        # Unknown barcodes (misreads, unlabeled items) so repeated misses never reach SQL
+        self._missing = TTLCache(
+            maxsize=int(os.getenv('BARCODE_NEGATIVE_CACHE_SIZE', 10000)),
+            ttl=int(os.getenv('BARCODE_NEGATIVE_CACHE_TTL', 60)),
+        )
+        # Bumped by invalidate() and clear(); a lookup that raced one of them doesn't store its row
+        self._generation = 0
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def lookup(self, barcode):
+        """
+        Resolve a barcode to a product
+
+        Args:
+            barcode (str): The scanned barcode
+
+        Returns:
+            dict: Serialized product, or None if no product has this barcode
+        """
+        # Clears this cache (via subscribe below) if another worker changed the catalog
+        catalog_revision.current()
+        with self._lock:
+            product = self._products.get(barcode)
+            if product is not None:
+                self.hits += 1
+                return product
+            if barcode in self._missing:
+                self.negative_hits += 1
+                return None
+            self.misses += 1
+            generation = self._generation
+
+        row = Product.query.filter_by(barcode=barcode).first()
+        product = product_to_dict(row) if row else None
+
+        with self._lock:
+            # The row may predate a write committed since the miss; return it but don't cache it
+            if generation == self._generation:
+                if product is not None:
+                    self._products[barcode] = product
+                else:
+                    self._missing[barcode] = True
+        return product
+
+    def lookup_many(self, barcodes):
+        """
+        Resolve several barcodes, querying the database once for all cache misses
+
+        Args:
+            barcodes (list): Scanned barcodes
+
+        Returns:
+            tuple: (dict of barcode -> serialized product, list of barcodes with no product)
+        """
+        catalog_revision.current()
+        found = {}
+        missing = []
+        to_query = []
+        with self._lock:
+            for barcode in dict.fromkeys(barcodes):
+                product = self._products.get(barcode)
+                if product is not None:
+                    self.hits += 1
+                    found[barcode] = product
+                elif barcode in self._missing:
+                    self.negative_hits += 1
+                    missing.append(barcode)
+                else:
+                    self.misses += 1
+                    to_query.append(barcode)
+            generation = self._generation
+
+        if to_query:
+            rows = Product.query.filter(Product.barcode.in_(to_query)).all()
+            loaded = {row.barcode: product_to_dict(row) for row in rows}
+            with self._lock:
+                # Rows read across an invalidation may be stale; return them but don't cache them
+                store = generation == self._generation
+                for barcode in to_query:
+                    product = loaded.get(barcode)
+                    if product is not None:
+                        if store:
+                            self._products[barcode] = product
+                        found[barcode] = product
+                    else:
+                        if store:
+                            self._missing[barcode] = True
+                        missing.append(barcode)
+        return found, missing
+
+    def invalidate(self, *barcodes):
+        """Drop cached entries (positive and negative) for the given barcodes"""
+        with self._lock:
+            self._generation += 1
+            for barcode in barcodes:
+                if barcode is None:
+                    continue
+                self._products.pop(barcode, None)
+                self._missing.pop(barcode, None)
+                self.invalidations += 1
+
+    def clear(self):
+        """Drop every cached entry"""
+        with self._lock:
+            self._generation += 1
+            self._products.clear()
+            self._missing.clear()
+
+    def stats(self):
+        """Counters used to size the cache"""
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_ratio": round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+                "size": self._products.currsize,
+                "max_size": self._products.maxsize,
+                "negative_size": self._missing.currsize,
+                "negative_max_size": self._missing.maxsize,
+            }
+
+
+# Create singleton instance
+barcode_cache = BarcodeCache()
+catalog_revision.subscribe(barcode_cache.clear)
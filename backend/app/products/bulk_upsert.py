@@ -0,0 +1,162 @@
+"""
+Bulk Product Upsert
+Parses NDJSON or CSV product feeds and upserts them on barcode in chunked
+executemany batches, one transaction per chunk
+"""
+import csv
+import io
+import json
+import math
+from ..extensions import db
+from ..models import Product
+from ..sql_helpers import dialect_insert
+from .barcode_cache import barcode_cache
+from .catalog_revision import catalog_revision
+from .change_log import record_changes
+
+UPSERT_COLUMNS = ("barcode", "name", "price", "category", "description", "image_url")
+DEFAULT_CHUNK_SIZE = 500
+MAX_CHUNK_SIZE = 5000
+
+
+def _text(stream, **kwargs):
+    # Undecodable bytes become lone surrogates so one bad line is rejected, not the whole feed
+    return io.TextIOWrapper(stream, encoding='utf-8', errors='surrogateescape', **kwargs)
+
+
+def _is_valid_utf8(text):
+    try:
+        text.encode('utf-8')
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def _read_ndjson(stream):
+    for line_number, line in enumerate(_text(stream), start=1):
+        if not line.strip():
+            continue
+        if not _is_valid_utf8(line):
+            yield line_number, None, "Invalid UTF-8"
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, None, f"Invalid JSON: {e.msg}"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, "Each line must be a JSON object"
+            continue
+        yield line_number, record, None
+
+
+def _read_csv(stream):
+    reader = csv.DictReader(_text(stream, newline=''))
+    # Line 1 is the header row
+    for line_number, record in enumerate(reader, start=2):
+        if not all(_is_valid_utf8(value) for value in record.values() if isinstance(value, str)):
+            yield line_number, None, "Invalid UTF-8"
+            continue
+        yield line_number, record, None
+
+
+def _clean_row(record):
+    """Validate one feed record, returning (row, error)"""
+    barcode = str(record.get("barcode") or "").strip()
+    name = str(record.get("name") or "").strip()
+    if not barcode or not name:
+        return None, "barcode and name are required"
+    try:
+        price = float(record.get("price"))
+    except (TypeError, ValueError):
+        return None, "price must be a number"
+    # float() accepts "nan" and "inf"; NaN would be stored as NULL and fail the whole chunk
+    if not math.isfinite(price) or price < 0:
+        return None, "price must be a finite, non-negative number"
+
+    row = {"barcode": barcode, "name": name, "price": price}
+    for column in ("category", "description", "image_url"):
+        value = record.get(column)
+        row[column] = str(value) if value not in (None, "") else None
+    return row, None
+
+
+def _upsert_statement():
+    stmt = dialect_insert(Product.__table__)
+    # Optional columns missing from the feed keep their current value
+    return stmt.on_conflict_do_update(
+        index_elements=["barcode"],
+        set_={
+            "name": stmt.excluded.name,
+            "price": stmt.excluded.price,
+            "category": db.func.coalesce(stmt.excluded.category, Product.__table__.c.category),
+            "description": db.func.coalesce(stmt.excluded.description, Product.__table__.c.description),
+            "image_url": db.func.coalesce(stmt.excluded.image_url, Product.__table__.c.image_url),
+        },
+    )
+
+
+def _apply_chunk(rows):
+    """Upsert one chunk in its own transaction; returns (inserted, updated)"""
+    barcodes = list(rows)
+    existing = set(db.session.execute(
+        db.select(Product.barcode).where(Product.barcode.in_(barcodes))
+    ).scalars())
+    db.session.execute(_upsert_statement(), list(rows.values()))
+    revision = catalog_revision.bump()
+    record_changes(revision, db.session.execute(
+        db.select(Product.id, Product.barcode).where(Product.barcode.in_(barcodes))
+    ).all())
+    db.session.commit()
+    catalog_revision.publish(revision)
+    # One invalidation per chunk rather than per row
+    barcode_cache.invalidate(*barcodes)
+    return len(barcodes) - len(existing), len(existing)
+
+
+def bulk_upsert_products(stream, fmt, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Upsert a product feed
+
+    Args:
+        stream: Binary request body stream
+        fmt (str): "ndjson" or "csv"
+        chunk_size (int): Rows per transaction
+
+    Returns:
+        dict: Per-chunk counts and errors plus overall totals
+    """
+    records = _read_csv(stream) if fmt == "csv" else _read_ndjson(stream)
+    chunks = []
+    totals = {"inserted": 0, "updated": 0, "rejected": 0, "failed": 0}
+
+    def flush(rows, errors):
+        result = {"chunk": len(chunks) + 1, "rows": len(rows), "inserted": 0, "updated": 0, "errors": errors}
+        if rows:
+            try:
+                result["inserted"], result["updated"] = _apply_chunk(rows)
+            except Exception as e:
+                db.session.rollback()
+                result["errors"].append({"error": f"Chunk failed and was rolled back: {e}"})
+                totals["failed"] += len(rows)
+        totals["inserted"] += result["inserted"]
+        totals["updated"] += result["updated"]
+        totals["rejected"] += sum(1 for err in errors if "line" in err)
+        chunks.append(result)
+
+    # Keyed by barcode so a repeated barcode within a chunk keeps its last row
+    rows, errors = {}, []
+    for line_number, record, error in records:
+        if error is None:
+            row, error = _clean_row(record)
+        if error:
+            errors.append({"line": line_number, "error": error})
+        else:
+            rows[row["barcode"]] = row
+        if len(rows) >= chunk_size:
+            flush(rows, errors)
+            rows, errors = {}, []
+    if rows or errors:
+        flush(rows, errors)
+
+    return {"chunks": chunks, "totals": totals}
@@ -0,0 +1,97 @@
+"""
+Catalog Revision
+Monotonically increasing catalog version used for product ETags. The value lives in
+the database so every worker agrees on it, and is cached in process so conditional
+requests can be answered without querying products.
+"""
+import os
+import threading
+import time
+from ..extensions import db
+from ..models import CatalogRevision
+
+_ROW_ID = 1
+
+
+class CatalogRevisionTracker:
+    def __init__(self):
+        """Initialize the in-process view of the catalog revision"""
+        self._lock = threading.Lock()
+        self._revision = None
+        self._checked_at = 0.0
+        # How stale (seconds) our view of writes made by other workers may get
+        self.refresh_interval = float(os.getenv('CATALOG_REVISION_REFRESH_SECONDS', 1.0))
+        self._listeners = []
+
+    def subscribe(self, callback):
+        """Register a callback fired when another worker is seen changing the catalog"""
+        self._listeners.append(callback)
+
+    def current(self):
+        """
+        Get the current catalog revision
+
+        Returns:
+            int: Revision, re-read from the database at most once per refresh interval
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._revision is not None and now - self._checked_at < self.refresh_interval:
+                return self._revision
+
+        revision = db.session.execute(db.select(self.revision_expression())).scalar()
+        return self.observe(revision)
+
+    @staticmethod
+    def revision_expression():
+        """Scalar subquery for the stored revision, to read it in the same statement as other columns"""
+        return db.select(CatalogRevision.revision).where(CatalogRevision.id == _ROW_ID).scalar_subquery()
+
+    def observe(self, revision):
+        """
+        Record a revision read from the database (e.g. via revision_expression())
+
+        Returns:
+            int: The current revision
+        """
+        revision = revision or 0
+        with self._lock:
+            changed_elsewhere = self._revision is not None and revision > self._revision
+            if self._revision is None or revision > self._revision:
+                self._revision = revision
+            self._checked_at = time.monotonic()
+            revision = self._revision
+
+        if changed_elsewhere:
+            for callback in self._listeners:
+                callback()
+        return revision
+
+    def bump(self):
+        """
+        Increment the revision inside the caller's transaction (commit is left to the caller)
+
+        Returns:
+            int: The new revision; pass it to publish() once the transaction commits
+        """
+        updated = db.session.execute(
+            db.update(CatalogRevision)
+            .where(CatalogRevision.id == _ROW_ID)
+            .values(revision=CatalogRevision.revision + 1)
+        )
+        if updated.rowcount == 0:
+            db.session.execute(db.insert(CatalogRevision).values(id=_ROW_ID, revision=1))
+        return db.session.execute(
+            db.select(CatalogRevision.revision).where(CatalogRevision.id == _ROW_ID)
+        ).scalar()
+
+    def publish(self, revision):
+        """Record a revision committed by this process"""
+        with self._lock:
+            if self._revision is None or revision > self._revision:
+                self._revision = revision
+            self._checked_at = time.monotonic()
+
+
+# Create singleton instance
+catalog_revision = CatalogRevisionTracker()
@@ -0,0 +1,84 @@
+"""
+Product Change Log
+Records every catalog write against the catalog revision it produced so offline
+devices can sync deltas instead of re-downloading the catalog
+"""
+from datetime import datetime
+from ..extensions import db
+from ..models import Product, ProductChange
+from .barcode_cache import product_to_dict
+
+UPSERT = 'upsert'
+DELETE = 'delete'
+
+
+def record_changes(revision, products, op=UPSERT):
+    """
+    Append change rows inside the caller's transaction
+
+    Args:
+        revision (int): Catalog revision returned by catalog_revision.bump()
+        products (iterable): (product_id, barcode) pairs
+        op (str): 'upsert' or 'delete'
+    """
+    now = datetime.utcnow()
+    rows = [
+        {"revision": revision, "product_id": product_id, "barcode": barcode, "op": op, "created_at": now}
+        for product_id, barcode in products
+    ]
+    if rows:
+        db.session.execute(db.insert(ProductChange), rows)
+
+
+def changes_since(since, limit):
+    """
+    Collect catalog changes made after a revision
+
+    A revision is never split across responses, so a client can always resume
+    from the returned revision. The last change per product wins.
+
+    Args:
+        since (int): Revision the client already has
+        limit (int): Soft cap on change rows read
+
+    Returns:
+        dict: upserts (current product data), deletes, the revision this response
+            brings the client to, and whether more changes remain
+    """
+    changes = ProductChange.query.filter(ProductChange.revision > since) \
+        .order_by(ProductChange.revision, ProductChange.id).limit(limit + 1).all()
+
+    has_more = len(changes) > limit
+    if has_more:
+        boundary = changes[limit].revision
+        complete = [c for c in changes if c.revision < boundary]
+        if complete:
+            changes = complete
+        else:
+            # A single revision (e.g. one bulk chunk) exceeds the limit; send all of it
+            changes = ProductChange.query.filter(ProductChange.revision == boundary) \
+                .order_by(ProductChange.id).all()
+        has_more = ProductChange.query.filter(ProductChange.revision > changes[-1].revision).first() is not None
+
+    latest = {}
+    for change in changes:
+        latest[change.product_id] = change
+
+    upsert_ids = [pid for pid, change in latest.items() if change.op == UPSERT]
+    products = {p.id: p for p in Product.query.filter(Product.id.in_(upsert_ids)).all()} if upsert_ids else {}
+
+    upserts, deletes = [], []
+    for product_id, change in latest.items():
+        product = products.get(product_id) if change.op == UPSERT else None
+        if product is not None:
+            upserts.append(product_to_dict(product))
+        else:
+            deletes.append({"id": product_id, "barcode": change.barcode})
+
+    return {
+        "since": since,
+        "revision": changes[-1].revision if changes else since,
+        "has_more": has_more,
+        "upserts": upserts,
+        "deletes": deletes,
+    }
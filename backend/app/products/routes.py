@@ -1,37 +1,212 @@
-from flask import request, jsonify, Blueprint
+import hashlib
+import json
+from flask import request, jsonify, Blueprint, Response, stream_with_context
 from ..models import Product
 from ..extensions import db
 from ..decorators import admin_required
+from .barcode_cache import barcode_cache
+from .catalog_revision import catalog_revision
+from .search import search_products as run_product_search
+from .change_log import record_changes, changes_since
+from .bulk_upsert import bulk_upsert_products, DEFAULT_CHUNK_SIZE, MAX_CHUNK_SIZE
 
 product_bp = Blueprint('products', __name__)
 
+# Columns a client may request through ?fields=
+PRODUCT_FIELDS = ("id", "barcode", "name", "price", "category", "description", "image_url")
+# Rows fetched from the database cursor per round trip while streaming
+STREAM_BATCH_SIZE = 500
+MAX_PAGE_SIZE = 1000
+MAX_SEARCH_PAGE_SIZE = 100
+MAX_LOOKUP_BARCODES = 200
+MAX_CHANGES_PER_PAGE = 5000
+
+
+def _parse_fields(raw):
+    """Returns the requested columns (always including id), or None if one is unknown."""
+    if not raw:
+        return list(PRODUCT_FIELDS)
+    requested = [f.strip() for f in raw.split(',') if f.strip()]
+    if any(f not in PRODUCT_FIELDS for f in requested):
+        return None
+    # id is the pagination cursor, so clients always get it back
+    return ["id"] + [f for f in dict.fromkeys(requested) if f != "id"]
+
+
+def _catalog_etag(revision, variant=""):
+    """Strong ETag for a catalog representation; variant distinguishes query/format options"""
+    if not variant:
+        return f"catalog-r{revision}"
+    digest = hashlib.sha1(variant.encode("utf-8")).hexdigest()[:12]
+    return f"catalog-r{revision}-{digest}"
+
+
+def _not_modified(etag, revision):
+    response = Response(status=304)
+    return _with_catalog_headers(response, etag, revision)
+
+
+def _with_catalog_headers(response, etag, revision):
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    response.headers['X-Catalog-Revision'] = str(revision)
+    return response
+
+
+def _stream_rows(result, ndjson):
+    """Encodes rows one at a time so memory stays flat regardless of catalog size."""
+    if ndjson:
+        for row in result:
+            yield json.dumps(dict(row._mapping), separators=(",", ":")) + "\n"
+        return
+
+    yield "["
+    first = True
+    for row in result:
+        yield ("" if first else ",") + json.dumps(dict(row._mapping), separators=(",", ":"))
+        first = False
+    yield "]"
+
+
 @product_bp.route('', methods=['GET'])
 def get_products():
-    products = Product.query.all()
-    return jsonify([{
-        "id": p.id,
-        "barcode": p.barcode,
-        "name": p.name,
-        "price": p.price,
-        "category": p.category,
-        "description": p.description,
-        "image_url": p.image_url
-    } for p in products])
+    """
+    Streams the product catalog ordered by id.
+
+    Query params:
+        after_id: keyset cursor, only products with a greater id are returned
+        limit: page size (max 1000); omit to stream the whole catalog
+        fields: comma-separated projection, e.g. id,barcode,price
+        format: "ndjson" for newline-delimited JSON (also chosen via Accept: application/x-ndjson)
+    """
+    fields = _parse_fields(request.args.get('fields'))
+    if fields is None:
+        return jsonify({"error": f"Unknown field requested. Allowed fields: {', '.join(PRODUCT_FIELDS)}"}), 400
+
+    after_id = request.args.get('after_id', type=int)
+    limit = request.args.get('limit', type=int)
+    ndjson = (
+        request.args.get('format') == 'ndjson'
+        or request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
+    )
+
+    # Answer revalidation requests before touching the products table
+    revision = catalog_revision.current()
+    etag = _catalog_etag(revision, f"{request.query_string.decode('utf-8')}|{'ndjson' if ndjson else 'json'}")
+    if etag in request.if_none_match:
+        return _not_modified(etag, revision)
+
+    stmt = db.select(*[getattr(Product, f) for f in fields]).order_by(Product.id)
+    if after_id is not None:
+        stmt = stmt.where(Product.id > after_id)
+    if limit is not None:
+        stmt = stmt.limit(max(1, min(limit, MAX_PAGE_SIZE)))
+
+    result = db.session.execute(stmt.execution_options(yield_per=STREAM_BATCH_SIZE))
+    response = Response(
+        stream_with_context(_stream_rows(result, ndjson)),
+        mimetype='application/x-ndjson' if ndjson else 'application/json'
+    )
+    return _with_catalog_headers(response, etag, revision)
+
+@product_bp.route('/search', methods=['GET'])
+def search_products():
+    """
+    Full-text product search ranked by BM25
+
+    Every match is scored, so ranking is exact. Known limitation: a single word
+    common to much of a 1M-product catalog matches tens of thousands of rows
+    and takes 80-100 ms (benchmark_product_search.py); a second word brings it
+    back to a few ms.
+
+    Query params:
+        q: search text (required)
+        limit: page size (default 20, max 100)
+        offset: number of ranked results to skip
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "Search query 'q' is required"}), 400
+    limit = max(1, min(request.args.get('limit', 20, type=int), MAX_SEARCH_PAGE_SIZE))
+    offset = max(0, request.args.get('offset', 0, type=int))
+
+    revision = catalog_revision.current()
+    etag = _catalog_etag(revision, request.query_string.decode('utf-8'))
+    if etag in request.if_none_match:
+        return _not_modified(etag, revision)
+
+    results, has_more = run_product_search(query, limit=limit, offset=offset)
+    response = jsonify({
+        "query": query,
+        "results": results,
+        "limit": limit,
+        "offset": offset,
+        "has_more": has_more
+    })
+    return _with_catalog_headers(response, etag, revision)
 
 @product_bp.route('/<string:barcode>', methods=['GET'])
 def get_product_by_barcode(barcode):
-    product = Product.query.filter_by(barcode=barcode).first()
+    revision = catalog_revision.current()
+    etag = _catalog_etag(revision)
+    if etag in request.if_none_match:
+        return _not_modified(etag, revision)
+
+    product = barcode_cache.lookup(barcode)
     if not product:
         return jsonify({"error": "Product not found"}), 404
-    return jsonify({
-        "id": product.id,
-        "barcode": product.barcode,
-        "name": product.name,
-        "price": product.price,
-        "category": product.category,
-        "description": product.description,
-        "image_url": product.image_url
-    })
+    return _with_catalog_headers(jsonify(product), etag, revision)
+
+@product_bp.route('/lookup', methods=['POST'])
+def lookup_products():
+    """
+    Resolve many barcodes in one request (basket or shelf sweeps)
+
+    Body: { "barcodes": ["...", ...] }
+    Returns found products keyed by barcode and the barcodes that matched nothing.
+    """
+    data = request.get_json(silent=True) or {}
+    barcodes = data.get('barcodes')
+    if not isinstance(barcodes, list) or not barcodes:
+        return jsonify({"error": "A non-empty 'barcodes' list is required"}), 400
+    if len(barcodes) > MAX_LOOKUP_BARCODES:
+        return jsonify({"error": f"At most {MAX_LOOKUP_BARCODES} barcodes can be looked up at once"}), 400
+    if not all(isinstance(b, str) and b for b in barcodes):
+        return jsonify({"error": "Barcodes must be non-empty strings"}), 400
+
+    found, missing = barcode_cache.lookup_many(barcodes)
+    return jsonify({"products": found, "missing": missing})
+
+@product_bp.route('/changes', methods=['GET'])
+def get_product_changes():
+    """
+    Delta sync for offline devices
+
+    Query params:
+        since: catalog revision the device already has (bootstrap from
+            GET /api/products and its X-Catalog-Revision header)
+        limit: soft cap on change rows per response (default/max 5000)
+    Returns upserts and deletes after `since`, the revision to resume from,
+    and the current head revision.
+    """
+    since = request.args.get('since', type=int)
+    if since is None or since < 0:
+        return jsonify({"error": "A non-negative integer 'since' revision is required"}), 400
+    limit = max(1, min(request.args.get('limit', MAX_CHANGES_PER_PAGE, type=int), MAX_CHANGES_PER_PAGE))
+
+    head = catalog_revision.current()
+    if since >= head:
+        return jsonify({"since": since, "revision": since, "head": head, "has_more": False, "upserts": [], "deletes": []})
+
+    result = changes_since(since, limit)
+    result["head"] = max(head, result["revision"])
+    return jsonify(result)
+
+@product_bp.route('/cache/stats', methods=['GET'])
+@admin_required()
+def get_barcode_cache_stats():
+    """Hit/miss counters for the barcode lookup cache"""
+    return jsonify(barcode_cache.stats())
 
 @product_bp.route('', methods=['POST'])
 @admin_required()
@@ -39,7 +214,12 @@ def create_product():
     data = request.get_json()
     new_product = Product(**data)
     db.session.add(new_product)
+    db.session.flush()
+    revision = catalog_revision.bump()
+    record_changes(revision, [(new_product.id, new_product.barcode)])
     db.session.commit()
+    catalog_revision.publish(revision)
+    barcode_cache.invalidate(new_product.barcode)
     return jsonify({"msg": "Product created", "id": new_product.id}), 201
 
 @product_bp.route('/<int:product_id>', methods=['PUT'])
@@ -47,7 +227,40 @@ def create_product():
 def update_product(product_id):
     product = Product.query.get_or_404(product_id)
     data = request.get_json()
+    old_barcode = product.barcode
     for key, value in data.items():
         setattr(product, key, value)
+    revision = catalog_revision.bump()
+    record_changes(revision, [(product.id, product.barcode)])
     db.session.commit()
-    return jsonify({"msg": "Product updated"})
\ No newline at end of file
+    catalog_revision.publish(revision)
+    barcode_cache.invalidate(old_barcode, product.barcode)
+    return jsonify({"msg": "Product updated"})
+
+
+@product_bp.route('/bulk', methods=['POST'])
+@admin_required()
+def bulk_upsert():
+    """
+    Upsert a product feed on barcode
+
+    Body: NDJSON (Content-Type: application/x-ndjson) or CSV with a header row
+    (Content-Type: text/csv), streamed. Each record needs barcode, name and price;
+    category, description and image_url are optional and left unchanged when blank.
+    Query params:
+        chunk_size: rows per transaction (default 500, max 5000)
+    """
+    content_type = request.mimetype
+    fmt = request.args.get('format')
+    if fmt is None:
+        if content_type == 'text/csv':
+            fmt = 'csv'
+        elif content_type in ('application/x-ndjson', 'application/jsonl', 'application/json-lines'):
+            fmt = 'ndjson'
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({"error": "Send NDJSON (application/x-ndjson) or CSV (text/csv)"}), 415
+
+    chunk_size = max(1, min(request.args.get('chunk_size', DEFAULT_CHUNK_SIZE, type=int), MAX_CHUNK_SIZE))
+    result = bulk_upsert_products(request.stream, fmt, chunk_size=chunk_size)
+    result["revision"] = catalog_revision.current()
+    return jsonify(result)
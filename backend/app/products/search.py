@@ -0,0 +1,144 @@
+"""
+Product Search
+Full-text search over product name, description and category backed by an SQLite
+FTS5 index kept in sync with the products table through triggers
+"""
+import re
+import threading
+from ..extensions import db
+from ..models import Product
+from .barcode_cache import product_to_dict
+
+FTS_TABLE = 'products_fts'
+
+# bm25() column weights: name, description, category
+BM25_WEIGHTS = (10.0, 1.0, 4.0)
+
+# External-content FTS5 table: stores only the index, rows are read from products.
+# prefix='2 3 4' indexes short prefixes so type-ahead queries stay fast on large catalogs.
+SEARCH_INDEX_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, description, category,
+        content='products', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3 4'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON products BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description, category)
+        VALUES (new.id, new.name, new.description, new.category);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON products BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description, category)
+        VALUES ('delete', old.id, old.name, old.description, old.category);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name, description, category ON products BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description, category)
+        VALUES ('delete', old.id, old.name, old.description, old.category);
+        INSERT INTO {FTS_TABLE}(rowid, name, description, category)
+        VALUES (new.id, new.name, new.description, new.category);
+    END""",
+]
+REBUILD_SQL = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+
+# Rank inside the FTS index first and join only the requested page back to products,
+# so broad queries don't materialize full product rows for every match.
+SEARCH_SQL = f"""
+    SELECT p.id, p.barcode, p.name, p.price, p.category, p.description, p.image_url, ranked.score
+    FROM (
+        SELECT rowid, bm25({FTS_TABLE}, {', '.join(str(w) for w in BM25_WEIGHTS)}) AS score
+        FROM {FTS_TABLE}
+        WHERE {FTS_TABLE} MATCH :match
+        ORDER BY score
+        LIMIT :limit OFFSET :offset
+    ) AS ranked
+    JOIN products p ON p.id = ranked.rowid
+    ORDER BY ranked.score
+"""
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_index_lock = threading.Lock()
+_index_ready = False
+
+
+def build_match_expression(query):
+    """
+    Turn free text into a safe FTS5 MATCH expression
+
+    Every word must match, and the last word is treated as a prefix so partially
+    typed queries still find results. Words are quoted so FTS5 operators in user
+    input are never interpreted.
+
+    Returns:
+        str: MATCH expression, or None if the query has no searchable words
+    """
+    tokens = _TOKEN_RE.findall(query.lower())
+    if not tokens:
+        return None
+    terms = [f'"{t}"' for t in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def is_fts_available():
+    return db.engine.dialect.name == 'sqlite'
+
+
+def ensure_search_index():
+    """Create the FTS5 table and sync triggers if missing, populating it from products"""
+    global _index_ready
+    if _index_ready:
+        return
+    with _index_lock:
+        if _index_ready:
+            return
+        with db.engine.begin() as conn:
+            exists = conn.execute(
+                db.text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": FTS_TABLE},
+            ).first()
+            for statement in SEARCH_INDEX_DDL:
+                conn.execute(db.text(statement))
+            if not exists:
+                conn.execute(db.text(REBUILD_SQL))
+        _index_ready = True
+
+
+def search_products(query, limit=20, offset=0):
+    """
+    Search the catalog
+
+    Args:
+        query (str): Free-text query
+        limit (int): Page size
+        offset (int): Number of ranked results to skip
+
+    Returns:
+        tuple: (list of product dicts with a "score", bool has_more)
+    """
+    if is_fts_available():
+        match = build_match_expression(query)
+        if match is None:
+            return [], False
+        ensure_search_index()
+        rows = db.session.execute(
+            db.text(SEARCH_SQL),
+            {"match": match, "limit": limit + 1, "offset": offset},
+        ).mappings().all()
+        results = [dict(row) for row in rows]
+    else:
+        # Other databases: unranked substring match, still paginated
+        pattern = f"%{query}%"
+        products = (
+            Product.query
+            .filter(db.or_(
+                Product.name.ilike(pattern),
+                Product.description.ilike(pattern),
+                Product.category.ilike(pattern),
+            ))
+            .order_by(Product.name, Product.id)
+            .limit(limit + 1)
+            .offset(offset)
+            .all()
+        )
+        results = [dict(product_to_dict(p), score=None) for p in products]
+
+    return results[:limit], len(results) > limit
@@ -0,0 +1,9 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from .extensions import db
+
+
+def dialect_insert(table):
+    """INSERT construct supporting on_conflict_do_update() for the configured database"""
+    if db.engine.dialect.name == 'postgresql':
+        return postgresql.insert(table)
+    return sqlite.insert(table)
@@ -0,0 +1,181 @@
+"""
+Audit Rules
+Decides which purchases gate staff check by hand. Rules are declarative (JSON
+from AUDIT_RULES_FILE, or DEFAULT_RULES) and are evaluated in a single pass over
+a feature dict built once per checkout: the cart aggregate plus the customer's
+order history from one query. That query reads the running totals checkout
+keeps in user_order_stats and counts only the last day's orders off the
+(user_id, created_at) index, so its cost doesn't grow with the history. Every
+rule that fires is recorded, not just the last one. Only when no rule fires is
+a random sample drawn, and random audits are capped per time window so a busy
+hour doesn't flood the gate.
+
+Rules file format:
+    {
+        "rules": [
+            {"name": "high_value", "reason": "High-value transaction",
+             "when": [{"feature": "total", "op": ">=", "value": 100}]}
+        ],
+        "random_sample": {"reason": "Random security check", "rate": 0.1,
+                          "window_seconds": 600, "max_per_window": 10}
+    }
+A rule fires when all of its "when" conditions hold.
+"""
+import json
+import operator
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from ..extensions import db
+from ..models import Transaction, UserOrderStats
+
+OPERATORS = {
+    '>=': operator.ge,
+    '>': operator.gt,
+    '<=': operator.le,
+    '<': operator.lt,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+FEATURES = (
+    'total',             # Cart total in dollars
+    'line_count',        # Distinct products in the cart
+    'item_count',        # Units in the cart
+    'max_quantity',      # Largest quantity of one product
+    'previous_orders',   # Customer's earlier transactions
+    'orders_last_24h',
+    'avg_order_total',   # Mean of earlier transactions (0 for a first order)
+    'total_vs_average',  # total / avg_order_total (0 for a first order)
+)
+
+RANDOM_SAMPLE_RULE = 'random_sample'
+
+DEFAULT_RULES = {
+    "rules": [
+        {"name": "high_value", "reason": "High-value transaction",
+         "when": [{"feature": "total", "op": ">=", "value": 100}]},
+        {"name": "bulk_purchase", "reason": "Bulk purchase detected",
+         "when": [{"feature": "max_quantity", "op": ">=", "value": 5}]},
+    ],
+    "random_sample": {"reason": "Random security check", "rate": 0.10, "window_seconds": 600, "max_per_window": 10},
+}
+
+
+class AuditEngine:
+    def __init__(self):
+        """Load rules from AUDIT_RULES_FILE if set, else DEFAULT_RULES"""
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        path = os.getenv('AUDIT_RULES_FILE')
+        if path:
+            with open(path) as f:
+                self.load(json.load(f))
+        else:
+            self.load(DEFAULT_RULES)
+
+    def load(self, config):
+        """
+        Replace the rule set and reset the random-sample window
+
+        Raises:
+            ValueError: If a rule is unnamed or uses an unknown feature or operator
+        """
+        rules = []
+        for rule in config.get("rules", []):
+            if not rule.get("name"):
+                raise ValueError("Every audit rule needs a name")
+            conditions = []
+            for condition in rule.get("when", []):
+                if condition.get("feature") not in FEATURES:
+                    raise ValueError(f"Audit rule {rule['name']}: unknown feature {condition.get('feature')!r}")
+                if condition.get("op") not in OPERATORS:
+                    raise ValueError(f"Audit rule {rule['name']}: unknown operator {condition.get('op')!r}")
+                conditions.append((condition["feature"], OPERATORS[condition["op"]], condition["value"]))
+            if not conditions:
+                raise ValueError(f"Audit rule {rule['name']} has no conditions")
+            rules.append({"name": rule["name"], "reason": rule.get("reason", rule["name"]), "conditions": conditions})
+
+        sample = config.get("random_sample") or {}
+        with self._lock:
+            self._rules = rules
+            self.sample_reason = sample.get("reason", "Random security check")
+            self.sample_rate = float(sample.get("rate", 0))
+            self.sample_window = float(sample.get("window_seconds", 600))
+            self.sample_max = int(sample.get("max_per_window", 10))
+            self._window_start = time.monotonic()
+            self._window_count = 0
+
+    def features(self, user_id, summary):
+        """
+        Build the feature dict for one checkout
+
+        Args:
+            summary (dict): Result of checkout.summarize_cart()
+        """
+        user_id = int(user_id)
+        transactions, stats = Transaction.__table__, UserOrderStats.__table__
+        since = datetime.utcnow() - timedelta(days=1)
+        previous_orders, order_total, orders_last_24h = db.session.execute(
+            db.select(
+                db.select(stats.c.order_count).where(stats.c.user_id == user_id).scalar_subquery(),
+                db.select(stats.c.order_total).where(stats.c.user_id == user_id).scalar_subquery(),
+                db.select(db.func.count()).select_from(transactions)
+                .where(transactions.c.user_id == user_id, transactions.c.created_at >= since)
+                .scalar_subquery(),
+            )
+        ).one()
+        previous_orders = previous_orders or 0
+        avg_order_total = order_total / previous_orders if previous_orders else 0
+        total = summary["total"]
+        return {
+            "total": total,
+            "line_count": summary["line_count"],
+            "item_count": summary["item_count"],
+            "max_quantity": summary["max_quantity"],
+            "previous_orders": previous_orders,
+            "orders_last_24h": orders_last_24h,
+            "avg_order_total": round(avg_order_total, 2),
+            "total_vs_average": round(total / avg_order_total, 2) if avg_order_total else 0,
+        }
+
+    def evaluate(self, features):
+        """Return every rule whose conditions all hold, in rule order"""
+        return [
+            rule for rule in self._rules
+            if all(compare(features[feature], value) for feature, compare, value in rule["conditions"])
+        ]
+
+    def decide(self, user_id, summary):
+        """
+        Decide whether a checkout is audited
+
+        Returns:
+            dict: {"requires_audit", "audit_reason" (every reason, joined), "audit_rules" (names that fired)}
+        """
+        fired = [(rule["name"], rule["reason"]) for rule in self.evaluate(self.features(user_id, summary))]
+        if not fired and self._sample():
+            fired = [(RANDOM_SAMPLE_RULE, self.sample_reason)]
+        return {
+            "requires_audit": bool(fired),
+            "audit_reason": "; ".join(reason for _, reason in fired)[:255] or None,
+            "audit_rules": [name for name, _ in fired],
+        }
+
+    def _sample(self):
+        """Draw a random audit, at most sample_max per window (per process)"""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= self.sample_window:
+                self._window_start = now
+                self._window_count = 0
+            if self._window_count >= self.sample_max or self._random.random() >= self.sample_rate:
+                return False
+            self._window_count += 1
+            return True
+
+
+# Create singleton instance
+audit_engine = AuditEngine()
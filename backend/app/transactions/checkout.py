@@ -0,0 +1,148 @@
+"""
+Checkout
+Turns a user's cart into a transaction. Shared by the plain checkout and the
+Stripe confirm-payment flow. The cart is totalled by one SQL aggregate, its
+lines are copied into transaction_items by one INSERT ... SELECT, the cart is
+emptied by one DELETE, the user's order stats are bumped by one upsert, and
+everything commits together; no cart item or product is loaded into the
+session along the way.
+"""
+import json
+from datetime import datetime
+from ..extensions import db
+from ..models import Cart, CartItem, Product, Transaction, TransactionItem, UserOrderStats
+from ..sql_helpers import dialect_insert
+from ..cart.cart_cache import cart_cache, bump_cart_version
+from .exit_pass import build_compact_exit_pass, exit_pass_renderer
+
+
+class CartChangedError(Exception):
+    """The cart was modified between summarize_cart() and place_order()"""
+
+
+def summarize_cart(user_id):
+    """
+    Total a user's cart in one query
+
+    Returns:
+        dict: {"cart_id", "line_count", "item_count", "total", "max_quantity"}, or None if the user has no cart
+    """
+    carts, cart_items, products = Cart.__table__, CartItem.__table__, Product.__table__
+    row = db.session.execute(
+        db.select(
+            carts.c.id,
+            db.func.count(products.c.id),
+            db.func.coalesce(db.func.sum(db.case((products.c.id.isnot(None), cart_items.c.quantity), else_=0)), 0),
+            db.func.coalesce(db.func.sum(cart_items.c.quantity * products.c.price), 0),
+            db.func.coalesce(db.func.max(cart_items.c.quantity), 0),
+        )
+        .select_from(
+            carts.outerjoin(cart_items, cart_items.c.cart_id == carts.c.id)
+            .outerjoin(products, products.c.id == cart_items.c.product_id)
+        )
+        .where(carts.c.user_id == int(user_id))
+        .group_by(carts.c.id)
+    ).first()
+    if row is None:
+        return None
+    cart_id, line_count, item_count, total, max_quantity = row
+    return {"cart_id": cart_id, "line_count": line_count, "item_count": item_count,
+            "total": round(total, 2), "max_quantity": max_quantity}
+
+
+def _record_order_stats(user_id, total):
+    """Add one order to the user's running stats, inside the caller's transaction"""
+    stats = UserOrderStats.__table__
+    stmt = dialect_insert(stats).values(user_id=user_id, order_count=1, order_total=total)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[stats.c.user_id],
+        set_={"order_count": stats.c.order_count + 1, "order_total": stats.c.order_total + stmt.excluded.order_total},
+    ))
+
+
+def place_order(user_id, summary, payment_intent_id=None, requires_audit=False, audit_reason=None, audit_rules=None):
+    """
+    Create a transaction from the summarized cart, empty the cart and commit
+
+    Prices are copied from the catalog at the moment of the insert. The exit pass
+    is signed before the commit and its image is queued for rendering after it.
+
+    Args:
+        summary (dict): Result of summarize_cart() for a non-empty cart
+        audit_rules (list): Names of the audit rules that fired, if any
+
+    Returns:
+        dict: {"transaction" (its fields as a dict), "items" (serialized lines, by id), "exit_pass_payload"}
+
+    Raises:
+        CartChangedError: If the lines inserted don't match the summary (nothing is committed)
+    """
+    user_id = int(user_id)
+    cart_id = summary["cart_id"]
+    transaction = Transaction(
+        user_id=user_id,
+        created_at=datetime.utcnow(),
+        total_amount=summary["total"],
+        payment_intent_id=payment_intent_id,
+        requires_audit=requires_audit,
+        audit_reason=audit_reason,
+        audit_rules=json.dumps(audit_rules) if audit_rules else None,
+    )
+    db.session.add(transaction)
+    db.session.flush()  # Get the ID for the items and the exit pass
+
+    cart_items, products, items = CartItem.__table__, Product.__table__, TransactionItem.__table__
+    lines = db.session.execute(
+        db.insert(items)
+        .from_select(
+            ["transaction_id", "product_id", "quantity", "price_at_purchase"],
+            db.select(db.literal(transaction.id, db.Integer), cart_items.c.product_id,
+                      cart_items.c.quantity, products.c.price)
+            .join_from(cart_items, products, products.c.id == cart_items.c.product_id)
+            .where(cart_items.c.cart_id == cart_id),
+        )
+        .returning(items.c.id, items.c.product_id, items.c.quantity, items.c.price_at_purchase)
+    ).all()
+    lines.sort(key=lambda line: line.id)  # RETURNING order isn't guaranteed
+
+    # The cart may have changed since it was totalled; never charge one amount for other goods
+    inserted_total = round(sum(line.price_at_purchase * line.quantity for line in lines), 2)
+    if len(lines) != summary["line_count"] or inserted_total != summary["total"]:
+        db.session.rollback()
+        raise CartChangedError("Cart changed during checkout")
+
+    db.session.execute(db.delete(cart_items).where(cart_items.c.cart_id == cart_id))
+    bump_cart_version(cart_id)
+    _record_order_stats(user_id, transaction.total_amount)
+
+    # Sign the exit pass now; the QR image is rendered off the request path after commit
+    payload_str = build_compact_exit_pass(
+        transaction.id, user_id, transaction.total_amount,
+        items=[(line.product_id, line.quantity, line.price_at_purchase) for line in lines],
+    )
+    transaction.exit_pass_payload = payload_str
+    # Captured before the commit expires the instance, so callers don't reload it
+    placed = {
+        "id": transaction.id,
+        "user_id": user_id,
+        "total_amount": transaction.total_amount,
+        "created_at": transaction.created_at,
+        "requires_audit": requires_audit,
+        "audit_reason": audit_reason,
+        "audit_rules": audit_rules or [],
+    }
+
+    db.session.commit()
+    cart_cache.invalidate(user_id)
+    exit_pass_renderer.submit(placed["id"], payload_str)
+
+    return {
+        "transaction": placed,
+        "items": [{
+            "id": line.id,
+            "product_id": line.product_id,
+            "quantity": line.quantity,
+            "price_at_purchase": line.price_at_purchase,
+        } for line in lines],
+        "exit_pass_payload": payload_str,
+    }
@@ -0,0 +1,298 @@
+"""
+Exit Pass
+Signs exit-pass payloads (gate passes, compact format v3, for new transactions;
+compact v2 and v1 JSON are still verified) and renders their QR codes. Only the signed payload is
+stored; images are rendered from it (via qr_service) on a small bounded worker
+pool after checkout commits, or on demand, and kept in a bounded memory + disk LRU.
+"""
+import hashlib
+import hmac
+import os
+import secrets
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from cachetools import LRUCache
+from flask import current_app
+from .qr_service import qr_service
+from .gate_verifier import (
+    base45_encode, base45_decode, items_digest, pack_gate_pass, unpack_gate_pass, check_gate_pass_mac,
+)
+
+# Gate keys rotate every period and gates keep the last GATE_KEY_RETAINED_PERIODS,
+# which is also how long a gate pass stays verifiable
+GATE_KEY_ROTATION_SECONDS = int(os.getenv('GATE_KEY_ROTATION_SECONDS', 86400))
+GATE_KEY_RETAINED_PERIODS = int(os.getenv('GATE_KEY_RETAINED_PERIODS', 7))
+
+
+def get_signing_secret():
+    # Fallback to app secret key to avoid unsigned payloads
+    return current_app.config.get("QR_SIGNING_SECRET") or current_app.config.get("SECRET_KEY") or "smartscan-secret"
+
+
+def _sign(payload: dict):
+    signature_base = f"{payload['v']}|{payload['tx']}|{payload['uid']}|{payload['amt']}|{payload['ts']}|{payload['nonce']}"
+    return hmac.new(
+        get_signing_secret().encode("utf-8"),
+        signature_base.encode("utf-8"),
+        hashlib.sha256,
+    ).hexdigest()
+
+
+def build_exit_pass_payload(transaction_id: int, user_id: int, total_amount: float, issued_at: datetime = None):
+    payload = {
+        "v": 1,
+        "tx": int(transaction_id),
+        "uid": int(user_id),
+        "amt": float(total_amount),
+        "ts": int((issued_at or datetime.utcnow()).timestamp()),
+        "nonce": secrets.token_hex(8),
+    }
+    payload["sig"] = _sign(payload)
+    payload["sig_fields"] = "v|tx|uid|amt|ts|nonce"
+    return payload
+
+
+def validate_signed_payload(payload: dict):
+    required = ["v", "tx", "uid", "amt", "ts", "nonce", "sig"]
+    if not all(key in payload for key in required):
+        return False
+    return hmac.compare_digest(str(payload.get("sig", "")), _sign(payload))
+
+
+# Compact (v2) exit pass: packed binary fields + truncated HMAC, base45 encoded so the
+# whole QR uses alphanumeric mode. Layout: version, tx, uid, amount in cents, issued-at
+# (unix seconds), 6 random nonce bytes; then the first COMPACT_MAC_BYTES of the HMAC.
+# The v3 gate pass layout, which shares the prefix, is defined in gate_verifier.py.
+COMPACT_PREFIX = "EP:"
+COMPACT_VERSION = 2
+COMPACT_LAYOUT = struct.Struct(">BIIII6s")
+COMPACT_MAC_BYTES = 10
+
+
+def gate_key(key_id: int) -> bytes:
+    """Signing key for one rotation period, derived from the signing secret so gates never hold the secret itself"""
+    return hmac.new(
+        get_signing_secret().encode("utf-8"), f"gate-key|{int(key_id)}".encode("utf-8"), hashlib.sha256
+    ).digest()
+
+
+def current_gate_key_id(now: datetime = None) -> int:
+    return int((now or datetime.utcnow()).timestamp()) // GATE_KEY_ROTATION_SECONDS
+
+
+def gate_keys_for_sync():
+    """Keys gates need: the retained past periods, the current one and the next (for clock skew at rollover)"""
+    current = current_gate_key_id()
+    return {
+        key_id: gate_key(key_id).hex()
+        for key_id in range(current - GATE_KEY_RETAINED_PERIODS + 1, current + 2)
+    }
+
+
+def _compact_mac(body: bytes) -> bytes:
+    return hmac.new(get_signing_secret().encode("utf-8"), body, hashlib.sha256).digest()[:COMPACT_MAC_BYTES]
+
+
+def build_compact_exit_pass(transaction_id: int, user_id: int, total_amount: float, issued_at: datetime = None,
+                            items=None):
+    """
+    Sign an exit pass in the compact format
+
+    Args:
+        items (list): (product_id, quantity, unit price) lines. When given, a gate pass (v3)
+            embedding the item count and items digest is issued, signed with the current
+            gate key so gates can verify it offline; otherwise a v2 pass.
+
+    Returns:
+        str: QR content, e.g. "EP:..." (about 50 alphanumeric characters for v2, 74 for v3)
+    """
+    issued_at = issued_at or datetime.utcnow()
+    if items is not None:
+        key_id = current_gate_key_id(issued_at)
+        return pack_gate_pass(
+            key_id, gate_key(key_id), int(transaction_id), int(user_id), int(round(float(total_amount) * 100)),
+            int(issued_at.timestamp()), secrets.token_bytes(6),
+            sum(int(quantity) for _, quantity, _ in items), items_digest(items),
+        )
+    body = COMPACT_LAYOUT.pack(
+        COMPACT_VERSION,
+        int(transaction_id),
+        int(user_id),
+        int(round(float(total_amount) * 100)),
+        int(issued_at.timestamp()),
+        secrets.token_bytes(6),
+    )
+    return COMPACT_PREFIX + base45_encode(body + _compact_mac(body))
+
+
+def decode_compact_exit_pass(qr_data: str):
+    """
+    Verify and unpack a compact (v2 or v3 gate) exit pass
+
+    Returns:
+        dict: Fields in the same shape as a v1 payload (v, tx, uid, amt, ts, nonce, sig;
+            gate passes add item_count, items_digest and key_id), or None if the content
+            is malformed, the signature doesn't match or the gate key has expired
+    """
+    if not qr_data.startswith(COMPACT_PREFIX):
+        return None
+    gate_pass = unpack_gate_pass(qr_data)
+    if gate_pass is not None:
+        fields, body, mac = gate_pass
+        current = current_gate_key_id()
+        if not current - GATE_KEY_RETAINED_PERIODS < fields["key_id"] <= current + 1:
+            return None
+        return fields if check_gate_pass_mac(body, mac, gate_key(fields["key_id"])) else None
+    try:
+        raw = base45_decode(qr_data[len(COMPACT_PREFIX):])
+    except ValueError:
+        return None
+    if len(raw) != COMPACT_LAYOUT.size + COMPACT_MAC_BYTES:
+        return None
+    body, mac = raw[:COMPACT_LAYOUT.size], raw[COMPACT_LAYOUT.size:]
+    if not hmac.compare_digest(mac, _compact_mac(body)):
+        return None
+    version, tx, uid, cents, ts, nonce = COMPACT_LAYOUT.unpack(body)
+    if version != COMPACT_VERSION:
+        return None
+    return {"v": version, "tx": tx, "uid": uid, "amt": cents / 100, "ts": ts, "nonce": nonce.hex(), "sig": mac.hex()}
+
+
+def payload_digest(payload_str: str) -> str:
+    """Short content hash of a stored payload; versions the image URL and cache keys"""
+    return hashlib.sha1(payload_str.encode("utf-8")).hexdigest()[:16]
+
+
+def exit_pass_url(transaction_id, payload_str, fmt="png"):
+    # The digest makes the URL change whenever the payload does, so the image can be cached as immutable
+    return f"/api/transactions/{transaction_id}/exit-pass.{fmt}?v={payload_digest(payload_str)}"
+
+
+class ExitPassRenderer:
+    def __init__(self):
+        """Initialize the worker pool and the memory and disk image caches"""
+        workers = int(os.getenv('EXIT_PASS_RENDER_WORKERS', 2))
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='exit-pass')
+        # Bounds queued renders; when full, images are rendered on first request instead
+        self._slots = threading.BoundedSemaphore(int(os.getenv('EXIT_PASS_RENDER_QUEUE', 64)))
+        self._lock = threading.Lock()
+        self._images = LRUCache(maxsize=int(os.getenv('EXIT_PASS_IMAGE_CACHE_SIZE', 256)))
+        self._in_flight = {}
+        # Disk tier; defaults to <instance>/exit_passes, trimmed by last access time
+        self._disk_dir = os.getenv('EXIT_PASS_IMAGE_DIR')
+        self._disk_max_files = int(os.getenv('EXIT_PASS_DISK_CACHE_SIZE', 5000))
+        self._disk_writes = 0
+
+    def submit(self, transaction_id, payload_str, fmt='png'):
+        """
+        Queue a render for a committed transaction
+
+        Returns:
+            bool: False if the queue was full (the image will render on demand)
+        """
+        if not self._slots.acquire(blocking=False):
+            return False
+        key = (int(transaction_id), payload_digest(payload_str), fmt)
+        disk_dir = self._resolve_disk_dir()
+        with self._lock:
+            future = self._executor.submit(self._render_and_store, key, payload_str, disk_dir)
+            self._in_flight[key] = future
+        future.add_done_callback(lambda _: self._finish(key))
+        return True
+
+    def get(self, transaction_id, payload_str, fmt='png'):
+        """
+        Return the rendered exit pass (PNG, SVG or JSON matrix) for a transaction's payload
+
+        Checks memory, then disk, then waits on a queued render, and finally
+        renders in the request.
+        """
+        key = (int(transaction_id), payload_digest(payload_str), fmt)
+        with self._lock:
+            image = self._images.get(key)
+            future = self._in_flight.get(key)
+        if image is not None:
+            return image
+
+        disk_dir = self._resolve_disk_dir()
+        image = self._read_disk(disk_dir, key)
+        if image is not None:
+            with self._lock:
+                self._images[key] = image
+            return image
+
+        if future is not None:
+            try:
+                return future.result(timeout=5)
+            except Exception:
+                pass
+        return self._render_and_store(key, payload_str, disk_dir)
+
+    def _finish(self, key):
+        with self._lock:
+            self._in_flight.pop(key, None)
+        self._slots.release()
+
+    def _render_and_store(self, key, payload_str, disk_dir):
+        image = qr_service.render(payload_str, key[2])
+        with self._lock:
+            self._images[key] = image
+        self._write_disk(disk_dir, key, image)
+        return image
+
+    def _resolve_disk_dir(self):
+        return self._disk_dir or os.path.join(current_app.instance_path, 'exit_passes')
+
+    @staticmethod
+    def _disk_path(disk_dir, key):
+        return os.path.join(disk_dir, f"{key[0]}-{key[1]}.{key[2]}")
+
+    def _read_disk(self, disk_dir, key):
+        path = self._disk_path(disk_dir, key)
+        try:
+            with open(path, 'rb') as f:
+                image = f.read()
+            os.utime(path)  # Mark as recently used for trimming
+            return image
+        except OSError:
+            return None
+
+    def _write_disk(self, disk_dir, key, image):
+        path = self._disk_path(disk_dir, key)
+        try:
+            os.makedirs(disk_dir, exist_ok=True)
+            # Write then rename so readers never see a partial file
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(image)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[ERROR] Could not cache exit pass image {path}: {str(e)}")
+            return
+        with self._lock:
+            self._disk_writes += 1
+            should_trim = self._disk_writes % 64 == 0
+        if should_trim:
+            self._trim_disk(disk_dir)
+
+    def _trim_disk(self, disk_dir):
+        """Drop the least recently used images once the directory exceeds its bound"""
+        try:
+            entries = [e for e in os.scandir(disk_dir) if not e.name.endswith('.tmp')]
+        except OSError:
+            return
+        excess = len(entries) - self._disk_max_files
+        if excess <= 0:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:excess]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+# Create singleton instance
+exit_pass_renderer = ExitPassRenderer()
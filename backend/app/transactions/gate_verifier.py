@@ -0,0 +1,200 @@
+"""
+Gate Verifier
+Offline verification of exit passes on gate devices. A gate pass (compact format
+v3) carries the transaction, amount, item count and items digest, and is signed
+with a gate key that rotates every period; gates hold the keys for recent periods
+plus the sets of used and revoked transactions, all refreshed by sync(), so a scan
+is a local HMAC check with no network round trip.
+
+Standard library only: this file can be copied to a gate device as-is. The server
+imports the same codec to issue passes.
+"""
+import hashlib
+import hmac
+import json
+import struct
+import threading
+import time
+import urllib.request
+
+PREFIX = "EP:"
+GATE_PASS_VERSION = 3
+# version, tx, uid, amount in cents, issued-at (unix seconds), nonce, item count,
+# items digest, gate key id; followed by the first MAC_BYTES of the HMAC-SHA256
+GATE_PASS_LAYOUT = struct.Struct(">BIIII6sH8sI")
+MAC_BYTES = 10
+BASE45_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:"
+_BASE45_VALUES = {c: i for i, c in enumerate(BASE45_ALPHABET)}
+
+
+def base45_encode(data: bytes) -> str:
+    """RFC 9285 base45"""
+    chars = []
+    for i in range(0, len(data) - 1, 2):
+        n = data[i] * 256 + data[i + 1]
+        chars += [BASE45_ALPHABET[n % 45], BASE45_ALPHABET[n // 45 % 45], BASE45_ALPHABET[n // 2025]]
+    if len(data) % 2:
+        chars += [BASE45_ALPHABET[data[-1] % 45], BASE45_ALPHABET[data[-1] // 45]]
+    return "".join(chars)
+
+
+def base45_decode(text: str) -> bytes:
+    """
+    RFC 9285 base45
+
+    Raises:
+        ValueError: If text is not valid base45
+    """
+    try:
+        values = [_BASE45_VALUES[c] for c in text]
+    except KeyError:
+        raise ValueError("Invalid base45 character")
+    if len(values) % 3 == 1:
+        raise ValueError("Invalid base45 length")
+    out = bytearray()
+    for i in range(0, len(values), 3):
+        group = values[i:i + 3]
+        n = sum(v * 45 ** k for k, v in enumerate(group))
+        if len(group) == 3:
+            if n > 0xFFFF:
+                raise ValueError("Invalid base45 group")
+            out += n.to_bytes(2, "big")
+        else:
+            if n > 0xFF:
+                raise ValueError("Invalid base45 group")
+            out.append(n)
+    return bytes(out)
+
+
+def items_digest(lines) -> bytes:
+    """
+    Order-independent digest of purchased lines
+
+    Args:
+        lines (iterable): (product_id, quantity, unit price) tuples
+
+    Returns:
+        bytes: First 8 bytes of SHA-256 over the sorted lines
+    """
+    canonical = ";".join(
+        f"{int(product_id)}:{int(quantity)}:{int(round(float(price) * 100))}"
+        for product_id, quantity, price in sorted((int(p), int(q), float(pr)) for p, q, pr in lines)
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).digest()[:8]
+
+
+def pack_gate_pass(key_id, key, transaction_id, user_id, amount_cents, issued_at, nonce, item_count, digest):
+    """Sign and encode a gate pass with the given gate key"""
+    body = GATE_PASS_LAYOUT.pack(
+        GATE_PASS_VERSION, transaction_id, user_id, amount_cents, issued_at, nonce,
+        min(item_count, 0xFFFF), digest, key_id,
+    )
+    mac = hmac.new(key, body, hashlib.sha256).digest()[:MAC_BYTES]
+    return PREFIX + base45_encode(body + mac)
+
+
+def unpack_gate_pass(qr_data):
+    """
+    Split a gate pass into its fields without checking the signature
+
+    Returns:
+        tuple: (dict of fields, signed body bytes, mac bytes), or None if this is not a gate pass
+    """
+    if not qr_data.startswith(PREFIX):
+        return None
+    try:
+        raw = base45_decode(qr_data[len(PREFIX):])
+    except ValueError:
+        return None
+    if len(raw) != GATE_PASS_LAYOUT.size + MAC_BYTES or raw[0] != GATE_PASS_VERSION:
+        return None
+    body, mac = raw[:GATE_PASS_LAYOUT.size], raw[GATE_PASS_LAYOUT.size:]
+    version, tx, uid, cents, ts, nonce, item_count, digest, key_id = GATE_PASS_LAYOUT.unpack(body)
+    fields = {
+        "v": version, "tx": tx, "uid": uid, "amt": cents / 100, "ts": ts, "nonce": nonce.hex(),
+        "item_count": item_count, "items_digest": digest.hex(), "key_id": key_id, "sig": mac.hex(),
+    }
+    return fields, body, mac
+
+
+def check_gate_pass_mac(body, mac, key):
+    return hmac.compare_digest(mac, hmac.new(key, body, hashlib.sha256).digest()[:MAC_BYTES])
+
+
+class GateVerifier:
+    """
+    Local verifier state for one gate device
+
+    Usage:
+        verifier = GateVerifier("https://store.example.com/api", token)
+        verifier.sync()                  # at startup, then every minute or so
+        result = verifier.verify(scanned_text)
+    """
+
+    def __init__(self, api_base=None, token=None):
+        self.api_base = api_base
+        self.token = token
+        self._lock = threading.Lock()
+        self._keys = {}
+        self._used = set()
+        self._revoked = set()
+        self._pending_uses = []  # Accepted offline, not yet reported to the server
+        self._since = None
+        self.last_sync = None
+
+    def verify(self, qr_data):
+        """
+        Verify a scanned pass locally and, if valid, mark it used
+
+        Returns:
+            dict: {"valid": bool, "reason": str or None, plus the pass fields when decodable}
+        """
+        unpacked = unpack_gate_pass(qr_data)
+        if unpacked is None:
+            return {"valid": False, "reason": "not a gate pass"}
+        fields, body, mac = unpacked
+        with self._lock:
+            key = self._keys.get(fields["key_id"])
+            if key is None:
+                return dict(fields, valid=False, reason="unknown or expired gate key")
+            if not check_gate_pass_mac(body, mac, key):
+                return dict(fields, valid=False, reason="bad signature")
+            if fields["tx"] in self._revoked:
+                return dict(fields, valid=False, reason="revoked")
+            if fields["tx"] in self._used:
+                return dict(fields, valid=False, reason="already used")
+            self._used.add(fields["tx"])
+            self._pending_uses.append({"tx": fields["tx"], "nonce": fields["nonce"]})
+        return dict(fields, valid=True, reason=None)
+
+    def apply_sync(self, data):
+        """Merge a gate-sync response into local state"""
+        with self._lock:
+            self._keys = {int(key_id): bytes.fromhex(key) for key_id, key in data["keys"].items()}
+            self._used.update(data["used"])
+            self._revoked.update(data["revoked"])
+            self._since = data["since"]
+            self.last_sync = time.time()
+
+    def sync(self, timeout=5):
+        """
+        Report offline uses and fetch gate keys plus used/revoked transactions since the last sync
+
+        Raises:
+            OSError: If the server can't be reached (local state is kept and pending uses are retried)
+        """
+        with self._lock:
+            uses = list(self._pending_uses)
+            since = self._since
+        request = urllib.request.Request(
+            f"{self.api_base}/transactions/gate-sync",
+            data=json.dumps({"since": since, "uses": uses}).encode("utf-8"),
+            headers={"Content-Type": "application/json", "Authorization": f"Bearer {self.token}"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            data = json.loads(response.read().decode("utf-8"))
+        self.apply_sync(data)
+        with self._lock:
+            del self._pending_uses[:len(uses)]
+        return data
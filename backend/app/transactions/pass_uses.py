@@ -0,0 +1,168 @@
+"""
+Exit Pass Uses
+Replay protection for exit-pass verification. The first verification of a
+transaction is recorded in the database (one row per transaction, claimed with a
+single conflict-free insert), and recent uses are mirrored in process memory so
+replays are rejected without a query. A guard re-scanning the same pass within
+the rescan window gets the cached verification result back instead. Revoked
+passes are tracked here too, and both lists are what gate devices sync.
+"""
+import hashlib
+import os
+import threading
+from datetime import datetime, timedelta
+from cachetools import TTLCache
+from ..extensions import db
+from ..models import ExitPassUse, ExitPassRevocation
+from ..sql_helpers import dialect_insert
+
+
+class ExitPassUseStore:
+    def __init__(self):
+        """Initialize the in-memory mirrors of recent uses and verification results"""
+        self._lock = threading.Lock()
+        self.rescan_window = timedelta(seconds=int(os.getenv('EXIT_PASS_RESCAN_SECONDS', 60)))
+        # transaction_id -> {"verified_by", "used_at"}
+        self._uses = TTLCache(
+            maxsize=int(os.getenv('EXIT_PASS_USE_CACHE_SIZE', 20000)),
+            ttl=int(os.getenv('EXIT_PASS_USE_CACHE_TTL', 3600)),
+        )
+        # sha256(qr_data) -> (verifier id, transaction id, serialized verification result), kept for the rescan window
+        self._results = TTLCache(
+            maxsize=int(os.getenv('EXIT_PASS_RESULT_CACHE_SIZE', 2000)),
+            ttl=self.rescan_window.total_seconds(),
+        )
+
+    @staticmethod
+    def _result_key(qr_data):
+        return hashlib.sha256(qr_data.encode('utf-8')).hexdigest()
+
+    def cached_result(self, qr_data, verifier_id):
+        """
+        Get the verification result for a pass this verifier accepted within the rescan window
+
+        The caller still has to check the pass wasn't revoked since (possibly by another worker).
+
+        Returns:
+            tuple: (transaction id, serialized result), or None
+        """
+        with self._lock:
+            entry = self._results.get(self._result_key(qr_data))
+        if entry and entry[0] == int(verifier_id):
+            return entry[1], entry[2]
+        return None
+
+    def cache_result(self, qr_data, verifier_id, transaction_id, result):
+        with self._lock:
+            self._results[self._result_key(qr_data)] = (int(verifier_id), int(transaction_id), result)
+
+    def recent_use(self, transaction_id):
+        """Use of a transaction seen by this worker recently (no query), or None"""
+        with self._lock:
+            return self._uses.get(int(transaction_id))
+
+    def is_rescan(self, use, verifier_id):
+        """True if a prior use was this verifier, within the rescan window"""
+        return (
+            use["verified_by"] == int(verifier_id)
+            and datetime.utcnow() - use["used_at"] <= self.rescan_window
+        )
+
+    def claim(self, transaction_id, nonce, verifier_id):
+        """
+        Record the first use of a transaction's exit pass, committing immediately
+
+        Returns:
+            tuple: (bool first use, dict use with "verified_by" and "used_at")
+        """
+        return self.claim_many([(transaction_id, nonce)], verifier_id)[int(transaction_id)]
+
+    def claim_many(self, claims, verifier_id):
+        """
+        Record first uses for several transactions in one statement
+
+        Args:
+            claims (list): (transaction_id, nonce) pairs, one per transaction
+            verifier_id (int): The admin verifying the passes
+
+        Returns:
+            dict: transaction_id -> (bool first use, dict use)
+        """
+        if not claims:
+            return {}
+        now = datetime.utcnow()
+        table = ExitPassUse.__table__
+        rows = [
+            {"transaction_id": int(tx), "nonce": nonce, "verified_by": int(verifier_id), "used_at": now}
+            for tx, nonce in claims
+        ]
+        stmt = dialect_insert(table).values(rows).on_conflict_do_nothing(
+            index_elements=[table.c.transaction_id]
+        ).returning(table.c.transaction_id)
+        claimed = set(db.session.execute(stmt).scalars())
+        # Existing uses for the rest, read in the same transaction
+        existing = {}
+        if len(claimed) < len(rows):
+            existing = {
+                row.transaction_id: {"verified_by": row.verified_by, "used_at": row.used_at}
+                for row in db.session.execute(
+                    db.select(table.c.transaction_id, table.c.verified_by, table.c.used_at)
+                    .where(table.c.transaction_id.in_([r["transaction_id"] for r in rows if r["transaction_id"] not in claimed]))
+                )
+            }
+        db.session.commit()
+
+        results = {}
+        with self._lock:
+            for r in rows:
+                tx = r["transaction_id"]
+                if tx in claimed:
+                    use = {"verified_by": r["verified_by"], "used_at": now}
+                    results[tx] = (True, use)
+                else:
+                    use = existing[tx]
+                    results[tx] = (False, use)
+                self._uses[tx] = use
+        return results
+
+    def revoke(self, transaction_id, reason=None):
+        """Revoke a transaction's exit pass inside the caller's transaction (idempotent)"""
+        table = ExitPassRevocation.__table__
+        db.session.execute(
+            dialect_insert(table)
+            .values(transaction_id=int(transaction_id), reason=reason, revoked_at=datetime.utcnow())
+            .on_conflict_do_nothing(index_elements=[table.c.transaction_id])
+        )
+        # Re-scans of this pass must not be answered from memory any more
+        with self._lock:
+            self._uses.pop(int(transaction_id), None)
+            for key in [key for key, entry in self._results.items() if entry[1] == int(transaction_id)]:
+                self._results.pop(key, None)
+
+    def revoked_among(self, transaction_ids):
+        """Subset of transaction_ids whose passes are revoked (one query)"""
+        if not transaction_ids:
+            return set()
+        table = ExitPassRevocation.__table__
+        return set(db.session.execute(
+            db.select(table.c.transaction_id).where(table.c.transaction_id.in_(list(transaction_ids)))
+        ).scalars())
+
+    def changes_since(self, since):
+        """
+        Transactions used or revoked after a point in time, for gate sync
+
+        Returns:
+            tuple: (list of used transaction ids, list of revoked transaction ids)
+        """
+        uses = ExitPassUse.__table__
+        revocations = ExitPassRevocation.__table__
+        used = db.session.execute(db.select(uses.c.transaction_id).where(uses.c.used_at > since)).scalars().all()
+        revoked = db.session.execute(
+            db.select(revocations.c.transaction_id).where(revocations.c.revoked_at > since)
+        ).scalars().all()
+        return used, revoked
+
+
+# Create singleton instance
+exit_pass_uses = ExitPassUseStore()
@@ -0,0 +1,144 @@
+"""
+QR Render Service
+Encodes strings as QR codes and renders them as PNG, SVG or a raw module matrix.
+Encoding is done once per (data, error correction) and shared by every output
+format; images are drawn straight from the module matrix instead of through
+qrcode's per-module image factories.
+"""
+import os
+import threading
+from io import BytesIO
+import qrcode
+from cachetools import LRUCache
+from PIL import Image
+
+ERROR_CORRECTION_LEVELS = {
+    'L': qrcode.constants.ERROR_CORRECT_L,
+    'M': qrcode.constants.ERROR_CORRECT_M,
+    'Q': qrcode.constants.ERROR_CORRECT_Q,
+    'H': qrcode.constants.ERROR_CORRECT_H,
+}
+
+FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+    'json': 'application/json',
+}
+
+
+class QRService:
+    def __init__(self):
+        """Read rendering defaults from the environment"""
+        self.error_correction = os.getenv('QR_ERROR_CORRECTION', 'M').upper()
+        if self.error_correction not in ERROR_CORRECTION_LEVELS:
+            raise ValueError(f"QR_ERROR_CORRECTION must be one of {', '.join(ERROR_CORRECTION_LEVELS)}")
+        self.box_size = int(os.getenv('QR_BOX_SIZE', 4))
+        self.border = int(os.getenv('QR_BORDER', 4))
+        # Fixing the mask (0-7) skips scoring all eight masks, which is most of the encode
+        # time; unset keeps the standard best-mask selection
+        mask_pattern = os.getenv('QR_MASK_PATTERN')
+        self.mask_pattern = int(mask_pattern) if mask_pattern else None
+        self._lock = threading.Lock()
+        # Encoded matrices, so rendering one payload in several formats encodes it once
+        self._matrices = LRUCache(maxsize=int(os.getenv('QR_MATRIX_CACHE_SIZE', 512)))
+
+    def matrix(self, data, error_correction=None):
+        """
+        Encode data as a QR module matrix (without the quiet-zone border)
+
+        Args:
+            data (str): Content to encode
+            error_correction (str): L, M, Q or H (default: QR_ERROR_CORRECTION)
+
+        Returns:
+            tuple: Rows of 0/1 module values (immutable; shared between callers)
+        """
+        level = (error_correction or self.error_correction).upper()
+        key = (data, level, self.mask_pattern)
+        with self._lock:
+            modules = self._matrices.get(key)
+        if modules is not None:
+            return modules
+
+        qr = qrcode.QRCode(error_correction=ERROR_CORRECTION_LEVELS[level], border=0, mask_pattern=self.mask_pattern)
+        qr.add_data(data)
+        qr.make(fit=True)
+        modules = tuple(tuple(1 if m else 0 for m in row) for row in qr.get_matrix())
+
+        with self._lock:
+            self._matrices[key] = modules
+        return modules
+
+    def render(self, data, fmt='png', error_correction=None, box_size=None, border=None):
+        """
+        Render data in the requested format
+
+        Args:
+            fmt (str): 'png', 'svg' or 'json' (the raw matrix)
+            box_size (int): Pixels per module for PNG/SVG
+            border (int): Quiet-zone width in modules
+
+        Returns:
+            bytes: Encoded output, served with FORMATS[fmt] as its mimetype
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported QR format: {fmt}")
+        modules = self.matrix(data, error_correction)
+        box_size = self.box_size if box_size is None else box_size
+        border = self.border if border is None else border
+        if fmt == 'png':
+            return self._png(modules, box_size, border)
+        if fmt == 'svg':
+            return self._svg(modules, box_size, border)
+        return self._json(modules, border)
+
+    def png(self, data, **options):
+        return self.render(data, 'png', **options)
+
+    @staticmethod
+    def _png(modules, box_size, border):
+        size = len(modules) + 2 * border
+        # 1-bit image at one pixel per module, then scaled up without smoothing
+        pixels = bytes(
+            0 if (border <= y < size - border and border <= x < size - border and modules[y - border][x - border]) else 255
+            for y in range(size) for x in range(size)
+        )
+        image = Image.frombytes('L', (size, size), pixels).convert('1', dither=Image.Dither.NONE)
+        if box_size != 1:
+            image = image.resize((size * box_size, size * box_size), Image.NEAREST)
+        buffered = BytesIO()
+        image.save(buffered, format='PNG', optimize=True)
+        return buffered.getvalue()
+
+    @staticmethod
+    def _svg(modules, box_size, border):
+        size = len(modules) + 2 * border
+        # One stroked path of horizontal runs in module units; the viewBox scales it
+        runs = []
+        for y, row in enumerate(modules):
+            x = 0
+            width = len(row)
+            while x < width:
+                if row[x]:
+                    start = x
+                    while x < width and row[x]:
+                        x += 1
+                    runs.append(f"M{start + border} {y + border}.5h{x - start}")
+                else:
+                    x += 1
+        pixels = size * box_size
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{pixels}" height="{pixels}" '
+            f'viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+            f'<rect width="{size}" height="{size}" fill="#fff"/>'
+            f'<path d="{"".join(runs)}" stroke="#000"/></svg>'
+        ).encode('utf-8')
+
+    @staticmethod
+    def _json(modules, border):
+        rows = ','.join('"' + ''.join('1' if m else '0' for m in row) + '"' for row in modules)
+        return f'{{"size":{len(modules)},"border":{border},"rows":[{rows}]}}'.encode('utf-8')
+
+
+# Create singleton instance
+qr_service = QRService()
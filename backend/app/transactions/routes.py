@@ -1,42 +1,44 @@
-from flask import request, jsonify, Blueprint, current_app
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from ..models import Cart, Transaction, TransactionItem, User
+from flask import request, jsonify, Blueprint, Response
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from sqlalchemy.orm import selectinload, joinedload, defer, undefer
+from ..models import Transaction, TransactionItem
 from ..extensions import db
-import qrcode
+from ..idempotency import idempotent
+from .exit_pass import (
+    decode_compact_exit_pass, validate_signed_payload,
+    exit_pass_renderer, exit_pass_url, payload_digest, gate_keys_for_sync, GATE_KEY_ROTATION_SECONDS,
+    GATE_KEY_RETAINED_PERIODS
+)
+from .gate_verifier import items_digest
+from .qr_service import FORMATS as QR_FORMATS
+from .pass_uses import exit_pass_uses
+from .checkout import summarize_cart, place_order, CartChangedError
+from datetime import datetime, timedelta
 import base64
-import hmac
-import hashlib
 import json
-import re
-import secrets
-from datetime import datetime
-from io import BytesIO
 
 transactions_bp = Blueprint('transactions', __name__)
 
+DEFAULT_HISTORY_PAGE_SIZE = 20
+MAX_HISTORY_PAGE_SIZE = 100
+MAX_VERIFY_BATCH_SIZE = 100
+MAX_GATE_SYNC_USES = 5000
+GATE_SYNC_OVERLAP_SECONDS = 30
 
-def _get_signing_secret():
-    # Fallback to app secret key to avoid unsigned payloads
-    return current_app.config.get("QR_SIGNING_SECRET") or current_app.config.get("SECRET_KEY") or "smartscan-secret"
 
+def _encode_history_cursor(t: Transaction):
+    raw = f"{t.created_at.isoformat()}|{t.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
 
-def _build_exit_pass_payload(transaction_id: int, user_id: int, total_amount: float):
-    payload = {
-        "v": 1,
-        "tx": int(transaction_id),
-        "uid": int(user_id),
-        "amt": float(total_amount),
-        "ts": int(datetime.utcnow().timestamp()),
-        "nonce": secrets.token_hex(8),
-    }
-    signature_base = f"{payload['v']}|{payload['tx']}|{payload['uid']}|{payload['amt']}|{payload['ts']}|{payload['nonce']}"
-    payload["sig"] = hmac.new(
-        _get_signing_secret().encode("utf-8"),
-        signature_base.encode("utf-8"),
-        hashlib.sha256,
-    ).hexdigest()
-    payload["sig_fields"] = "v|tx|uid|amt|ts|nonce"
-    return payload
+
+def _decode_history_cursor(cursor):
+    """Raises ValueError for anything that isn't a cursor we issued"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, last_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(last_id)
+    except ValueError:  # Includes bad base64 and bad UTF-8
+        raise ValueError("Invalid cursor")
 
 
 def _serialize_transaction(t: Transaction):
@@ -60,179 +62,225 @@ def _serialize_transaction(t: Transaction):
         "user_id": t.user_id,
         "total_amount": t.total_amount,
         "created_at": t.created_at.isoformat(),
-        "qr_code": t.qr_code or "",
+        "exit_pass_url": exit_pass_url(t.id, t.exit_pass_payload) if t.exit_pass_payload else None,
         "items": items,
         "requires_audit": t.requires_audit,
         "audit_reason": t.audit_reason
     }
 
 
-def _validate_signed_payload(payload: dict):
-    required = ["v", "tx", "uid", "amt", "ts", "nonce", "sig"]
-    if not all(key in payload for key in required):
-        return False
-
-    signature_base = f"{payload['v']}|{payload['tx']}|{payload['uid']}|{payload['amt']}|{payload['ts']}|{payload['nonce']}"
-    expected_sig = hmac.new(
-        _get_signing_secret().encode("utf-8"),
-        signature_base.encode("utf-8"),
-        hashlib.sha256,
-    ).hexdigest()
-    return hmac.compare_digest(str(payload.get("sig", "")), expected_sig)
-
 @transactions_bp.route('/checkout', methods=['POST'])
 @jwt_required()
+@idempotent('checkout')
 def checkout():
     user_id = get_jwt_identity()
-    cart = Cart.query.filter_by(user_id=user_id).first()
+    summary = summarize_cart(user_id)
 
-    if not cart or not cart.items:
+    if not summary or not summary["line_count"]:
         return jsonify({"msg": "Cart is empty"}), 400
 
-    total = sum(item.quantity * item.product.price for item in cart.items)
-
-    # Create the transaction
-    new_transaction = Transaction(user_id=int(user_id), total_amount=round(total, 2))
-    db.session.add(new_transaction)
-    db.session.flush()  # Get the ID before committing
-
-    # Copy cart items to transaction items
-    transaction_items = []
-    for item in cart.items:
-        trans_item = TransactionItem(
-            transaction_id=new_transaction.id,
-            product_id=item.product_id,
-            quantity=item.quantity,
-            price_at_purchase=item.product.price
-        )
-        db.session.add(trans_item)
-        transaction_items.append({
-            "id": trans_item.id,
-            "product_id": trans_item.product_id,
-            "quantity": trans_item.quantity,
-            "price_at_purchase": trans_item.price_at_purchase
-        })
-
-    # Generate signed QR payload for exit pass verification
-    payload = _build_exit_pass_payload(new_transaction.id, int(user_id), new_transaction.total_amount)
-    qr_payload_str = json.dumps(payload, separators=(",", ":"))
-    qr = qrcode.make(qr_payload_str)
-    buffered = BytesIO()
-    qr.save(buffered, format="PNG")
-    qr_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
-    new_transaction.qr_code = f"data:image/png;base64,{qr_str}"
-
-    # Clear the cart
-    for item in cart.items:
-        db.session.delete(item)
-
-    db.session.commit()
+    try:
+        order = place_order(user_id, summary)
+    except CartChangedError:
+        return jsonify({"msg": "Cart changed during checkout, please try again"}), 409
 
+    new_transaction = order["transaction"]
+    payload_str = order["exit_pass_payload"]
     return jsonify({
-        "id": new_transaction.id,
-        "user_id": new_transaction.user_id,
-        "total_amount": new_transaction.total_amount,
-        "qr_code": new_transaction.qr_code,
-        "created_at": new_transaction.created_at.isoformat(),
-        "items": transaction_items,
-        "qr_payload": payload  # Useful for debugging; QR image still encodes the signed payload
+        "id": new_transaction["id"],
+        "user_id": new_transaction["user_id"],
+        "total_amount": new_transaction["total_amount"],
+        "exit_pass_url": exit_pass_url(new_transaction["id"], payload_str),
+        "created_at": new_transaction["created_at"].isoformat(),
+        "items": order["items"],
+        "qr_payload": payload_str  # The exit-pass QR encodes exactly this signed payload
     }), 201
 
 @transactions_bp.route('', methods=['GET'])
 @jwt_required()
 def get_transaction_history():
-    user_id = get_jwt_identity()
-    transactions = Transaction.query.filter_by(user_id=user_id).order_by(Transaction.created_at.desc()).all()
+    """
+    Returns the user's transactions, newest first, one page at a time.
+
+    Query params:
+        limit: page size (default 20, max 100)
+        cursor: next_cursor from the previous page (keyset on created_at, id)
+        since_id: incremental mode; only transactions with a greater id, oldest first
+        include: "qr_code" to also return the legacy stored image
+    """
+    user_id = int(get_jwt_identity())
+    limit = max(1, min(request.args.get('limit', DEFAULT_HISTORY_PAGE_SIZE, type=int), MAX_HISTORY_PAGE_SIZE))
+    since_id = request.args.get('since_id', type=int)
+    include_qr_code = 'qr_code' in request.args.get('include', '').split(',')
+
+    stmt = (
+        db.select(Transaction)
+        .where(Transaction.user_id == user_id)
+        .options(
+            selectinload(Transaction.items).selectinload(TransactionItem.product),
+            undefer(Transaction.qr_code) if include_qr_code else defer(Transaction.qr_code),
+        )
+    )
+    if since_id is not None:
+        stmt = stmt.where(Transaction.id > since_id).order_by(Transaction.id)
+    else:
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                created_at, last_id = _decode_history_cursor(cursor)
+            except ValueError:
+                return jsonify({"msg": "Invalid cursor"}), 400
+            stmt = stmt.where(db.tuple_(Transaction.created_at, Transaction.id) < (created_at, last_id))
+        stmt = stmt.order_by(Transaction.created_at.desc(), Transaction.id.desc())
+
+    transactions = db.session.execute(stmt.limit(limit + 1)).scalars().all()
+    has_more = len(transactions) > limit
+    transactions = transactions[:limit]
 
     history = []
     for t in transactions:
-        # Get transaction items with product details
-        items = []
-        print(f"Transaction {t.id} has {len(t.items)} items")
-        for item in t.items:
-            print(f"  Item {item.id}: product_id={item.product_id}, quantity={item.quantity}")
-            items.append({
-                "id": item.id,
-                "product_id": item.product_id,
-                "quantity": item.quantity,
-                "price_at_purchase": item.price_at_purchase,
-                "product": {
-                    "id": item.product.id,
-                    "barcode": item.product.barcode,
-                    "name": item.product.name,
-                    "price": item.product.price
-                }
-            })
-
-        transaction_data = {
-            "id": t.id,
-            "user_id": t.user_id,
-            "total_amount": t.total_amount,
-            "created_at": t.created_at.isoformat(),
-            "qr_code": t.qr_code,
-            "items": items,
-            "requires_audit": t.requires_audit,
-            "audit_reason": t.audit_reason
-        }
-        print(f"Returning transaction {t.id} with {len(items)} items")
-        history.append(transaction_data)
-
-    print(f"Total transactions: {len(history)}")
-    return jsonify(history)
+        data = _serialize_transaction(t)
+        if include_qr_code:
+            data["qr_code"] = t.qr_code
+        history.append(data)
+
+    response = {"transactions": history, "has_more": has_more}
+    if since_id is not None:
+        # Resume incremental sync from here
+        response["since_id"] = transactions[-1].id if transactions else since_id
+    else:
+        response["next_cursor"] = (
+            _encode_history_cursor(transactions[-1]) if has_more else None
+        )
+    return jsonify(response)
 
 
-@transactions_bp.route('/verify-exit-pass', methods=['POST'])
+@transactions_bp.route('/summary', methods=['GET'])
 @jwt_required()
-def verify_exit_pass():
-    """Verify a scanned exit-pass QR code and return transaction details."""
-    user_id = get_jwt_identity()
-    admin_user = User.query.get(int(user_id))
-    if not admin_user or not admin_user.is_admin:
-        return jsonify({"msg": "Admin privileges required for verification"}), 403
+def get_transaction_summary():
+    """Lifetime order count, spend and item count, aggregated in SQL instead of over the full history."""
+    user_id = int(get_jwt_identity())
+    orders, spent = db.session.execute(
+        db.select(db.func.count(Transaction.id), db.func.coalesce(db.func.sum(Transaction.total_amount), 0))
+        .where(Transaction.user_id == user_id)
+    ).one()
+    items = db.session.execute(
+        db.select(db.func.coalesce(db.func.sum(TransactionItem.quantity), 0))
+        .join(Transaction, Transaction.id == TransactionItem.transaction_id)
+        .where(Transaction.user_id == user_id)
+    ).scalar()
+    return jsonify({
+        "total_orders": orders,
+        "total_spent": round(float(spent), 2),
+        "items_purchased": int(items)
+    })
 
-    body = request.get_json() or {}
-    qr_data = body.get("qr_data")
 
-    if not qr_data or not isinstance(qr_data, str):
-        return jsonify({"msg": "QR data is required for verification"}), 400
+@transactions_bp.route('/<int:transaction_id>/exit-pass.<any(png, svg, json):fmt>', methods=['GET'])
+@jwt_required()
+def get_exit_pass_image(transaction_id, fmt):
+    """Serve the exit-pass QR as PNG, SVG or a JSON module matrix, rendered from the stored signed payload."""
+    user_id = get_jwt_identity()
+    row = db.session.execute(
+        db.select(Transaction.user_id, Transaction.exit_pass_payload)
+        .where(Transaction.id == transaction_id)
+    ).first()
+    if not row or (row.user_id != int(user_id) and not get_jwt().get("is_admin")):
+        return jsonify({"msg": "Transaction not found"}), 404
+
+    if row.exit_pass_payload:
+        digest = payload_digest(row.exit_pass_payload)
+        etag = f"{digest}-{fmt}"
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(exit_pass_renderer.get(transaction_id, row.exit_pass_payload, fmt), mimetype=QR_FORMATS[fmt])
+        response.set_etag(etag)
+        response.cache_control.private = True
+        if request.args.get("v") == digest:
+            # Versioned URL: this exact image can never change
+            response.cache_control.max_age = 31536000
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return response
+
+    # Rows not yet converted by convert_exit_pass_qr_codes.py still carry the rendered image
+    qr_code = db.session.execute(
+        db.select(Transaction.qr_code).where(Transaction.id == transaction_id)
+    ).scalar()
+    if fmt != "png" or not qr_code or not qr_code.startswith("data:image/png;base64,"):
+        return jsonify({"msg": "No exit pass for this transaction"}), 404
+    response = Response(base64.b64decode(qr_code.split(",", 1)[1]), mimetype='image/png')
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def _parse_exit_pass(qr_data):
+    """
+    Identify the transaction a scanned exit pass refers to, without touching the database
+
+    Only signed passes are accepted (convert_exit_pass_qr_codes.py re-signs legacy
+    rows); unsigned JSON or plain-text passes could be forged to use up someone
+    else's pass.
+
+    Returns:
+        tuple: (transaction id, payload dict) for a signed pass, whose fields must then
+            match the transaction, or (None, None)
+    """
+    # Compact passes are only returned once their signature has checked out
+    compact_payload = decode_compact_exit_pass(qr_data)
+    if compact_payload:
+        return compact_payload["tx"], compact_payload
 
-    # Attempt to parse signed JSON payload first
-    parsed_payload = None
     try:
         parsed_payload = json.loads(qr_data)
     except (json.JSONDecodeError, TypeError):
-        parsed_payload = None
+        return None, None
+    if isinstance(parsed_payload, dict) and validate_signed_payload(parsed_payload):
+        return int(parsed_payload["tx"]), parsed_payload
+    return None, None
+
+
+def _load_transactions_for_verification(transaction_ids):
+    """Transactions with items, products and customer in a fixed number of queries, keyed by id"""
+    transactions = db.session.execute(
+        db.select(Transaction)
+        .where(Transaction.id.in_(transaction_ids))
+        .options(
+            selectinload(Transaction.items).selectinload(TransactionItem.product),
+            joinedload(Transaction.user),
+            defer(Transaction.qr_code),
+        )
+    ).scalars().all()
+    return {t.id: t for t in transactions}
+
+
+def _payload_mismatch(payload, transaction):
+    """Error message if a signed payload's fields disagree with the transaction, else None"""
+    if abs(float(payload.get("amt", 0)) - float(transaction.total_amount)) > 0.01:
+        return "QR code data does not match transaction"
+    if int(payload.get("uid", 0)) != int(transaction.user_id):
+        return "QR code user mismatch"
+    if "items_digest" in payload:
+        lines = [(item.product_id, item.quantity, item.price_at_purchase) for item in transaction.items]
+        if (payload["item_count"] != sum(item.quantity for item in transaction.items)
+                or payload["items_digest"] != items_digest(lines).hex()):
+            return "QR code items do not match transaction"
+    return None
+
+
+def _replay_response(transaction_id, use):
+    return {
+        "msg": "Exit pass already used",
+        "verified": False,
+        "transaction_id": transaction_id,
+        "used_at": use["used_at"].isoformat(),
+    }
 
-    transaction = None
-    if parsed_payload:
-        # Preferred: signed payload
-        if _validate_signed_payload(parsed_payload):
-            transaction = Transaction.query.filter_by(id=int(parsed_payload["tx"])).first()
-        else:
-            # Accept legacy/unsigned JSON payloads that include a transaction id
-            tx_id = parsed_payload.get("transaction_id") or parsed_payload.get("id") or parsed_payload.get("tx")
-            if tx_id:
-                try:
-                    transaction = Transaction.query.filter_by(id=int(tx_id)).first()
-                except (TypeError, ValueError):
-                    transaction = None
-    else:
-        # Fallback: support legacy QR content such as "Transaction ID: 123"
-        match = re.search(r"Transaction\\s*ID[:\\s]+(\\d+)", qr_data)
-        if match:
-            transaction_id = int(match.group(1))
-            transaction = Transaction.query.filter_by(id=transaction_id).first()
-
-    if not transaction:
-        return jsonify({"msg": "Invalid or unsigned QR code"}), 400
-
-    # If a signed payload exists, validate critical fields against DB
-    if parsed_payload and parsed_payload.get("sig"):
-        if abs(float(parsed_payload.get("amt", 0)) - float(transaction.total_amount)) > 0.01:
-            return jsonify({"msg": "QR code data does not match transaction"}), 400
-        if int(parsed_payload.get("uid", 0)) != int(transaction.user_id):
-            return jsonify({"msg": "QR code user mismatch"}), 400
 
+def _verification_result(transaction):
     response_data = _serialize_transaction(transaction)
     response_data["customer"] = {
         "id": transaction.user.id,
@@ -241,5 +289,196 @@ def verify_exit_pass():
         "last_name": transaction.user.last_name,
     }
     response_data["verified"] = True
+    response_data["rescan"] = False
+    return response_data
+
+
+def _verify_exit_passes(qr_list, verifier_id):
+    """
+    Verify scanned passes together: one query set for all referenced transactions
+    and one statement to claim every first use.
+
+    Returns:
+        list: (HTTP status, response body) per pass, in input order
+    """
+    outcomes = [None] * len(qr_list)
+    pending = {}  # transaction id -> indexes of passes referring to it
+    payloads = {}
+    rescans = {}  # index -> (transaction id, cached result)
+    for index, qr_data in enumerate(qr_list):
+        cached = exit_pass_uses.cached_result(qr_data, verifier_id)
+        if cached is not None:
+            rescans[index] = cached
+            continue
+        transaction_id, payload = _parse_exit_pass(qr_data)
+        if transaction_id is None:
+            outcomes[index] = (400, {"msg": "Invalid or unsigned QR code"})
+            continue
+        # Replays of passes this worker has already seen are rejected without a query
+        use = exit_pass_uses.recent_use(transaction_id)
+        if use and not exit_pass_uses.is_rescan(use, verifier_id):
+            outcomes[index] = (409, _replay_response(transaction_id, use))
+            continue
+        pending.setdefault(transaction_id, []).append(index)
+        payloads[index] = payload
+
+    transactions = _load_transactions_for_verification(list(pending)) if pending else {}
+    # Cached re-scans are checked too: the pass may have been refunded since (on any worker)
+    revoked = exit_pass_uses.revoked_among(set(transactions) | {tx for tx, _ in rescans.values()})
+    for index, (transaction_id, cached) in rescans.items():
+        if transaction_id in revoked:
+            outcomes[index] = (409, {"msg": "Exit pass revoked", "verified": False,
+                                     "transaction_id": transaction_id})
+        else:
+            outcomes[index] = (200, dict(cached, rescan=True))
+    results = {}
+    claims = []
+    for transaction_id, indexes in pending.items():
+        transaction = transactions.get(transaction_id)
+        for index in indexes:
+            if not transaction:
+                outcomes[index] = (400, {"msg": "Invalid or unsigned QR code"})
+                continue
+            if transaction_id in revoked:
+                outcomes[index] = (409, {"msg": "Exit pass revoked", "verified": False,
+                                         "transaction_id": transaction_id})
+                continue
+            # If a signed payload exists, validate critical fields against DB
+            mismatch = _payload_mismatch(payloads[index], transaction)
+            if mismatch:
+                outcomes[index] = (400, {"msg": mismatch})
+                continue
+            if transaction_id not in results:
+                # Serialize before claiming: the claim commits, which would expire the loaded rows
+                results[transaction_id] = _verification_result(transaction)
+                payload = payloads[index]
+                claims.append((transaction_id, payload.get("nonce")))
+
+    claimed = exit_pass_uses.claim_many(claims, verifier_id)
+    for transaction_id, (first_use, use) in claimed.items():
+        accepted = False
+        for index in pending[transaction_id]:
+            if outcomes[index] is not None:
+                continue
+            if not first_use and not exit_pass_uses.is_rescan(use, verifier_id):
+                outcomes[index] = (409, _replay_response(transaction_id, use))
+                continue
+            # Later copies of the same pass in one batch count as re-scans
+            response_data = dict(results[transaction_id], rescan=accepted or not first_use)
+            outcomes[index] = (200, response_data)
+            if not accepted:
+                exit_pass_uses.cache_result(qr_list[index], verifier_id, transaction_id, response_data)
+            accepted = True
+    return outcomes
+
+
+@transactions_bp.route('/verify-exit-pass', methods=['POST'])
+@jwt_required()
+def verify_exit_pass():
+    """
+    Verify a scanned exit-pass QR code and return transaction details.
+
+    Each transaction's pass is accepted once; later presentations get a 409,
+    except the same admin re-scanning it within the rescan window.
+    """
+    if not get_jwt().get("is_admin"):
+        return jsonify({"msg": "Admin privileges required for verification"}), 403
+
+    body = request.get_json() or {}
+    qr_data = body.get("qr_data")
+
+    if not qr_data or not isinstance(qr_data, str):
+        return jsonify({"msg": "QR data is required for verification"}), 400
+
+    status, response_data = _verify_exit_passes([qr_data], int(get_jwt_identity()))[0]
+    return jsonify(response_data), status
 
-    return jsonify(response_data), 200
+
+@transactions_bp.route('/verify-exit-pass/batch', methods=['POST'])
+@jwt_required()
+def verify_exit_pass_batch():
+    """
+    Verify a burst of scans from a gate device in one round trip.
+
+    Body: { "qr_data": ["EP:...", "EP:...", ...] }
+    Returns per-pass results in input order, each with the status and body the
+    single-pass endpoint would have returned.
+    """
+    if not get_jwt().get("is_admin"):
+        return jsonify({"msg": "Admin privileges required for verification"}), 403
+
+    body = request.get_json() or {}
+    qr_list = body.get("qr_data")
+
+    if not isinstance(qr_list, list) or not qr_list:
+        return jsonify({"msg": "A non-empty list of QR data is required"}), 400
+    if len(qr_list) > MAX_VERIFY_BATCH_SIZE:
+        return jsonify({"msg": f"At most {MAX_VERIFY_BATCH_SIZE} passes are allowed per batch"}), 400
+    if not all(qr and isinstance(qr, str) for qr in qr_list):
+        return jsonify({"msg": "Every QR data entry must be a non-empty string"}), 400
+
+    outcomes = _verify_exit_passes(qr_list, int(get_jwt_identity()))
+    results = [dict(result, index=index, status=status) for index, (status, result) in enumerate(outcomes)]
+    return jsonify({
+        "results": results,
+        "verified": sum(1 for status, _ in outcomes if status == 200),
+        "rejected": sum(1 for status, _ in outcomes if status != 200)
+    }), 200
+
+
+@transactions_bp.route('/gate-sync', methods=['POST'])
+@jwt_required()
+def gate_sync():
+    """
+    Sync endpoint for gate devices running gate_verifier.GateVerifier.
+
+    Body: { "since": "<since from the previous sync>" or null,
+            "uses": [{"tx": 123, "nonce": "..."}] }   # passes accepted offline
+    Returns the gate keys for the retained periods, transactions used or revoked
+    since the given point, and any uploaded uses that another verifier had
+    already claimed (a pass that left twice).
+    """
+    if not get_jwt().get("is_admin"):
+        return jsonify({"msg": "Admin privileges required for gate sync"}), 403
+    verifier_id = int(get_jwt_identity())
+
+    body = request.get_json() or {}
+    uses = body.get("uses") or []
+    if not isinstance(uses, list) or len(uses) > MAX_GATE_SYNC_USES:
+        return jsonify({"msg": f"uses must be a list of at most {MAX_GATE_SYNC_USES} entries"}), 400
+    try:
+        claims = {int(use["tx"]): use.get("nonce") for use in uses}
+    except (TypeError, KeyError, ValueError):
+        return jsonify({"msg": "Each use needs a transaction id in 'tx'"}), 400
+
+    now = datetime.utcnow()
+    # Nothing older than the oldest retained gate key can still be presented
+    floor = now - timedelta(seconds=GATE_KEY_ROTATION_SECONDS * GATE_KEY_RETAINED_PERIODS)
+    since = floor
+    if body.get("since"):
+        try:
+            since = max(datetime.fromisoformat(body["since"]), floor)
+        except (TypeError, ValueError):
+            return jsonify({"msg": "Invalid since"}), 400
+
+    conflicts = []
+    if claims:
+        existing = set(db.session.execute(
+            db.select(Transaction.id).where(Transaction.id.in_(list(claims)))
+        ).scalars())
+        claimed = exit_pass_uses.claim_many(
+            [(tx, nonce) for tx, nonce in claims.items() if tx in existing], verifier_id
+        )
+        conflicts = [tx for tx, (first_use, use) in claimed.items()
+                     if not first_use and use["verified_by"] != verifier_id]
+
+    used, revoked = exit_pass_uses.changes_since(since)
+    return jsonify({
+        "keys": gate_keys_for_sync(),
+        "rotation_seconds": GATE_KEY_ROTATION_SECONDS,
+        "used": used,
+        "revoked": revoked,
+        "conflicts": conflicts,
+        # Overlap the next window so rows committed during this request aren't missed
+        "since": (now - timedelta(seconds=GATE_SYNC_OVERLAP_SECONDS)).isoformat()
+    }), 200
@@ -0,0 +1,113 @@
+"""
+Benchmark for checkout
+Builds a throwaway SQLite database, fills a cart with 1, 50 and 500 lines and
+checks it out through the old per-item ORM path (lazy-loaded products, one
+TransactionItem add and one cart-item delete per line) and through the checkout
+service (one aggregate, one INSERT ... SELECT, one DELETE, one order-stats
+upsert, one commit). Exit-pass signing is included in both; image rendering is
+queued after commit in both and is not timed. Reports SQL statements and latency.
+
+Usage: python benchmark_checkout.py [--lines 1 50 500] [--runs 20]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'checkout.db')}"
+os.environ.setdefault("EXIT_PASS_IMAGE_DIR", os.path.join(_tmp.name, "exit_passes"))
+
+from sqlalchemy import event
+from app import create_app
+from app.extensions import db
+from app.models import User, Product, Cart, CartItem, Transaction, TransactionItem
+from app.cart.cart_cache import bump_cart_version
+from app.transactions.checkout import summarize_cart, place_order
+from app.transactions.exit_pass import build_compact_exit_pass
+
+
+def seed(product_count):
+    user = User(email="shopper@example.com")
+    user.set_password("benchmark")
+    db.session.add(user)
+    db.session.add_all([Product(barcode=f"B{i:06d}", name=f"Product {i}", price=round(1 + (i % 97) * 0.37, 2),
+                                category="Home", description="Benchmark product") for i in range(product_count)])
+    db.session.flush()
+    cart = Cart(user_id=user.id)
+    db.session.add(cart)
+    db.session.commit()
+    return user.id, cart.id
+
+
+def fill_cart(cart_id, lines):
+    db.session.execute(db.insert(CartItem.__table__), [
+        {"cart_id": cart_id, "product_id": product_id, "quantity": 1 + product_id % 3}
+        for product_id in range(1, lines + 1)
+    ])
+    db.session.commit()
+    db.session.expunge_all()
+
+
+def legacy_checkout(user_id):
+    """The pre-service checkout route body"""
+    cart = Cart.query.filter_by(user_id=user_id).first()
+    total = sum(item.quantity * item.product.price for item in cart.items)
+    transaction = Transaction(user_id=user_id, total_amount=round(total, 2))
+    db.session.add(transaction)
+    db.session.flush()
+    for item in cart.items:
+        db.session.add(TransactionItem(transaction_id=transaction.id, product_id=item.product_id,
+                                       quantity=item.quantity, price_at_purchase=item.product.price))
+    transaction.exit_pass_payload = build_compact_exit_pass(
+        transaction.id, user_id, transaction.total_amount,
+        items=[(item.product_id, item.quantity, item.product.price) for item in cart.items],
+    )
+    for item in cart.items:
+        db.session.delete(item)
+    bump_cart_version(cart.id)
+    db.session.commit()
+
+
+def service_checkout(user_id):
+    place_order(user_id, summarize_cart(user_id))
+
+
+def measure(fn, user_id, cart_id, lines, runs, statements):
+    timings, counts = [], []
+    for _ in range(runs):
+        fill_cart(cart_id, lines)
+        statements.clear()
+        start = time.perf_counter()
+        fn(user_id)
+        timings.append((time.perf_counter() - start) * 1000)
+        counts.append(len(statements))
+        db.session.expunge_all()
+    timings.sort()
+    return statistics.median(timings), timings[max(0, int(len(timings) * 0.95) - 1)], statistics.median(counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lines", type=int, nargs="+", default=[1, 50, 500])
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user_id, cart_id = seed(max(args.lines))
+
+        statements = []
+        event.listen(db.engine, "before_cursor_execute", lambda *a: statements.append(a[2]))
+
+        print(f"{'lines':>6} {'path':<8} {'p50 ms':>9} {'p95 ms':>9} {'queries':>8}")
+        for lines in args.lines:
+            for name, fn in (("legacy", legacy_checkout), ("service", service_checkout)):
+                p50, p95, queries = measure(fn, user_id, cart_id, lines, args.runs, statements)
+                print(f"{lines:>6} {name:<8} {p50:>9.2f} {p95:>9.2f} {queries:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
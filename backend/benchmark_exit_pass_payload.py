@@ -0,0 +1,71 @@
+"""
+Compares the v1 JSON exit pass with the compact v2 format
+
+For each format and error-correction level, reports payload length, QR version,
+modules per side, the on-screen size of one module when the code is shown at a
+fixed width (larger modules decode faster and from further away), cold
+encode+render time and PNG bytes.
+
+Usage: python benchmark_exit_pass_payload.py [--runs 100] [--display-px 200]
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+import qrcode
+from flask import Flask
+from app.transactions.exit_pass import build_exit_pass_payload, build_compact_exit_pass
+from app.transactions.qr_service import qr_service, ERROR_CORRECTION_LEVELS
+
+
+def make_passes(count):
+    rng = random.Random(42)
+    v1, v2 = [], []
+    for _ in range(count):
+        args = (rng.randint(1, 2_000_000), rng.randint(1, 200_000), round(rng.uniform(1, 900), 2))
+        v1.append(json.dumps(build_exit_pass_payload(*args), separators=(",", ":")))
+        v2.append(build_compact_exit_pass(*args))
+    return {"v1 json": v1, "v2 compact": v2}
+
+
+def qr_version(data, level):
+    qr = qrcode.QRCode(error_correction=ERROR_CORRECTION_LEVELS[level])
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.version
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--display-px", type=int, default=200)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "benchmark"
+    with app.app_context():
+        passes = make_passes(args.runs)
+
+    print(f"{'format':<11} {'ec':<3} {'chars':>6} {'version':>8} {'modules':>8} "
+          f"{'px/module':>10} {'p50 ms':>8} {'png bytes':>10}")
+    for name, payloads in passes.items():
+        chars = statistics.mean(len(p) for p in payloads)
+        for level in "LMQH":
+            version = max(qr_version(p, level) for p in payloads)
+            modules = 17 + 4 * version
+            # Shown at a fixed width including the 4-module quiet zone on each side
+            pitch = args.display_px / (modules + 8)
+            timings, sizes = [], []
+            for data in payloads:
+                qr_service._matrices.clear()
+                start = time.perf_counter()
+                png = qr_service.render(data, "png", error_correction=level, box_size=4)
+                timings.append((time.perf_counter() - start) * 1000)
+                sizes.append(len(png))
+            print(f"{name:<11} {level:<3} {chars:>6.0f} {version:>8} {modules:>8} "
+                  f"{pitch:>10.2f} {statistics.median(timings):>8.2f} {statistics.mean(sizes):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark for local fraud scoring
+
+Simulates scan sessions (see train_fraud_model.py) of several sizes against a
+synthetic catalog and times FraudScorer.score() with its catalog statistics
+warm, as at steady state. The LLM path this replaces took one external
+chat-completion call per session.
+
+Usage: python benchmark_fraud_scorer.py [--runs 2000]
+"""
+import argparse
+import statistics
+import time
+import numpy as np
+from app.ai.fraud_scorer import FraudScorer, CatalogPriceStats
+from train_fraud_model import synthetic_catalog, simulate_session
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    catalog = synthetic_catalog(rng)
+    stats = CatalogPriceStats(catalog)
+    by_category = {}
+    for row in catalog:
+        by_category.setdefault(row[1], []).append(row)
+    scorer = FraudScorer()
+
+    print(f"{'items':>6} {'p50 us':>8} {'p95 us':>8} {'high risk':>10}")
+    for size in (5, 20, 40):
+        sessions = []
+        while len(sessions) < args.runs:
+            fraud = rng.random() < 0.3
+            scan_data, behavior = simulate_session(rng, catalog, by_category, fraud)
+            items = scan_data["items"]
+            while len(items) < size:  # Extend short sessions with more of the same kind, scanned afterwards
+                more, _ = simulate_session(rng, catalog, by_category, fraud)
+                offset = items[-1]["scanned_at"] - more["items"][0]["scanned_at"] + 5
+                items += [dict(item, scanned_at=item["scanned_at"] + offset) for item in more["items"]]
+            sessions.append(({"items": items[:size]}, behavior))
+        timings, high = [], 0
+        for scan_data, behavior in sessions:
+            start = time.perf_counter()
+            result = scorer.score(scan_data, behavior, stats)
+            timings.append((time.perf_counter() - start) * 1e6)
+            high += result["risk_level"] == "high"
+        timings.sort()
+        print(f"{size:>6} {statistics.median(timings):>8.0f} {timings[int(len(timings) * 0.95) - 1]:>8.0f} "
+              f"{high / len(sessions):>10.1%}")
+
+
+if __name__ == "__main__":
+    main()
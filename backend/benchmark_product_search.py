@@ -0,0 +1,96 @@
+"""
+Benchmark for the FTS5 product search query
+
+Builds a throwaway SQLite database with a synthetic catalog, indexes it with the
+same DDL the app uses, and times the ranked search query for selective,
+prefix (type-ahead) and deliberately broad queries.
+
+Usage: python benchmark_product_search.py [--products 1000000] [--runs 200]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from app.products.search import SEARCH_INDEX_DDL, REBUILD_SQL, SEARCH_SQL, build_match_expression
+
+NOUNS = ["teapot", "sneaker", "handbag", "blanket", "mug", "lamp", "jacket", "scarf", "candle", "pillow",
+         "skillet", "vase", "towel", "backpack", "sandal", "wallet", "rug", "frame", "kettle", "bowl"]
+CATEGORIES = ["Home", "Kitchen", "Apparel", "Shoes", "Accessories", "Beauty", "Toys", "Bedding", "Decor", "Outdoor"]
+SYLLABLES = ["ka", "lo", "mi", "ren", "sa", "tor", "vi", "zen", "ba", "cor", "del", "fin", "gra", "hal", "jo",
+             "ly", "mar", "no", "pel", "qua", "ros", "sil", "tan", "ul", "ver", "wil", "xan", "yo", "zu", "bri"]
+
+
+def make_vocabulary(rng, size):
+    """Pseudo-words standing in for the brand names and descriptors of a real catalog"""
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))))
+    return sorted(words)
+
+
+def build_database(path, count, vocabulary, rng):
+    conn = sqlite3.connect(path)
+    conn.execute("""CREATE TABLE products (
+        id INTEGER PRIMARY KEY, barcode VARCHAR(80) UNIQUE NOT NULL, name VARCHAR(120) NOT NULL,
+        price FLOAT NOT NULL, category VARCHAR(50), description TEXT, image_url VARCHAR(500))""")
+
+    def rows():
+        for i in range(1, count + 1):
+            brand, style, detail = rng.choice(vocabulary), rng.choice(vocabulary), rng.choice(vocabulary)
+            noun = rng.choice(NOUNS)
+            yield (i, f"{i:012d}", f"{brand} {style} {noun}", round(rng.uniform(1, 200), 2),
+                   rng.choice(CATEGORIES), f"A {detail} {noun} by {brand}", None)
+
+    conn.executemany("INSERT INTO products VALUES (?, ?, ?, ?, ?, ?, ?)", rows())
+    for statement in SEARCH_INDEX_DDL:
+        conn.execute(statement)
+    conn.execute(REBUILD_SQL)
+    conn.commit()
+    return conn
+
+
+def time_query(conn, query, runs, limit):
+    params = {"match": build_match_expression(query), "limit": limit, "offset": 0}
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        rows = conn.execute(SEARCH_SQL, params).fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return len(rows), statistics.median(timings), timings[max(0, int(len(timings) * 0.95) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--vocabulary", type=int, default=20_000)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    vocabulary = make_vocabulary(rng, args.vocabulary)
+    queries = (
+        [("selective", f"{rng.choice(vocabulary)} {rng.choice(NOUNS)}") for _ in range(4)]
+        + [("selective", rng.choice(vocabulary)) for _ in range(3)]
+        + [("prefix", rng.choice(vocabulary)[:4]) for _ in range(3)]
+        + [("broad", noun) for noun in NOUNS[:2]]
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        conn = build_database(os.path.join(tmp, "bench.db"), args.products, vocabulary, rng)
+        print(f"Built and indexed {args.products:,} products in {time.perf_counter() - start:.1f}s\n")
+
+        print(f"{'kind':<10} {'query':<24} {'rows':>5} {'p50 ms':>8} {'p95 ms':>8}")
+        for kind, query in queries:
+            rows, p50, p95 = time_query(conn, query, args.runs, args.limit)
+            print(f"{kind:<10} {query:<24} {rows:>5} {p50:>8.2f} {p95:>8.2f}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Micro-benchmark for exit-pass QR rendering
+
+Signs realistic exit-pass payloads, then times and sizes the old qrcode.make()
+path against each qr_service mode (PNG/SVG/JSON matrix, error-correction level,
+box size). "cold" encodes every payload from scratch; "warm" reuses the cached
+module matrix, as a second format for the same transaction does.
+
+Usage: python benchmark_qr_render.py [--runs 200]
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from io import BytesIO
+import qrcode
+from flask import Flask
+from app.transactions.exit_pass import build_exit_pass_payload
+from app.transactions.qr_service import qr_service
+
+
+def make_payloads(count):
+    rng = random.Random(42)
+    payloads = []
+    for _ in range(count):
+        payload = build_exit_pass_payload(rng.randint(1, 2_000_000), rng.randint(1, 200_000),
+                                          round(rng.uniform(1, 900), 2))
+        payloads.append(json.dumps(payload, separators=(",", ":")))
+    return payloads
+
+
+def legacy_png(data):
+    image = qrcode.make(data)
+    buffered = BytesIO()
+    image.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def with_mask(mask_pattern, render, *args, **kwargs):
+    saved, qr_service.mask_pattern = qr_service.mask_pattern, mask_pattern
+    try:
+        return render(*args, **kwargs)
+    finally:
+        qr_service.mask_pattern = saved
+
+
+def time_mode(render, payloads, warm):
+    timings = []
+    sizes = []
+    for data in payloads:
+        if warm:
+            render(data)
+        else:
+            qr_service._matrices.clear()
+        start = time.perf_counter()
+        output = render(data)
+        timings.append((time.perf_counter() - start) * 1000)
+        sizes.append(len(output))
+    timings.sort()
+    return statistics.median(timings), timings[max(0, int(len(timings) * 0.95) - 1)], statistics.mean(sizes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "benchmark"
+    with app.app_context():
+        payloads = make_payloads(args.runs)
+    print(f"Payload length: {statistics.mean(len(p) for p in payloads):.0f} chars (mean)\n")
+
+    modes = [("legacy qrcode.make (M, box 10)", legacy_png, False)]
+    for level in "LMQH":
+        modes.append((f"png {level} box 4", lambda d, lv=level: qr_service.render(d, "png", error_correction=lv, box_size=4), False))
+    modes += [
+        ("png M box 10", lambda d: qr_service.render(d, "png", error_correction="M", box_size=10), False),
+        ("png M box 4 (QR_MASK_PATTERN=2)", lambda d: with_mask(2, qr_service.render, d, "png", error_correction="M", box_size=4), False),
+        ("svg M", lambda d: qr_service.render(d, "svg", error_correction="M"), False),
+        ("json matrix M", lambda d: qr_service.render(d, "json", error_correction="M"), False),
+        ("png M box 4 (warm)", lambda d: qr_service.render(d, "png", error_correction="M", box_size=4), True),
+        ("svg M (warm)", lambda d: qr_service.render(d, "svg", error_correction="M"), True),
+    ]
+
+    print(f"{'mode':<34} {'p50 ms':>8} {'p95 ms':>8} {'bytes':>8}")
+    for name, render, warm in modes:
+        p50, p95, size = time_mode(render, payloads, warm)
+        print(f"{name:<34} {p50:>8.2f} {p95:>8.2f} {size:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
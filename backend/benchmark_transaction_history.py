@@ -0,0 +1,137 @@
+"""
+Benchmark for transaction history
+
+Builds a throwaway SQLite database with one customer who has a long purchase
+history, then compares the old unpaginated history (lazy-loaded items and
+products, legacy base64 qr_code in every row) with the paginated endpoint: the
+first page, a full cursor walk, and an incremental since_id poll. Reports SQL
+statements, latency and response bytes.
+
+Usage: python benchmark_transaction_history.py [--transactions 5000] [--runs 20]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'history.db')}"
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from app import create_app
+from app.extensions import db
+from app.models import User, Product, Transaction, TransactionItem
+
+LEGACY_QR_CODE = "data:image/png;base64," + "A" * 2400  # Typical size of the old stored image
+
+
+def seed(count, rng):
+    user = User(email="loyal@example.com")
+    user.set_password("benchmark")
+    db.session.add(user)
+    products = [Product(barcode=f"B{i:06d}", name=f"Product {i}", price=round(rng.uniform(1, 80), 2),
+                        category="Home", description="Benchmark product") for i in range(500)]
+    db.session.add_all(products)
+    db.session.flush()
+
+    start = datetime(2022, 1, 1)
+    for i in range(count):
+        t = Transaction(user_id=user.id, total_amount=0, created_at=start + timedelta(hours=6 * i),
+                        qr_code=LEGACY_QR_CODE, exit_pass_payload=f"EP:{i:050d}")
+        db.session.add(t)
+        db.session.flush()
+        total = 0
+        for product in rng.sample(products, rng.randint(1, 8)):
+            quantity = rng.randint(1, 3)
+            db.session.add(TransactionItem(transaction_id=t.id, product_id=product.id,
+                                           quantity=quantity, price_at_purchase=product.price))
+            total += product.price * quantity
+        t.total_amount = round(total, 2)
+    db.session.commit()
+    return user.id
+
+
+def legacy_history(user_id):
+    """The pre-pagination endpoint body, minus its per-item print() calls"""
+    history = []
+    for t in Transaction.query.filter_by(user_id=user_id).order_by(Transaction.created_at.desc()).all():
+        items = [{
+            "id": item.id,
+            "product_id": item.product_id,
+            "quantity": item.quantity,
+            "price_at_purchase": item.price_at_purchase,
+            "product": {"id": item.product.id, "barcode": item.product.barcode,
+                        "name": item.product.name, "price": item.product.price},
+        } for item in t.items]
+        history.append({"id": t.id, "user_id": t.user_id, "total_amount": t.total_amount,
+                        "created_at": t.created_at.isoformat(), "qr_code": t.qr_code, "items": items,
+                        "requires_audit": t.requires_audit, "audit_reason": t.audit_reason})
+    return len(json.dumps(history))
+
+
+def measure(fn, runs, statements):
+    timings, sizes, counts = [], [], []
+    for _ in range(runs):
+        db.session.expunge_all()
+        statements.clear()
+        start = time.perf_counter()
+        size = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+        sizes.append(size)
+        counts.append(len(statements))
+    return statistics.median(timings), statistics.median(counts), statistics.median(sizes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--transactions", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app()
+    client = app.test_client()
+    with app.app_context():
+        db.create_all()
+        start = time.perf_counter()
+        user_id = seed(args.transactions, random.Random(42))
+        print(f"Seeded {args.transactions:,} transactions in {time.perf_counter() - start:.1f}s\n")
+        headers = {"Authorization": f"Bearer {create_access_token(identity=str(user_id))}"}
+        newest_id = db.session.execute(db.select(db.func.max(Transaction.id))).scalar()
+
+        statements = []
+        event.listen(db.engine, "before_cursor_execute", lambda *a: statements.append(a[2]))
+
+        def page(query):
+            response = client.get(f"/api/transactions?{query}", headers=headers)
+            return len(response.data)
+
+        def walk():
+            total, cursor = 0, None
+            while True:
+                response = client.get(f"/api/transactions?limit=100{f'&cursor={cursor}' if cursor else ''}",
+                                      headers=headers)
+                total += len(response.data)
+                cursor = response.get_json()["next_cursor"]
+                if not cursor:
+                    return total
+
+        cases = [
+            ("legacy: full history", lambda: legacy_history(user_id), args.runs),
+            (f"first page (limit {args.limit})", lambda: page(f"limit={args.limit}"), args.runs),
+            ("since_id poll (no new rows)", lambda: page(f"since_id={newest_id}"), args.runs),
+            ("full cursor walk (limit 100)", walk, max(1, args.runs // 5)),
+        ]
+        print(f"{'case':<32} {'p50 ms':>9} {'queries':>8} {'bytes':>11}")
+        for name, fn, runs in cases:
+            p50, queries, size = measure(fn, runs, statements)
+            print(f"{name:<32} {p50:>9.1f} {queries:>8.0f} {size:>11,.0f}")
+
+
+if __name__ == "__main__":
+    main()
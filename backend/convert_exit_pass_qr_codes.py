@@ -0,0 +1,62 @@
+"""
+Converts existing transactions to payload-only exit passes: every row gets a
+signed exit_pass_payload and its stored base64 qr_code image is cleared.
+Images are rendered from the payload on request from now on.
+"""
+from app import create_app
+from app.extensions import db
+from app.models import Transaction
+from app.transactions.exit_pass import build_compact_exit_pass
+
+BATCH_SIZE = 500
+
+app = create_app()
+
+with app.app_context():
+    with db.engine.connect() as conn:
+        result = conn.execute(db.text("PRAGMA table_info(transactions)"))
+        columns = [row[1] for row in result]
+        if 'exit_pass_payload' not in columns:
+            conn.execute(db.text("ALTER TABLE transactions ADD COLUMN exit_pass_payload TEXT"))
+            conn.commit()
+            print("Added 'exit_pass_payload' column")
+
+    table = Transaction.__table__
+    signed = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(table.c.id, table.c.user_id, table.c.total_amount, table.c.created_at)
+            .where(table.c.exit_pass_payload.is_(None), table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        for row in rows:
+            payload = build_compact_exit_pass(row.id, row.user_id, row.total_amount, issued_at=row.created_at)
+            db.session.execute(
+                db.update(table)
+                .where(table.c.id == row.id)
+                .values(exit_pass_payload=payload, qr_code=None)
+            )
+        db.session.commit()
+        signed += len(rows)
+        last_id = rows[-1].id
+        print(f"Signed {signed} exit passes...")
+
+    cleared = db.session.execute(
+        db.update(table)
+        .where(table.c.qr_code.is_not(None), table.c.exit_pass_payload.is_not(None))
+        .values(qr_code=None)
+    ).rowcount
+    db.session.commit()
+    print(f"Signed {signed} legacy transactions, cleared {cleared} more stored images")
+
+    if db.engine.dialect.name == 'sqlite':
+        # Return the freed pages to the filesystem
+        with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(db.text("VACUUM"))
+        print("Vacuumed database")
+
+    print("Exit pass conversion complete!")
@@ -1,6 +1,13 @@
+import os
 from app import create_app
+from app.cart.sweeper import start_cart_sweeper
 
 app = create_app()
 
 if __name__ == '__main__':
+    # Only the server started here sweeps in-process; workers, tests and scripts
+    # that call create_app() never start background jobs
+    sweep_interval = int(os.getenv('CART_SWEEP_INTERVAL_SECONDS', 0))
+    if sweep_interval > 0:
+        start_cart_sweeper(app, sweep_interval)
     app.run()
\ No newline at end of file
@@ -0,0 +1,70 @@
+import os
+import sys
+import tempfile
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('EXIT_PASS_IMAGE_DIR', tempfile.mkdtemp(prefix='exit_passes_'))
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from config import Config
+from app import create_app
+from app.extensions import db
+from app.models import User, Product
+from app.cart.cart_cache import cart_cache
+from app.products.barcode_cache import barcode_cache
+
+
+@pytest.fixture
+def app(tmp_path):
+    """App on a fresh SQLite file with one customer and 60 products (B0001-B0060)"""
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        user = User(email='shopper@example.com')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.add_all([
+            Product(barcode=f'B{i:04d}', name=f'Product {i}', price=round(1.25 * i, 2), category='Home')
+            for i in range(1, 61)
+        ])
+        db.session.commit()
+        app.config['TEST_USER_ID'] = user.id
+    # In-process caches outlive the app; start each test cold
+    barcode_cache.clear()
+    cart_cache.invalidate(app.config['TEST_USER_ID'])
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers(app):
+    with app.app_context():
+        token = create_access_token(identity=str(app.config['TEST_USER_ID']))
+    return {'Authorization': f'Bearer {token}'}
+
+
+@pytest.fixture
+def statements(app):
+    """SQL statements executed while the test runs (clear() before the part being counted)"""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', record)
+    yield executed
+    with app.app_context():
+        event.remove(db.engine, 'before_cursor_execute', record)
@@ -0,0 +1,35 @@
+from app.extensions import db
+from app.models import Transaction
+from app.transactions.audit_rules import audit_engine
+from app.transactions.checkout import summarize_cart
+
+ORDERS = [('B0004', 1), ('B0010', 2), ('B0001', 3)]  # $5.00, $25.00, $3.75
+
+
+def test_order_history_features_follow_checkouts(app, client, auth_headers, statements):
+    user_id = app.config['TEST_USER_ID']
+    for barcode, quantity in ORDERS:
+        client.post('/api/cart/items', json={'barcode': barcode, 'quantity': quantity}, headers=auth_headers)
+        assert client.post('/api/transactions/checkout', headers=auth_headers).status_code == 201
+    client.post('/api/cart/items', json={'barcode': 'B0040', 'quantity': 1}, headers=auth_headers)
+
+    with app.app_context():
+        summary = summarize_cart(user_id)
+        statements.clear()
+        features = audit_engine.features(user_id, summary)
+        assert len(statements) == 1
+        totals = db.session.execute(db.select(Transaction.total_amount)).scalars().all()
+
+    assert totals == [5.0, 25.0, 3.75]
+    assert features['previous_orders'] == 3
+    assert features['orders_last_24h'] == 3
+    assert features['avg_order_total'] == round(sum(totals) / 3, 2)
+    assert features['total_vs_average'] == round(50.0 / features['avg_order_total'], 2)
+
+
+def test_first_order_has_no_history(app):
+    with app.app_context():
+        features = audit_engine.features(app.config['TEST_USER_ID'], {
+            'total': 10.0, 'line_count': 1, 'item_count': 1, 'max_quantity': 1})
+    assert features['previous_orders'] == 0
+    assert features['avg_order_total'] == 0 and features['total_vs_average'] == 0
@@ -0,0 +1,42 @@
+from app.products import barcode_cache as barcode_cache_module
+from app.products.barcode_cache import barcode_cache
+
+
+def _invalidate_during_read(monkeypatch):
+    """Make every DB read race a product write that invalidates the barcode"""
+    serialize = barcode_cache_module.product_to_dict
+
+    def racing_write(row):
+        barcode_cache.invalidate(row.barcode)
+        return serialize(row)
+
+    monkeypatch.setattr(barcode_cache_module, 'product_to_dict', racing_write)
+
+
+def test_lookup_racing_invalidate_is_not_cached(app, monkeypatch):
+    _invalidate_during_read(monkeypatch)
+    with app.app_context():
+        assert barcode_cache.lookup('B0001')['barcode'] == 'B0001'
+        monkeypatch.undo()
+        misses = barcode_cache.misses
+        barcode_cache.lookup('B0001')
+    assert barcode_cache.misses == misses + 1
+
+
+def test_lookup_many_racing_invalidate_is_not_cached(app, monkeypatch):
+    _invalidate_during_read(monkeypatch)
+    with app.app_context():
+        found, _ = barcode_cache.lookup_many(['B0001', 'B0002'])
+        assert sorted(found) == ['B0001', 'B0002']
+        monkeypatch.undo()
+        misses = barcode_cache.misses
+        barcode_cache.lookup_many(['B0001', 'B0002'])
+    assert barcode_cache.misses == misses + 2
+
+
+def test_lookup_without_race_is_cached(app):
+    with app.app_context():
+        barcode_cache.lookup('B0003')
+        hits = barcode_cache.hits
+        barcode_cache.lookup('B0003')
+    assert barcode_cache.hits == hits + 1
@@ -0,0 +1,33 @@
+import io
+from app.extensions import db
+from app.models import Product
+from app.products.bulk_upsert import bulk_upsert_products
+
+
+def _upsert(app, body, fmt, chunk_size=2):
+    with app.app_context():
+        result = bulk_upsert_products(io.BytesIO(body), fmt, chunk_size=chunk_size)
+        names = dict(db.session.execute(
+            db.select(Product.barcode, Product.name).where(Product.barcode.like('N%'))).all())
+    return result, names
+
+
+def test_invalid_utf8_line_is_rejected_not_fatal(app):
+    body = (b'{"barcode": "N1", "name": "One", "price": 1}\n'
+            b'{"barcode": "N2", "name": "Two", "price": 2}\n'
+            b'{"barcode": "N3", "name": "Bad \xff", "price": 3}\n'
+            b'{"barcode": "N4", "name": "Four", "price": 4}\n')
+    result, names = _upsert(app, body, 'ndjson')
+
+    assert names == {'N1': 'One', 'N2': 'Two', 'N4': 'Four'}
+    assert result['totals'] == {'inserted': 3, 'updated': 0, 'rejected': 1, 'failed': 0}
+    assert {'line': 3, 'error': 'Invalid UTF-8'} in result['chunks'][1]['errors']
+
+
+def test_invalid_utf8_csv_row_is_rejected(app):
+    body = b'barcode,name,price\nN1,One,1\nN2,Tw\xfe,2\nN3,Three,3\n'
+    result, names = _upsert(app, body, 'csv')
+
+    assert names == {'N1': 'One', 'N3': 'Three'}
+    assert result['totals']['rejected'] == 1
+    assert {'line': 3, 'error': 'Invalid UTF-8'} in result['chunks'][0]['errors']
@@ -0,0 +1,36 @@
+import threading
+from app.extensions import db
+from app.models import CartItem
+
+THREADS = 8
+ADDS_PER_THREAD = 25
+
+
+def test_concurrent_adds_to_one_cart_make_one_line(app, auth_headers):
+    errors = []
+
+    def scan():
+        client = app.test_client()
+        for _ in range(ADDS_PER_THREAD):
+            response = client.post('/api/cart/items', json={'barcode': 'B0001', 'quantity': 1}, headers=auth_headers)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+
+    threads = [threading.Thread(target=scan) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with app.app_context():
+        lines = db.session.execute(db.select(CartItem.quantity)).scalars().all()
+    assert lines == [THREADS * ADDS_PER_THREAD]
+
+
+def test_repeat_scan_increments_existing_line(client, auth_headers):
+    client.post('/api/cart/items', json={'barcode': 'B0002', 'quantity': 2}, headers=auth_headers)
+    client.post('/api/cart/items', json={'barcode': 'B0002', 'quantity': 3}, headers=auth_headers)
+
+    items = client.get('/api/cart', headers=auth_headers).get_json()['items']
+    assert [(item['product']['barcode'], item['quantity']) for item in items] == [('B0002', 5)]
@@ -0,0 +1,30 @@
+from app.cart.cart_cache import cart_cache
+from app.products.catalog_revision import catalog_revision
+
+CART_LINES = 50
+
+
+def test_cold_cart_view_query_count_is_flat(app, client, auth_headers, statements, monkeypatch):
+    """Cold cart cache and an expired catalog revision: the version row (with the revision) and one joined load"""
+    for i in range(1, CART_LINES + 1):
+        client.post('/api/cart/items', json={'barcode': f'B{i:04d}', 'quantity': 1}, headers=auth_headers)
+    cart_cache.invalidate(app.config['TEST_USER_ID'])
+    monkeypatch.setattr(catalog_revision, '_checked_at', 0.0)
+
+    statements.clear()
+    cart = client.get('/api/cart', headers=auth_headers).get_json()
+
+    assert len(cart['items']) == CART_LINES
+    assert len(statements) <= 2, statements
+
+
+def test_conditional_cart_view_is_one_statement(client, auth_headers, statements, monkeypatch):
+    client.post('/api/cart/items', json={'barcode': 'B0001', 'quantity': 1}, headers=auth_headers)
+    etag = client.get('/api/cart', headers=auth_headers).headers['ETag']
+    monkeypatch.setattr(catalog_revision, '_checked_at', 0.0)
+
+    statements.clear()
+    response = client.get('/api/cart', headers={**auth_headers, 'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert len(statements) == 1
@@ -0,0 +1,49 @@
+import pytest
+from flask_jwt_extended import create_access_token
+from app.extensions import db
+from app.models import ExitPassRevocation
+from app.transactions.pass_uses import exit_pass_uses
+
+
+@pytest.fixture
+def admin_headers(app):
+    with app.app_context():
+        token = create_access_token(identity=str(app.config['TEST_USER_ID']), additional_claims={"is_admin": True})
+    return {'Authorization': f'Bearer {token}'}
+
+
+@pytest.fixture
+def exit_pass(client, auth_headers):
+    client.post('/api/cart/items', json={'barcode': 'B0001', 'quantity': 1}, headers=auth_headers)
+    order = client.post('/api/transactions/checkout', headers=auth_headers).get_json()
+    return order['id'], order['qr_payload']
+
+
+def _verify(client, admin_headers, qr_data):
+    return client.post('/api/transactions/verify-exit-pass', json={'qr_data': qr_data}, headers=admin_headers)
+
+
+def test_rescan_after_revoke_is_rejected(app, client, admin_headers, exit_pass):
+    transaction_id, qr_data = exit_pass
+    assert _verify(client, admin_headers, qr_data).status_code == 200
+    assert _verify(client, admin_headers, qr_data).get_json()['rescan'] is True
+
+    with app.app_context():
+        exit_pass_uses.revoke(transaction_id, reason='refunded')
+        db.session.commit()
+
+    response = _verify(client, admin_headers, qr_data)
+    assert response.status_code == 409
+    assert response.get_json()['msg'] == 'Exit pass revoked'
+
+
+def test_rescan_after_revoke_by_another_worker_is_rejected(app, client, admin_headers, exit_pass):
+    transaction_id, qr_data = exit_pass
+    assert _verify(client, admin_headers, qr_data).status_code == 200
+
+    # Written straight to the database, so this worker's cached result is still there
+    with app.app_context():
+        db.session.add(ExitPassRevocation(transaction_id=transaction_id, reason='refunded'))
+        db.session.commit()
+
+    assert _verify(client, admin_headers, qr_data).status_code == 409
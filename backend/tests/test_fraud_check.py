@@ -0,0 +1,25 @@
+import pytest
+
+
+def _check(client, auth_headers, items):
+    return client.post('/api/ai/fraud-check', json={'scan_data': {'items': items}, 'behavior': {}},
+                       headers=auth_headers)
+
+
+@pytest.mark.parametrize('item', [
+    {'barcode': ['x'], 'price': 1},
+    {'barcode': 'B0001', 'category': {'name': 'Home'}, 'price': 1},
+    {'barcode': True, 'price': 1},
+])
+def test_non_scalar_labels_are_rejected(client, auth_headers, item):
+    response = _check(client, auth_headers, [item])
+
+    assert response.status_code == 400
+    assert 'must be a string' in response.get_json()['error']
+
+
+def test_numeric_barcode_is_scored(client, auth_headers):
+    response = _check(client, auth_headers, [{'barcode': 1234, 'category': 'Home', 'price': 2.5}])
+
+    assert response.status_code == 200
+    assert response.get_json()['risk_level'] in ('low', 'medium', 'high')
@@ -0,0 +1,39 @@
+import pytest
+from app.extensions import db
+from app.models import Product
+from app.products import search
+
+
+@pytest.fixture(autouse=True)
+def fresh_search_index(monkeypatch):
+    # The index is created once per process; every test app has a new database
+    monkeypatch.setattr(search, '_index_ready', False)
+
+
+def _search(client, **params):
+    response = client.get('/api/products/search', query_string=params)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_selective_query_is_ranked_exactly(client):
+    page = _search(client, q='product 42')
+
+    assert [r['barcode'] for r in page['results']] == ['B0042']
+    assert page['has_more'] is False
+
+
+def test_broad_query_ranks_every_match(app, client):
+    # The best match is inserted after thousands of weaker ones
+    with app.app_context():
+        db.session.add_all([Product(barcode=f'C{i:05d}', name=f'Cereal {i}', price=3.5, category='Grocery',
+                                    description='Crunchy flakes, best with milk') for i in range(3000)])
+        db.session.add(Product(barcode='MILK', name='Milk', price=1.99, category='Grocery'))
+        db.session.commit()
+
+    first = _search(client, q='milk', limit=100)
+    assert first['results'][0]['barcode'] == 'MILK'
+    assert first['has_more'] is True
+
+    last = _search(client, q='milk', limit=100, offset=2950)
+    assert len(last['results']) == 51 and last['has_more'] is False
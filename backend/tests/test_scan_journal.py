@@ -0,0 +1,27 @@
+def _replay(client, auth_headers, events):
+    return client.post('/api/cart/journal', json={'events': events}, headers=auth_headers)
+
+
+def test_out_of_range_quantity_is_rejected(client, auth_headers):
+    response = _replay(client, auth_headers, [
+        {'event_id': 'e1', 'barcode': 'B0001', 'quantity': 1},
+        {'event_id': 'e2', 'barcode': 'B0001', 'quantity': 10 ** 20},
+    ])
+
+    assert response.status_code == 400
+    assert response.get_json()['event_index'] == 1
+    assert client.get('/api/cart', headers=auth_headers).get_json()['items'] == []
+
+
+def test_applied_counts_only_events_that_reached_the_cart(client, auth_headers):
+    events = [
+        {'event_id': 'e1', 'barcode': 'B0001', 'quantity': 2},
+        {'event_id': 'e2', 'barcode': 'NOPE', 'quantity': 1},
+        {'event_id': 'e3', 'barcode': 'B0001', 'quantity': -1},
+    ]
+    first = _replay(client, auth_headers, events).get_json()
+    retry = _replay(client, auth_headers, events).get_json()
+
+    assert first['applied'] == 2 and first['unknown_barcodes'] == ['NOPE']
+    assert [(item['product']['barcode'], item['quantity']) for item in first['cart']['items']] == [('B0001', 1)]
+    assert retry['applied'] == 0 and sorted(retry['duplicates']) == ['e1', 'e2', 'e3']
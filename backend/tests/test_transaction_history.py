@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+import pytest
+from app.extensions import db
+from app.models import Transaction, TransactionItem
+
+TRANSACTIONS = 60
+# The page, its items, and their products
+STATEMENTS_PER_PAGE = 3
+
+
+@pytest.fixture
+def history(app):
+    """TRANSACTIONS two-line purchases for the test user, one minute apart"""
+    user_id = app.config['TEST_USER_ID']
+    start = datetime(2024, 1, 1)
+    with app.app_context():
+        for i in range(TRANSACTIONS):
+            transaction = Transaction(user_id=user_id, created_at=start + timedelta(minutes=i), total_amount=3.75)
+            db.session.add(transaction)
+            db.session.flush()
+            db.session.add_all([
+                TransactionItem(transaction_id=transaction.id, product_id=1 + i % 30, quantity=1, price_at_purchase=1.25),
+                TransactionItem(transaction_id=transaction.id, product_id=31 + i % 30, quantity=1, price_at_purchase=2.5),
+            ])
+        db.session.commit()
+
+
+def _page(client, auth_headers, statements, **params):
+    statements.clear()
+    response = client.get('/api/transactions', query_string=params, headers=auth_headers)
+    assert response.status_code == 200
+    return response.get_json(), len(statements)
+
+
+@pytest.mark.parametrize('limit', [1, 5, 20, 100])
+def test_first_page_query_count_is_flat(history, client, auth_headers, statements, limit):
+    page, count = _page(client, auth_headers, statements, limit=limit)
+
+    assert len(page['transactions']) == min(limit, TRANSACTIONS)
+    assert all(len(t['items']) == 2 for t in page['transactions'])
+    assert count == STATEMENTS_PER_PAGE
+
+
+def test_cursor_page_query_count(history, client, auth_headers, statements):
+    first, _ = _page(client, auth_headers, statements, limit=25)
+    second, count = _page(client, auth_headers, statements, limit=25, cursor=first['next_cursor'])
+
+    assert len(second['transactions']) == 25
+    assert second['transactions'][0]['id'] == first['transactions'][-1]['id'] - 1
+    assert count == STATEMENTS_PER_PAGE
+
+
+def test_since_id_page_query_count(history, client, auth_headers, statements):
+    page, count = _page(client, auth_headers, statements, limit=10, since_id=TRANSACTIONS - 15)
+
+    assert [t['id'] for t in page['transactions']] == list(range(TRANSACTIONS - 14, TRANSACTIONS - 4))
+    assert page['since_id'] == TRANSACTIONS - 5
+    assert count == STATEMENTS_PER_PAGE
+
+
+def test_history_boundaries(history, client, auth_headers, statements):
+    first, _ = _page(client, auth_headers, statements, limit=TRANSACTIONS - 1)
+    last, count = _page(client, auth_headers, statements, limit=TRANSACTIONS - 1, cursor=first['next_cursor'])
+    assert [t['id'] for t in last['transactions']] == [1]
+    assert last['has_more'] is False and last['next_cursor'] is None
+    assert count == STATEMENTS_PER_PAGE
+
+    caught_up, count = _page(client, auth_headers, statements, since_id=TRANSACTIONS)
+    assert caught_up['transactions'] == [] and caught_up['since_id'] == TRANSACTIONS
+    assert count <= STATEMENTS_PER_PAGE  # Nothing to load items for
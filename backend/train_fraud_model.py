@@ -0,0 +1,177 @@
+"""
+Trains the local fraud-scoring model (app/ai/fraud_model.json)
+
+Fits a standardized, L2-regularized logistic regression on fraud_scorer's
+features with NumPy. Until enough labeled sessions exist, training data is
+simulated: honest shoppers, and fraud sessions mixing price overrides, swapped
+barcodes, rushed scanning with many failed scans, and unknown barcodes. Real
+sessions can be added with --data (JSON lines of {"scan_data", "behavior",
+"label"}). All features are relative to the catalog (z-scores, ratios, rates),
+so a model trained on the simulated catalog carries over to the store's own.
+
+Usage: python train_fraud_model.py [--sessions 20000] [--data labeled.jsonl] [--from-db] [--out app/ai/fraud_model.json]
+"""
+import argparse
+import json
+import math
+from datetime import datetime
+import numpy as np
+from app.ai.fraud_scorer import FEATURES, CatalogPriceStats, extract_features, DEFAULT_MODEL_PATH
+
+CATEGORIES = {  # name -> (median price, log-price spread)
+    "Home": (25.0, 0.6), "Kitchen": (18.0, 0.5), "Clothing": (30.0, 0.5), "Beauty": (14.0, 0.5),
+    "Electronics": (90.0, 0.7), "Toys": (20.0, 0.5), "Grocery": (5.0, 0.5), "Jewelry": (60.0, 0.6),
+}
+
+
+def synthetic_catalog(rng, per_category=300):
+    rows = []
+    for category, (median, spread) in CATEGORIES.items():
+        for i in range(per_category):
+            price = round(float(np.exp(rng.normal(math.log(median), spread))), 2)
+            rows.append((f"{category[:3].upper()}{i:05d}", category, max(price, 0.5)))
+    return rows
+
+
+def catalog_from_db():
+    from app import create_app
+    from app.extensions import db
+    from app.models import Product
+    with create_app().app_context():
+        return [tuple(row) for row in db.session.execute(
+            db.select(Product.barcode, Product.category, Product.price)).all()]
+
+
+def simulate_session(rng, catalog, by_category, fraud):
+    count = int(min(rng.geometric(0.12), 40))
+    picks = [catalog[i] for i in rng.integers(0, len(catalog), count)]
+    gaps = np.exp(rng.normal(math.log(5), 0.6, count))
+    items = [{"barcode": barcode, "category": category, "price": price,
+              "quantity": int(rng.choice([1, 1, 1, 1, 2, 3]))} for barcode, category, price in picks]
+    behavior = {"failed_scans": int(rng.poisson(0.4)), "voided_items": int(rng.poisson(0.15))}
+
+    if fraud:
+        patterns = rng.choice(["override", "swap", "rush", "unknown"], size=int(rng.integers(1, 3)), replace=False)
+        for pattern in patterns:
+            targets = rng.choice(count, size=min(count, int(rng.integers(1, 4))), replace=False)
+            if pattern == "override":  # Charged well under the catalog price
+                for i in targets:
+                    items[i]["price"] = round(items[i]["price"] * float(rng.uniform(0.15, 0.6)), 2)
+            elif pattern == "swap":  # Expensive item rung up with a cheap barcode from another category
+                for i in targets:
+                    cheap_category = min(CATEGORIES, key=lambda c: CATEGORIES[c][0]) if rng.random() < 0.7 \
+                        else str(rng.choice(list(by_category)))
+                    cheap = by_category[cheap_category][int(rng.integers(0, len(by_category[cheap_category])))]
+                    items[i].update(barcode=cheap[0], price=cheap[2])
+            elif pattern == "rush":  # Rushed scanning around skipped items
+                gaps = np.exp(rng.normal(math.log(0.9), 0.5, count))
+                behavior["failed_scans"] += int(rng.poisson(4))
+                behavior["voided_items"] += int(rng.poisson(1.5))
+            elif pattern == "unknown":  # Self-printed or foreign barcodes at low prices
+                for i in targets:
+                    items[i].update(barcode=f"X{int(rng.integers(1e9))}",
+                                    price=round(items[i]["price"] * float(rng.uniform(0.1, 0.5)), 2))
+
+    start = 1_700_000_000.0
+    for item, at in zip(items, start + np.cumsum(gaps)):
+        item["scanned_at"] = float(at)
+    return {"items": items}, behavior
+
+
+def auc(labels, scores):
+    order = np.argsort(scores)
+    ranks = np.empty(len(scores))
+    ranks[order] = np.arange(1, len(scores) + 1)
+    positives = labels.sum()
+    negatives = len(labels) - positives
+    return float((ranks[labels == 1].sum() - positives * (positives + 1) / 2) / (positives * negatives))
+
+
+def fit(x, y, l2=1e-3, steps=3000, learning_rate=0.5):
+    mean = x.mean(axis=0)
+    scale = x.std(axis=0)
+    scale[scale == 0] = 1.0
+    z = (x - mean) / scale
+    weights = np.zeros(x.shape[1])
+    bias = 0.0
+    for _ in range(steps):
+        p = 1 / (1 + np.exp(-(z @ weights + bias)))
+        error = p - y
+        weights -= learning_rate * (z.T @ error / len(y) + l2 * weights)
+        bias -= learning_rate * float(error.mean())
+    return mean, scale, weights, bias
+
+
+def predict(model, x):
+    mean, scale, weights, bias = model
+    return 1 / (1 + np.exp(-(((x - mean) / scale) @ weights + bias)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=20000, help="Simulated sessions (0 for none)")
+    parser.add_argument("--fraud-rate", type=float, default=0.3)
+    parser.add_argument("--label-noise", type=float, default=0.03)
+    parser.add_argument("--data", help="JSON lines of labeled real sessions")
+    parser.add_argument("--from-db", action="store_true", help="Simulate against the app's catalog")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=DEFAULT_MODEL_PATH)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    catalog = catalog_from_db() if args.from_db else synthetic_catalog(rng)
+    stats = CatalogPriceStats(catalog)
+    by_category = {}
+    for row in catalog:
+        by_category.setdefault(row[1], []).append(row)
+
+    rows, labels = [], []
+    for _ in range(args.sessions):
+        fraud = rng.random() < args.fraud_rate
+        scan_data, behavior = simulate_session(rng, catalog, by_category, fraud)
+        rows.append(extract_features(scan_data, behavior, stats))
+        labels.append(int(fraud) ^ int(rng.random() < args.label_noise))
+    real = 0
+    if args.data:
+        with open(args.data) as f:
+            for line in f:
+                if line.strip():
+                    session = json.loads(line)
+                    rows.append(extract_features(session.get("scan_data", {}), session.get("behavior", {}), stats))
+                    labels.append(int(bool(session["label"])))
+                    real += 1
+
+    x, y = np.array(rows), np.array(labels, dtype=float)
+    shuffled = rng.permutation(len(y))
+    holdout, train = shuffled[:len(y) // 5], shuffled[len(y) // 5:]
+    model = fit(x[train], y[train])
+    scores = predict(model, x[holdout])
+    holdout_auc = auc(y[holdout], scores)
+    accuracy = float(((scores >= 0.5) == y[holdout]).mean())
+    print(f"Trained on {len(train):,} sessions ({real:,} real); holdout AUC {holdout_auc:.3f}, accuracy {accuracy:.3f}")
+
+    mean, scale, weights, bias = fit(x, y)  # Final model on everything
+    for name, weight in sorted(zip(FEATURES, weights), key=lambda fw: -abs(fw[1])):
+        print(f"  {name:<22} {weight:+.3f}")
+    with open(args.out, "w") as f:
+        json.dump({
+            "features": list(FEATURES),
+            "mean": [round(float(v), 6) for v in mean],
+            "scale": [round(float(v), 6) for v in scale],
+            "weights": [round(float(v), 6) for v in weights],
+            "bias": round(bias, 6),
+            "thresholds": {"medium": 0.35, "high": 0.7},
+            "metadata": {
+                "trained_at": datetime.utcnow().isoformat(timespec="seconds"),
+                "sessions": len(y),
+                "real_sessions": real,
+                "holdout_auc": round(holdout_auc, 4),
+                "holdout_accuracy": round(accuracy, 4),
+            },
+        }, f, indent=2)
+        f.write("\n")
+    print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,27 +5,31 @@ import ProtectedRoute from '@/components/ProtectedRoute';
 import { Transaction } from '@/lib/types';
 import { api } from '@/lib/api';
 import toast from 'react-hot-toast';
-import Image from 'next/image';
+import ExitPassImage from '@/components/ExitPassImage';
 
 export default function HistoryPage() {
   const [transactions, setTransactions] = useState<Transaction[]>([]);
   const [loading, setLoading] = useState(true);
   const [selectedTransaction, setSelectedTransaction] = useState<Transaction | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     loadHistory();
   }, []);
 
-  const loadHistory = async () => {
+  const loadHistory = async (cursor?: string) => {
+    if (cursor) setLoadingMore(true);
     try {
-      const data = await api.transactions.getHistory();
-      console.log('Transaction history data:', data);
-      setTransactions(data);
+      const page = await api.transactions.getHistory(cursor);
+      setTransactions((prev) => (cursor ? [...prev, ...page.transactions] : page.transactions));
+      setNextCursor(page.has_more ? page.next_cursor ?? null : null);
     } catch (error) {
       toast.error('Failed to load transaction history');
       console.error(error);
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -67,7 +71,7 @@ export default function HistoryPage() {
                     </svg>
                     <span className="text-sm font-semibold text-gray-700">Total Orders</span>
                   </div>
-                  <span className="text-2xl font-bold text-[#4169E1]">{transactions.length}</span>
+                  <span className="text-2xl font-bold text-[#4169E1]">{transactions.length}{nextCursor ? '+' : ''}</span>
                 </div>
               </div>
             )}
@@ -145,6 +149,17 @@ export default function HistoryPage() {
                   </div>
                 </div>
               ))}
+              {nextCursor && (
+                <div className="text-center pt-2">
+                  <button
+                    onClick={() => loadHistory(nextCursor)}
+                    disabled={loadingMore}
+                    className="bg-white hover:bg-blue-50 text-[#4169E1] border-2 border-[#4169E1] px-6 py-3 rounded-xl font-semibold transition-all shadow-sm disabled:opacity-50"
+                  >
+                    {loadingMore ? 'Loading...' : 'Load older orders'}
+                  </button>
+                </div>
+              )}
             </div>
           )}
 
@@ -229,15 +244,12 @@ export default function HistoryPage() {
                     Show this QR code at the exit to leave the store
                   </p>
                 </div>
-                {selectedTransaction.qr_code ? (
+                {selectedTransaction.exit_pass_url ? (
                   <div className="inline-block p-6 bg-white border-2 border-gray-300 rounded-xl shadow-lg">
-                    <Image
-                      src={selectedTransaction.qr_code}
-                      alt="Exit Pass QR Code"
-                      width={200}
-                      height={200}
+                    <ExitPassImage
+                      exitPassUrl={selectedTransaction.exit_pass_url}
+                      size={200}
                       className="mx-auto"
-                      unoptimized
                     />
                     <p className="text-xs text-gray-600 mt-3 font-medium">
                       Order #{selectedTransaction.id}
@@ -2,7 +2,7 @@
 
 import { useEffect, useState, Suspense, useCallback } from 'react';
 import { useRouter, useSearchParams } from 'next/navigation';
-import Image from 'next/image';
+import ExitPassImage from '@/components/ExitPassImage';
 import ProtectedRoute from '@/components/ProtectedRoute';
 import { Transaction } from '@/lib/types';
 import { api } from '@/lib/api';
@@ -16,7 +16,8 @@ function PaymentSuccessContent() {
 
   const loadTransaction = useCallback(async () => {
     try {
-      const transactions = await api.transactions.getHistory();
+      // A just-paid transaction is on the first (newest) page
+      const { transactions } = await api.transactions.getHistory();
       const found = transactions.find((t) => t.id === parseInt(transactionId!));
       if (found) {
         setTransaction(found);
@@ -126,7 +127,7 @@ function PaymentSuccessContent() {
               )}
 
               {/* EXIT PASS QR CODE */}
-              {transaction.qr_code && (
+              {transaction.exit_pass_url && (
                 <div className={`mb-6 ${transaction.requires_audit ? 'bg-gradient-to-br from-orange-900 to-red-900 border-2 border-orange-500' : 'bg-gradient-to-br from-green-900 to-green-800 border-2 border-green-500'} rounded-lg p-6 text-center`}>
                   <div className="mb-4">
                     <h2 className="text-2xl font-bold text-white mb-2">
@@ -140,12 +141,9 @@ function PaymentSuccessContent() {
                   </div>
 
                   <div className="bg-white p-6 rounded-lg inline-block mb-4">
-                    <Image
-                      src={transaction.qr_code}
-                      alt="Exit Pass QR Code"
-                      width={256}
-                      height={256}
-                      unoptimized
+                    <ExitPassImage
+                      exitPassUrl={transaction.exit_pass_url}
+                      size={256}
                       className="w-64 h-64 mx-auto"
                     />
                   </div>
@@ -29,14 +29,12 @@ export default function ProfilePage() {
 
   const loadUserStats = async () => {
     try {
-      const transactions = await api.transactions.getHistory();
+      const summary = await api.transactions.getSummary();
 
       const stats: UserStats = {
-        totalOrders: transactions.length,
-        totalSpent: transactions.reduce((sum, t) => sum + t.total_amount, 0),
-        itemsPurchased: transactions.reduce((sum, t) =>
-          sum + (t.items?.reduce((itemSum, item) => itemSum + item.quantity, 0) || 0), 0
-        )
+        totalOrders: summary.total_orders,
+        totalSpent: summary.total_spent,
+        itemsPurchased: summary.items_purchased
       };
 
       setUserStats(stats);
@@ -0,0 +1,60 @@
+'use client';
+
+import { useEffect, useState } from 'react';
+import Image from 'next/image';
+import { api } from '@/lib/api';
+
+interface ExitPassImageProps {
+  exitPassUrl: string;
+  size: number;
+  className?: string;
+}
+
+export default function ExitPassImage({ exitPassUrl, size, className }: ExitPassImageProps) {
+  const [src, setSrc] = useState<string | null>(null);
+  const [failed, setFailed] = useState(false);
+
+  useEffect(() => {
+    let objectUrl: string | null = null;
+    let cancelled = false;
+
+    api.transactions
+      .getExitPassImage(exitPassUrl)
+      .then((blob) => {
+        if (cancelled) return;
+        objectUrl = URL.createObjectURL(blob);
+        setSrc(objectUrl);
+      })
+      .catch(() => {
+        if (!cancelled) setFailed(true);
+      });
+
+    return () => {
+      cancelled = true;
+      if (objectUrl) URL.revokeObjectURL(objectUrl);
+    };
+  }, [exitPassUrl]);
+
+  if (failed) {
+    return <p className="text-sm text-red-700 font-semibold">QR code could not be loaded</p>;
+  }
+
+  if (!src) {
+    return (
+      <div className="flex items-center justify-center" style={{ width: size, height: size }}>
+        <div className="animate-spin rounded-full h-10 w-10 border-b-2 border-[#4169E1]"></div>
+      </div>
+    );
+  }
+
+  return (
+    <Image
+      src={src}
+      alt="Exit Pass QR Code"
+      width={size}
+      height={size}
+      className={className}
+      unoptimized
+    />
+  );
+}
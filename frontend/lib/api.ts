@@ -1,5 +1,5 @@
 // API client for Flask backend
-import { User, Product, Cart, Transaction, AuthResponse, ExitPassVerification } from "./types";
+import { User, Product, Cart, Transaction, TransactionHistoryPage, TransactionSummary, AuthResponse, ExitPassVerification } from "./types";
 
 const API_BASE = process.env.NEXT_PUBLIC_API_URL || "http://127.0.0.1:5000/api";
 
@@ -259,19 +259,21 @@ export const cartAPI = {
 
 // Transactions API
 export const transactionsAPI = {
-  async checkout(): Promise<Transaction> {
+  // Reuse the same key when retrying one checkout so the server replays it instead of charging twice
+  async checkout(idempotencyKey: string = crypto.randomUUID()): Promise<Transaction> {
     return apiFetch<Transaction>(
       "/transactions/checkout",
       {
         method: "POST",
+        headers: { "Idempotency-Key": idempotencyKey },
       },
       true
     );
   },
 
-  async getHistory(): Promise<Transaction[]> {
-    return apiFetch<Transaction[]>(
-      "/transactions",
+  async getHistory(cursor?: string | null): Promise<TransactionHistoryPage> {
+    return apiFetch<TransactionHistoryPage>(
+      cursor ? `/transactions?cursor=${encodeURIComponent(cursor)}` : "/transactions",
       {
         method: "GET",
       },
@@ -279,6 +281,27 @@ export const transactionsAPI = {
     );
   },
 
+  async getSummary(): Promise<TransactionSummary> {
+    return apiFetch<TransactionSummary>(
+      "/transactions/summary",
+      {
+        method: "GET",
+      },
+      true
+    );
+  },
+
+  // exit_pass_url is an /api path; the image needs the auth header, so it can't be a plain <img src>
+  async getExitPassImage(exitPassUrl: string): Promise<Blob> {
+    const response = await fetch(`${API_BASE}${exitPassUrl.replace(/^\/api/, "")}`, {
+      headers: getHeaders(true),
+    });
+    if (!response.ok) {
+      throw new Error("Exit pass not available");
+    }
+    return response.blob();
+  },
+
   async verifyExitPass(qrData: string): Promise<ExitPassVerification> {
     return apiFetch<ExitPassVerification>(
       "/transactions/verify-exit-pass",
@@ -310,9 +333,12 @@ interface AIRecommendationsResponse {
 }
 
 interface FraudCheckResponse {
-  is_fraud: boolean;
+  risk_level: "low" | "medium" | "high" | "unknown";
   confidence: number;
-  reasons: string[];
+  flags?: string[];
+  recommendation?: string;
+  score?: number; // Local model's fraud probability
+  second_opinion?: Omit<FraudCheckResponse, "second_opinion">; // LLM verdict, high-risk sessions only
 }
 
 interface VisualSearchResponse {
@@ -416,6 +442,8 @@ export const paymentsAPI = {
       "/payments/confirm-payment",
       {
         method: "POST",
+        // One order per payment intent, even if the success page is reloaded or retried
+        headers: { "Idempotency-Key": `confirm-${paymentIntentId}` },
         body: JSON.stringify({ payment_intent_id: paymentIntentId }),
       },
       true
@@ -45,13 +45,26 @@ export interface Transaction {
   id: number;
   user_id: number;
   total_amount: number;
-  qr_code: string; // base64 encoded data URL
+  exit_pass_url: string | null; // QR image, fetched with auth via api.transactions.getExitPassImage
   created_at: string;
   items: TransactionItem[];
   requires_audit?: boolean;
   audit_reason?: string;
 }
 
+export interface TransactionHistoryPage {
+  transactions: Transaction[];
+  has_more: boolean;
+  next_cursor?: string | null; // Pass back as cursor to get the next (older) page
+  since_id?: number; // Set in since_id (incremental) mode
+}
+
+export interface TransactionSummary {
+  total_orders: number;
+  total_spent: number;
+  items_purchased: number;
+}
+
 export interface ExitPassVerification extends Transaction {
   verified?: boolean;
   customer?: {